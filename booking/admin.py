@@ -1,5 +1,11 @@
 from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import JsonResponse
+from django.urls import path, reverse
+from django.utils.dateparse import parse_date, parse_time
 from .models import Booking
 from registration.models import User
 from service.models import Service
@@ -8,30 +14,56 @@ from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
 from utils.email import send_booking_confirmation_email
+from utils.admin_actions import export_as_csv_action, background_export_actions
+from utils.paginator import EstimatedCountPaginator
+from utils.search import TrigramSearchMixin
+
+
+EXPORT_FIELDS = [
+    'booking_id', 'user.email', 'user.first_name', 'user.last_name',
+    'service_provider.email', 'service_provider.category.category',
+    'date', 'time_slot', 'status', 'created_at',
+]
 
 
 class ProviderChoiceField(forms.ModelChoiceField):
     def label_from_instance(self, obj):
-        # Get the category name from Service model
-        service = Service.objects.filter(category=obj.category).first()
-        if service:
-            category_display = service.category
-        else:
-            # If no service found, try to get a valid category name
-            valid_categories = ['Plumber', 'Carpenter', 'Electrician', 'Cleaning']
-            if obj.category in valid_categories:
-                category_display = obj.category
-            else:
-                # If category is a number, try to map it to a valid category
-                try:
-                    category_index = int(obj.category) - 1
-                    if 0 <= category_index < len(valid_categories):
-                        category_display = valid_categories[category_index]
-                    else:
-                        category_display = obj.category
-                except (ValueError, TypeError):
-                    category_display = obj.category
-        return f"{obj.first_name} {obj.last_name} ({category_display}, {obj.location})"
+        return provider_label(obj.first_name, obj.last_name, obj.category_name, obj.location)
+
+
+def provider_label(first_name, last_name, category_name, location):
+    return f"{first_name} {last_name} ({category_name or '-'}, {location})"
+
+
+def customer_label(first_name, last_name, email):
+    return f"{first_name} {last_name} ({email})"
+
+
+class BookingAutocompleteSelect(AutocompleteSelect):
+    """
+    Select2 widget backed by BookingAdmin's autocomplete endpoints. Only the
+    selected option is rendered; matches are fetched page by page as the admin
+    types, with the chosen date and time slot sent along for provider lookups.
+    """
+    def __init__(self, field, url_name, booking_id=None):
+        super().__init__(field, admin.site)
+        self.url_name = url_name
+        self.booking_id = booking_id
+
+    def get_url(self):
+        return reverse(f'{self.admin_site.name}:{self.url_name}')
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        # Initialised by booking_autocomplete.js rather than admin/js/autocomplete.js
+        attrs['class'] = attrs['class'].replace('admin-autocomplete', 'booking-autocomplete')
+        if self.booking_id:
+            attrs['data-booking-id'] = self.booking_id
+        return attrs
+
+    @property
+    def media(self):
+        return super().media + forms.Media(js=['custom/booking_autocomplete.js'])
 
 
 class BookingAdminForm(forms.ModelForm):
@@ -46,13 +78,18 @@ class BookingAdminForm(forms.ModelForm):
         # Initialize user field first
         self.fields['user'] = forms.ModelChoiceField(
             queryset=User.objects.filter(user_type='USER'),
-            label='User'
+            label='User',
+            widget=BookingAutocompleteSelect(Booking._meta.get_field('user'), 'booking_customer_autocomplete'),
         )
 
         # Initialize service provider field with proper category display
         self.fields['service_provider'] = ProviderChoiceField(
             queryset=User.objects.filter(user_type='SERVICE_PROVIDER'),
-            label='Service Provider'
+            label='Service Provider',
+            widget=BookingAutocompleteSelect(
+                Booking._meta.get_field('service_provider'), 'booking_provider_autocomplete',
+                booking_id=instance.pk if instance else None,
+            ),
         )
 
         # Handle user field for existing bookings
@@ -85,7 +122,7 @@ class BookingAdminForm(forms.ModelForm):
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(TrigramSearchMixin, admin.ModelAdmin):
     form = BookingAdminForm
 
     list_display = (
@@ -101,6 +138,14 @@ class BookingAdmin(admin.ModelAdmin):
     )
 
     list_filter = ('status',)
+    list_select_related = ('user', 'service_provider')
+    autocomplete_page_size = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        export_as_csv_action(description="Export selected bookings to CSV", fields=EXPORT_FIELDS),
+        *background_export_actions(EXPORT_FIELDS, watermark_field='created_at'),
+    ]
 
     search_fields = (
         'user__email', 'user__first_name', 'user__last_name',
@@ -124,16 +169,63 @@ class BookingAdmin(admin.ModelAdmin):
     get_provider_name.short_description = "Provider Name"
 
     def get_provider_category(self, obj):
-        # Get the category name from Service model
-        if obj.service_provider.category:
-            return obj.service_provider.category.category
-        return '-'
+        return obj.service_provider.category_name or '-'
     get_provider_category.short_description = "Provider Category"
 
     def get_provider_email(self, obj):
         return obj.service_provider.email
     get_provider_email.short_description = "Provider Email"
 
+    def get_urls(self):
+        custom_urls = [
+            path('autocomplete/customers/', self.admin_site.admin_view(self.customer_autocomplete_view),
+                 name='booking_customer_autocomplete'),
+            path('autocomplete/providers/', self.admin_site.admin_view(self.provider_autocomplete_view),
+                 name='booking_provider_autocomplete'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def autocomplete_response(self, request, queryset, fields, label):
+        if not (self.has_add_permission(request) or self.has_change_permission(request)):
+            raise PermissionDenied
+        term = request.GET.get('term', '').strip()
+        if term:
+            matches = Q()
+            for field in fields:
+                matches |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(matches)
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        offset = (page - 1) * self.autocomplete_page_size
+        # Fetch one extra row to know whether another page exists, without a COUNT(*)
+        rows = list(queryset.order_by('first_name', 'last_name', 'pk')[offset:offset + self.autocomplete_page_size + 1])
+        return JsonResponse({
+            'results': [{'id': str(row[0]), 'text': label(*row[1:])} for row in rows[:self.autocomplete_page_size]],
+            'pagination': {'more': len(rows) > self.autocomplete_page_size},
+        })
+
+    def customer_autocomplete_view(self, request):
+        customers = User.objects.filter(user_type='USER').values_list('pk', 'first_name', 'last_name', 'email')
+        return self.autocomplete_response(
+            request, customers, ('email', 'first_name', 'last_name', 'contact'), customer_label
+        )
+
+    def provider_autocomplete_view(self, request):
+        providers = User.objects.filter(user_type='SERVICE_PROVIDER')
+        date = parse_date(request.GET.get('date', '') or '')
+        slot = parse_time(request.GET.get('time_slot', '') or '')
+        if date and slot:
+            booked = Booking.objects.filter(date=date, time_slot=slot)
+            if request.GET.get('booking_id', '').isdigit():
+                booked = booked.exclude(pk=request.GET['booking_id'])
+            providers = providers.exclude(pk__in=booked.values('service_provider_id'))
+        providers = providers.values_list('pk', 'first_name', 'last_name', 'category_name', 'location')
+        return self.autocomplete_response(
+            request, providers, ('email', 'first_name', 'last_name', 'category_name', 'location'), provider_label
+        )
+
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
         # Send confirmation email after booking is created or edited
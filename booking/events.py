@@ -0,0 +1,186 @@
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+from itertools import count
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+EVENT_ID = re.compile(r'^\d+-\d+$')
+
+
+def channel(user_id):
+    return f'fixly:booking-events:{user_id}'
+
+
+def event_key(event_id):
+    """
+    Sort key of a stream id such as '1700000000000-0'; None for ids this
+    broker didn't hand out, which are ignored.
+    """
+    if not event_id or not EVENT_ID.match(event_id):
+        return None
+    milliseconds, sequence = event_id.split('-')
+    return int(milliseconds), int(sequence)
+
+
+def is_newer(event_id, last):
+    return last is None or event_key(event_id) > last
+
+
+class RedisBroker:
+    """
+    Keeps each user's recent events in a Redis stream, which Last-Event-ID
+    replays from, and announces new ones on a pub/sub channel of the same
+    name, so every ASGI worker can push them to its listeners.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, user_id, data):
+        key = channel(user_id)
+        event_id = self.client.xadd(
+            key, {'data': data}, maxlen=settings.BOOKING_EVENTS_HISTORY, approximate=True,
+        ).decode()
+        self.client.publish(key, json.dumps([event_id, data]))
+        return event_id
+
+    async def listen(self, user_id, last_event_id):
+        """
+        Yields None once subscribed, (event id, data) for the events after
+        `last_event_id` and then for new ones as they are published, and None
+        again every BOOKING_EVENTS_HEARTBEAT seconds without any.
+        """
+        key = channel(user_id)
+        last = event_key(last_event_id)
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            # Subscribed (the confirmation has arrived) before reading the
+            # backlog, so nothing published in between is missed; duplicates
+            # are skipped by id
+            await pubsub.subscribe(key)
+            await pubsub.get_message(timeout=settings.BOOKING_EVENTS_HEARTBEAT)
+            yield None
+            if last is not None:
+                for event_id, fields in await client.xrange(key, min=f'({last_event_id}', max='+'):
+                    event_id = event_id.decode()
+                    last = event_key(event_id)
+                    yield event_id, fields[b'data'].decode()
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=settings.BOOKING_EVENTS_HEARTBEAT,
+                )
+                if message is None:
+                    yield None
+                    continue
+                event_id, data = json.loads(message['data'])
+                if is_newer(event_id, last):
+                    last = event_key(event_id)
+                    yield event_id, data
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+class LocalBroker:
+    """
+    In-process stand-in for RedisBroker when BOOKING_EVENTS_REDIS_URL isn't
+    set: listeners only hear about bookings saved in the same process, as
+    with runserver or in tests.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sequence = count(1)
+        self.history = defaultdict(lambda: deque(maxlen=settings.BOOKING_EVENTS_HISTORY))
+        self.listeners = defaultdict(set)
+
+    def publish(self, user_id, data):
+        with self.lock:
+            event_id = f'{next(self.sequence)}-0'
+            self.history[user_id].append((event_id, data))
+            listeners = list(self.listeners[user_id])
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (event_id, data))
+            except RuntimeError:
+                # The listener's event loop has closed
+                pass
+        return event_id
+
+    async def listen(self, user_id, last_event_id):
+        """
+        Same as RedisBroker.listen().
+        """
+        last = event_key(last_event_id)
+        listener = (asyncio.get_running_loop(), asyncio.Queue())
+        with self.lock:
+            self.listeners[user_id].add(listener)
+            backlog = [] if last is None else [item for item in self.history[user_id] if is_newer(item[0], last)]
+        try:
+            yield None
+            for event_id, data in backlog:
+                last = event_key(event_id)
+                yield event_id, data
+            while True:
+                try:
+                    event_id, data = await asyncio.wait_for(listener[1].get(), settings.BOOKING_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if is_newer(event_id, last):
+                    last = event_key(event_id)
+                    yield event_id, data
+        finally:
+            with self.lock:
+                self.listeners[user_id].discard(listener)
+
+
+@lru_cache(maxsize=None)
+def _broker(url):
+    return RedisBroker(url) if url else LocalBroker()
+
+
+def get_broker():
+    return _broker(settings.BOOKING_EVENTS_REDIS_URL)
+
+
+def booking_event(booking, event, previous_status=None):
+    return json.dumps({
+        'event': event,
+        'booking': {
+            'id': booking.pk,
+            'booking_id': booking.booking_id,
+            'user': booking.user_id,
+            'service_provider': booking.service_provider_id,
+            'date': booking.date,
+            'time_slot': booking.time_slot,
+            'status': booking.status,
+            'previous_status': previous_status,
+        },
+    }, cls=DjangoJSONEncoder)
+
+
+def publish_booking_event(booking, event, previous_status=None):
+    """
+    Sends the event to the booking's customer and provider. A Redis outage
+    loses the event rather than failing the request that saved the booking;
+    clients catch up from their booking lists.
+    """
+    data = booking_event(booking, event, previous_status)
+    try:
+        for user_id in {booking.user_id, booking.service_provider_id}:
+            get_broker().publish(user_id, data)
+    except redis.RedisError:
+        pass
+
+
+def format_event(event_id, data):
+    event = json.loads(data)['event']
+    return f'id: {event_id}\nevent: {event}\ndata: {data}\n\n'
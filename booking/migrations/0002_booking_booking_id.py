@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='booking_id',
+            field=models.CharField(blank=True, editable=False, max_length=8, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from utils.changes import track_changes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_booking_booking_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'change_seq'], name='booking_user_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['service_provider', 'change_seq'], name='booking_provider_changes_idx'),
+        ),
+        track_changes('booking_booking', 'updated_at', backfill_from='created_at'),
+    ]
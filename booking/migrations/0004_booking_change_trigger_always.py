@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from utils.changes import fire_always
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_booking_change_tracking'),
+    ]
+
+    operations = [
+        fire_always('booking_booking'),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from registration.models import User
 import random
 import string
@@ -16,12 +17,19 @@ class Booking(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
     booking_id = models.CharField(max_length=8, unique=True, blank=True, null=True, editable=False)
+    # Both set by a database trigger on every change (see utils.changes)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.user} booked {self.service_provider} on {self.date} at {self.time_slot} - {self.status}"
 
     class Meta:
         unique_together = ('service_provider', 'date', 'time_slot')
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='booking_user_changes_idx'),
+            models.Index(fields=['service_provider', 'change_seq'], name='booking_provider_changes_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.booking_id:
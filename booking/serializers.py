@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Booking
 from registration.models import User
+from registration.serializers import ProviderSerializer
+from utils.fieldsets import SparseFieldsetMixin, full_name
 from datetime import date, time
 from django.utils import timezone
 
@@ -41,13 +43,17 @@ class BookingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class UserBookingSerializer(serializers.ModelSerializer):
-    service_provider_id = serializers.IntegerField(source='service_provider.id')
+class UserBookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # The foreign key column, so the id alone needs no join
+    service_provider_id = serializers.IntegerField()
     service_provider_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Booking
         fields = ['id', 'date', 'time_slot', 'service_provider_id', 'service_provider_name', 'status']
+        field_paths = {'service_provider_name': ['service_provider__first_name', 'service_provider__last_name']}
+        row_fields = {'service_provider_name': full_name('service_provider')}
+        expandable_fields = {'service_provider': (ProviderSerializer, 'service_provider')}
 
     def get_service_provider_name(self, obj):
         provider = obj.service_provider
@@ -56,13 +62,15 @@ class UserBookingSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProviderBookingSerializer(serializers.ModelSerializer):
-    customer_id = serializers.IntegerField(source='user.id')
+class ProviderBookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    customer_id = serializers.IntegerField(source='user_id')
     customer_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Booking
         fields = ['id', 'date', 'time_slot', 'customer_id', 'customer_name', 'status']
+        field_paths = {'customer_name': ['user__first_name', 'user__last_name']}
+        row_fields = {'customer_name': full_name('user')}
 
     def get_customer_name(self, obj):
         customer = obj.user
@@ -75,14 +83,23 @@ class AvailableSlotsSerializer(serializers.Serializer):
     date = serializers.DateField()
     service_provider_id = serializers.IntegerField()
 
-    def validate_service_provider_id(self, value):
-        try:
-            user = User.objects.get(pk=value)
-            if user.user_type != "SERVICE_PROVIDER":
-                raise serializers.ValidationError("The provided ID does not belong to a service provider.")
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Service provider not found.")
-        return value
+    async def avalidate_service_provider_id(self):
+        """
+        The provider lookup, run through the async ORM once is_valid() has
+        passed. Adds the error under service_provider_id and returns False if
+        the id isn't a service provider's.
+        """
+        user_type = await User.objects.filter(
+            pk=self.validated_data['service_provider_id']
+        ).values_list('user_type', flat=True).afirst()
+        if user_type is None:
+            message = "Service provider not found."
+        elif user_type != "SERVICE_PROVIDER":
+            message = "The provided ID does not belong to a service provider."
+        else:
+            return True
+        self._errors = {'service_provider_id': [serializers.ErrorDetail(message, code='invalid')]}
+        return False
 
     def validate_date(self, value):
         if value < date.today():
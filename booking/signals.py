@@ -0,0 +1,39 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+
+from .events import publish_booking_event
+from .models import Booking
+
+# What post_save receivers compare a booking against: the booking events
+# here, and the daily stats and tombstones in registration.signals
+SAVED_FIELDS = ('date', 'service_provider_id', 'status', 'user_id')
+
+
+@receiver(pre_save, sender=Booking, dispatch_uid='booking_snapshot_pre_save')
+def snapshot_booking(sender, instance, **kwargs):
+    instance._saved_row = None
+    if instance.pk:
+        instance._saved_row = sender.objects.filter(pk=instance.pk).values(*SAVED_FIELDS).first()
+
+
+def saved_row(booking):
+    """
+    The booking's SAVED_FIELDS as they were before the save in progress, or
+    None for a new booking. Loaded once per save, for every receiver.
+    """
+    return getattr(booking, '_saved_row', None)
+
+
+@receiver(post_save, sender=Booking, dispatch_uid='booking_events_post_save')
+def announce_booking_change(sender, instance, created, using, **kwargs):
+    previous = saved_row(instance)
+    if created:
+        event, previous_status = 'booking.created', None
+    elif previous and previous['status'] != instance.status:
+        event, previous_status = 'booking.status_changed', previous['status']
+    else:
+        return
+    transaction.on_commit(partial(publish_booking_event, instance, event, previous_status), using=using)
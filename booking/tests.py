@@ -1,3 +1,364 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import date, time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from registration.models import User
+from review.models import Review
+from service.models import Service
+from utils.admin_actions import export_as_csv_action, get_related_paths
+from utils.fixtures import ProviderCustomerMixin, RowMapperMixin
+from utils.paginator import EstimatedCountPaginator
+from .admin import BookingAdmin
+from .events import _broker
+from .models import Booking
+from .serializers import ProviderBookingSerializer, UserBookingSerializer
+
+
+class BookingExportTests(ProviderCustomerMixin, TestCase):
+    fields = ['booking_id', 'user.email', 'service_provider.category.category', 'status']
+
+    def setUp(self):
+        super().setUp()
+        for index in range(5):
+            customer = User.objects.create_user(
+                username=f'customer{index}@example.com', email=f'customer{index}@example.com',
+                password='Passw0rd!', first_name='Asha', last_name='Khan', user_type='USER',
+            )
+            Booking.objects.create(
+                user=customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10 + index, 0)
+            )
+
+    def test_related_paths_follow_dotted_fields(self):
+        self.assertEqual(
+            get_related_paths(Booking, self.fields + ['service_provider']),
+            ['service_provider', 'service_provider__category', 'user'],
+        )
+
+    def test_export_streams_rows_in_a_single_query(self):
+        action = export_as_csv_action(fields=self.fields)
+        with self.assertNumQueries(1):
+            response = action(None, None, Booking.objects.all())
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(lines[0], ','.join(self.fields))
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all(line.endswith(',Plumber,Pending') for line in lines[1:]))
+
+
+class BookingAdminChangelistTests(TestCase):
+    def setUp(self):
+        service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        self.provider = User.objects.create_user(
+            username='provider@example.com', email='provider@example.com', password='Passw0rd!',
+            first_name='Ravi', last_name='Das', user_type='SERVICE_PROVIDER', category=service,
+        )
+        self.client.force_login(self.admin)
+        self.added = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            customer = User.objects.create_user(
+                username=f'customer{self.added}@example.com', email=f'customer{self.added}@example.com',
+                password='Passw0rd!', first_name='Asha', last_name='Khan', user_type='USER',
+            )
+            Booking.objects.create(
+                user=customer, service_provider=self.provider,
+                date=date(2030, 1, 1 + self.added // 8), time_slot=time(10 + self.added % 8, 0),
+            )
+            Review.objects.create(reviewer=customer, service_provider=self.provider, rating=4)
+            self.added += 1
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for url in ('/admin/booking/booking/', '/admin/review/review/'):
+            self.add_rows(2)
+            small = self.changelist_queries(url)
+            self.add_rows(6)
+            self.assertEqual(self.changelist_queries(url), small, url)
+
+    def test_paginator_counts_exactly_without_postgres_estimate(self):
+        self.add_rows(3)
+        paginator = EstimatedCountPaginator(Booking.objects.order_by('pk'), 100)
+        self.assertEqual(paginator.count, 3)
+
+
+class BookingAdminSearchTests(TestCase):
+    def setUp(self):
+        service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        self.provider = User.objects.create_user(
+            username='ravi@example.com', email='ravi@example.com', password='Passw0rd!',
+            first_name='Ravi', last_name='Das', user_type='SERVICE_PROVIDER', category=service,
+        )
+        for index, (first_name, location) in enumerate((('Asha', 'Kolkata'), ('Meera', 'Pune'))):
+            customer = User.objects.create_user(
+                username=f'customer{index}@example.com', email=f'customer{index}@example.com',
+                password='Passw0rd!', first_name=first_name, last_name='Khan', user_type='USER', location=location,
+            )
+            Booking.objects.create(
+                user=customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10 + index, 0)
+            )
+            Review.objects.create(
+                reviewer=customer, service_provider=self.provider, rating=4, comment=f'{first_name} was happy',
+            )
+        self.client.force_login(self.admin)
+
+    def search(self, url, term):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'].result_count, [q['sql'] for q in ctx.captured_queries]
+
+    def test_booking_search_matches_related_users_by_subquery(self):
+        self.assertEqual(self.search('/admin/booking/booking/', 'asha')[0], 1)
+        self.assertEqual(self.search('/admin/booking/booking/', 'pune')[0], 1)
+        self.assertEqual(self.search('/admin/booking/booking/', 'ravi khan')[0], 2)
+        self.assertEqual(self.search('/admin/booking/booking/', 'nobody')[0], 0)
+
+        count, queries = self.search('/admin/booking/booking/', 'asha')
+        count_sql = next(sql for sql in queries if 'COUNT(*)' in sql)
+        self.assertNotIn('JOIN', count_sql)
+
+    def test_review_search_covers_comment_and_people(self):
+        self.assertEqual(self.search('/admin/review/review/', 'happy')[0], 2)
+        self.assertEqual(self.search('/admin/review/review/', 'meera')[0], 1)
+
+
+class BookingAutocompleteTests(TestCase):
+    def setUp(self):
+        self.service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        admin_user = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        self.providers = [
+            User.objects.create_user(
+                username=f'provider{index}@example.com', email=f'provider{index}@example.com',
+                password='Passw0rd!', first_name=name, last_name='Das', user_type='SERVICE_PROVIDER',
+                category=self.service, location='Kolkata',
+            )
+            for index, name in enumerate(('Amit', 'Bina', 'Chetan'))
+        ]
+        self.customer = User.objects.create_user(
+            username='customer@example.com', email='customer@example.com', password='Passw0rd!',
+            first_name='Asha', last_name='Khan', user_type='USER',
+        )
+        self.booking = Booking.objects.create(
+            user=self.customer, service_provider=self.providers[0], date=date(2030, 1, 1), time_slot=time(10, 0)
+        )
+        self.client.force_login(admin_user)
+
+    def providers_for(self, **params):
+        response = self.client.get('/admin/booking/booking/autocomplete/providers/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_providers_are_filtered_to_free_ones(self):
+        data = self.providers_for(date='2030-01-01', time_slot='10:00')
+        self.assertEqual([row['text'] for row in data['results']], [
+            'Bina Das (Plumber, Kolkata)', 'Chetan Das (Plumber, Kolkata)',
+        ])
+        data = self.providers_for(date='2030-01-01', time_slot='10:00', booking_id=self.booking.pk)
+        self.assertEqual(len(data['results']), 3)
+        data = self.providers_for(term='plum', date='2030-01-01', time_slot='11:00')
+        self.assertEqual(len(data['results']), 3)
+
+    def test_results_are_paginated(self):
+        with mock.patch.object(BookingAdmin, 'autocomplete_page_size', 2):
+            first = self.providers_for()
+            second = self.providers_for(page=2)
+        self.assertEqual((len(first['results']), first['pagination']['more']), (2, True))
+        self.assertEqual((len(second['results']), second['pagination']['more']), (1, False))
+
+    def test_customer_search(self):
+        response = self.client.get('/admin/booking/booking/autocomplete/customers/', {'term': 'khan'})
+        self.assertEqual(response.json()['results'], [
+            {'id': str(self.customer.pk), 'text': 'Asha Khan (customer@example.com)'},
+        ])
+
+    def test_add_form_does_not_load_every_user(self):
+        def add_page_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get('/admin/booking/booking/add/').status_code, 200)
+            return len(ctx.captured_queries)
+
+        add_page_queries()  # warm the content type cache
+        before = add_page_queries()
+        for index in range(5):
+            User.objects.create_user(
+                username=f'extra{index}@example.com', email=f'extra{index}@example.com', password='Passw0rd!',
+                first_name='Extra', last_name=str(index), user_type='SERVICE_PROVIDER', category=self.service,
+            )
+        self.assertEqual(add_page_queries(), before)
+
+    def test_category_name_follows_service(self):
+        self.assertEqual(self.providers[0].category_name, 'Plumber')
+        self.service.category = 'Plumbing'
+        self.service.save()
+        self.providers[0].refresh_from_db()
+        self.assertEqual(self.providers[0].category_name, 'Plumbing')
+
+
+class BookingSlotsTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_slots_check_the_provider_with_the_async_orm(self):
+        Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 2), time_slot=time(10, 0),
+        )
+        response = self.client.post(
+            '/booking/slots/', {'date': '2030-01-02', 'service_provider_id': self.provider.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['available_slots'][0], '11:00')
+
+        response = self.client.post(
+            '/booking/slots/', {'date': '2030-01-02', 'service_provider_id': self.customer.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'service_provider_id': ['The provided ID does not belong to a service provider.'],
+        })
+
+
+class BookingChangeTrackingTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10, 0)
+        )
+
+    def test_trigger_numbers_every_change(self):
+        self.booking.refresh_from_db()
+        created = self.booking.change_seq
+        self.assertGreater(created, 0)
+        # Saving the row as it is doesn't count as a change
+        self.booking.save()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.change_seq, created)
+        # Nor does the path the change takes
+        Booking.objects.filter(pk=self.booking.pk).update(status='COMPLETE')
+        self.booking.refresh_from_db()
+        self.assertGreater(self.booking.change_seq, created)
+        self.assertGreater(self.booking.updated_at, self.booking.created_at)
+
+
+class BookingRowMapperTests(RowMapperMixin, TestCase):
+    def test_rows_match_the_serializers(self):
+        bookings = Booking.objects.order_by('pk')
+        self.assertMatchesSerializer(UserBookingSerializer, bookings)
+        self.assertMatchesSerializer(
+            UserBookingSerializer, bookings, ['status'], {'service_provider': {'category': {}}},
+        )
+        self.assertMatchesSerializer(ProviderBookingSerializer, bookings)
+
+    def test_mappers_are_compiled_once_per_fieldset(self):
+        self.assertIs(UserBookingSerializer.row_mapper(['id']), UserBookingSerializer.row_mapper(['id']))
+        self.assertIsNot(UserBookingSerializer.row_mapper(['id']), UserBookingSerializer.row_mapper())
+
+
+@override_settings(BOOKING_EVENTS_REDIS_URL='', BOOKING_EVENTS_HEARTBEAT=5)
+class BookingEventsTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh in-process broker, without the events of earlier tests
+        _broker.cache_clear()
+        self.addCleanup(_broker.cache_clear)
+
+    def open_stream(self, user, **headers):
+        return self.async_client.get(
+            '/booking/events/', headers={'Authorization': f'Bearer {AccessToken.for_user(user)}', **headers}
+        )
+
+    def save_booking(self, booking=None, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            if booking is None:
+                return Booking.objects.create(
+                    user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10, 0)
+                )
+            for name, value in changes.items():
+                setattr(booking, name, value)
+            booking.save()
+            return booking
+
+    async def next_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 5)
+        lines = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+        return lines['id'], lines['event'], json.loads(lines['data'])['booking']
+
+    async def test_customer_and_provider_hear_about_their_bookings(self):
+        customer = (await self.open_stream(self.customer)).streaming_content
+        provider = (await self.open_stream(self.provider)).streaming_content
+        for stream in (customer, provider):
+            # Once the first chunk is out the broker is listening
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n: keep-alive\n\n')
+
+        booking = await sync_to_async(self.save_booking)()
+        for stream in (customer, provider):
+            _, event, data = await self.next_event(stream)
+            self.assertEqual((event, data['id'], data['status']), ('booking.created', booking.pk, 'PENDING'))
+
+        # Saving without a status change isn't announced
+        await sync_to_async(self.save_booking)(booking, time_slot=time(11, 0))
+        await sync_to_async(self.save_booking)(booking, status='COMPLETE')
+        _, event, data = await self.next_event(customer)
+        self.assertEqual(event, 'booking.status_changed')
+        self.assertEqual((data['status'], data['previous_status']), ('COMPLETE', 'PENDING'))
+        await customer.aclose()
+        await provider.aclose()
+
+    async def test_reconnecting_client_gets_the_events_it_missed(self):
+        booking = await sync_to_async(self.save_booking)()
+        await sync_to_async(self.save_booking)(booking, status='COMPLETE')
+        stream = (await self.open_stream(self.customer)).streaming_content
+        await anext(stream)
+        # Without Last-Event-ID a client starts from new events only
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(stream), 0.2)
+        await stream.aclose()
+
+        first_id = _broker('').history[self.customer.pk][0][0]
+        stream = (await self.open_stream(self.customer, **{'Last-Event-ID': first_id})).streaming_content
+        await anext(stream)
+        _, event, data = await self.next_event(stream)
+        self.assertEqual((event, data['status']), ('booking.status_changed', 'COMPLETE'))
+        await stream.aclose()
+
+    async def test_streams_close_at_the_cap(self):
+        with override_settings(BOOKING_EVENTS_MAX_SECONDS=0):
+            stream = (await self.open_stream(self.customer)).streaming_content
+            await anext(stream)
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(anext(stream), 5)
+        self.assertFalse(_broker('').listeners[self.customer.pk])
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/booking/events/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/booking/events/', headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+    def test_not_served_under_wsgi(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(self.customer)}'
+        self.assertEqual(self.client.get('/booking/events/').status_code, 501)
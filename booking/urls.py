@@ -5,6 +5,7 @@ from .views import (
     ServiceProviderBookingsView,
     AvailableSlotsView,
     UpdateBookingStatusView,
+    BookingEventsView,
 )
 
 urlpatterns = [
@@ -13,4 +14,5 @@ urlpatterns = [
     path('provider-bookings/', ServiceProviderBookingsView.as_view(), name='provider-bookings'),
     path('slots/', AvailableSlotsView.as_view(), name='available-slots'),
     path('update-status/<int:pk>/', UpdateBookingStatusView.as_view(), name='update-booking-status'),
+    path('events/', BookingEventsView.as_view(), name='booking-events'),
 ]
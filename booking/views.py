@@ -1,12 +1,22 @@
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from datetime import time
+from time import monotonic
 from django.db import IntegrityError
 
 from registration.models import User
+from .events import format_event, get_broker
 from .models import Booking
 from .serializers import (
     BookingSerializer,
@@ -55,13 +65,14 @@ class UserBookingsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        bookings = Booking.objects.filter(user=user)
-        serializer = UserBookingSerializer(bookings, many=True)
+        fields, expand = UserBookingSerializer.fieldset(request)
+        bookings = UserBookingSerializer.values_queryset(Booking.objects.filter(user=user), fields, expand)
+        to_row = UserBookingSerializer.row_mapper(fields, expand)
 
         return Response(
             {
                 "message": "Bookings retrieved successfully",
-                "bookings": serializer.data
+                "bookings": [to_row(booking) for booking in bookings]
             },
             status=status.HTTP_200_OK
         )
@@ -79,31 +90,33 @@ class ServiceProviderBookingsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        bookings = Booking.objects.filter(service_provider=user)
-        serializer = ProviderBookingSerializer(bookings, many=True)
+        bookings = ProviderBookingSerializer.values_queryset(Booking.objects.filter(service_provider=user))
+        to_row = ProviderBookingSerializer.row_mapper()
         return Response(
             {
                 "message": "Bookings retrieved successfully",
-                "bookings": serializer.data
+                "bookings": [to_row(booking) for booking in bookings]
             },
             status=status.HTTP_200_OK
         )
 
 
-class AvailableSlotsView(APIView):
+class AvailableSlotsView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         serializer = AvailableSlotsSerializer(data=request.data)
-        if serializer.is_valid():
+        if serializer.is_valid() and await serializer.avalidate_service_provider_id():
             date_value = serializer.validated_data['date']
             service_provider_id = serializer.validated_data['service_provider_id']
 
             all_slots = [time(h, 0) for h in range(10, 18)]
-            booked_slots = Booking.objects.filter(
-                service_provider_id=service_provider_id,
-                date=date_value
-            ).values_list('time_slot', flat=True)
+            booked_slots = [
+                slot async for slot in Booking.objects.filter(
+                    service_provider_id=service_provider_id,
+                    date=date_value
+                ).values_list('time_slot', flat=True)
+            ]
 
             available_slots = [slot.strftime('%H:%M') for slot in all_slots if slot not in booked_slots]
 
@@ -134,3 +147,55 @@ class UpdateBookingStatusView(APIView):
             return Response({"message": "Booking status updated successfully", "booking": serializer.data}, status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BookingEventsView(View):
+    """
+    Server-sent events stream of booking.created and booking.status_changed
+    events for the authenticated customer or provider, in place of polling
+    my-bookings/ and provider-bookings/. A reconnecting client sends the
+    last id it saw in Last-Event-ID (or ?last_event_id=) and first gets the
+    events it missed. Streams close after BOOKING_EVENTS_MAX_SECONDS, which
+    EventSource clients reconnect from transparently; that cap is also how
+    long the stream of a client that went away keeps its broker listener.
+
+    Served by the ASGI application only: under WSGI every open stream would
+    hold a sync worker.
+    """
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"detail": "Booking events are only served by the ASGI application."},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        try:
+            authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            return JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED)
+        if authenticated is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(
+            self.stream(authenticated[0].pk, last_event_id), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, user_id, last_event_id):
+        deadline = monotonic() + settings.BOOKING_EVENTS_MAX_SECONDS
+        events = get_broker().listen(user_id, last_event_id)
+        # Sent with the first keep-alive, which comes once the broker listens
+        prefix = f'retry: {settings.BOOKING_EVENTS_RETRY_MS}\n\n'
+        try:
+            async for event in events:
+                yield prefix + (': keep-alive\n\n' if event is None else format_event(*event))
+                prefix = ''
+                if monotonic() >= deadline:
+                    break
+        finally:
+            await events.aclose()
@@ -1,6 +1,7 @@
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 load_dotenv()
@@ -38,8 +39,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.slow_queries.SlowQueryMiddleware',
+    'utils.profiling.ProfilingMiddleware',
+    'utils.memory.MemoryTrackingMiddleware',
+    'utils.tracing.TracingMiddleware',
+    'utils.metrics.MetricsMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'utils.middleware.CompressionMiddleware',
+    'utils.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +61,7 @@ ROOT_URLCONF = 'fixly.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'utils.tracing.TracedDjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),
         ],
@@ -71,6 +79,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'fixly.wsgi.application'
 
+# DATABASE_CONN_MAX_AGE keeps a worker's connection open for that many seconds
+# instead of reconnecting on every request (0 reconnects every time, which is
+# what the ASGI profile needs: each async request queries from a new thread).
+# A reused connection is pinged before the first query of each request.
+#
+# DATABASE_STATEMENT_TIMEOUT (milliseconds) makes PostgreSQL cancel runaway
+# queries. DATABASE_POOLER=transaction is for PgBouncer in transaction pooling
+# mode: server-side cursors are off and nothing is set on the connection, so
+# statement_timeout (and timezone 'UTC') must be set on the role instead.
+DATABASE_POOLER = os.getenv('DATABASE_POOLER', '')
+DATABASE_STATEMENT_TIMEOUT = int(os.getenv('DATABASE_STATEMENT_TIMEOUT', '0'))
+if DATABASE_POOLER not in ('', 'transaction'):
+    raise ImproperlyConfigured("DATABASE_POOLER must be empty or 'transaction'.")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -79,8 +101,40 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes'),
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_POOLER == 'transaction',
+        'OPTIONS': {},
     }
 }
+if DATABASE_STATEMENT_TIMEOUT:
+    if DATABASE_POOLER:
+        raise ImproperlyConfigured(
+            'DATABASE_STATEMENT_TIMEOUT is sent as a connection option, which a transaction pooler '
+            'rejects; set statement_timeout on the database role instead.'
+        )
+    DATABASES['default']['OPTIONS']['options'] = f'-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}'
+
+# Read replicas, as comma separated host[:port][/name] entries sharing the
+# primary's credentials. utils.db_router sends reads made while serving
+# GET/HEAD/OPTIONS requests to one that is up and at most
+# DATABASE_REPLICA_MAX_LAG seconds behind; a client that wrote reads from the
+# primary for DATABASE_REPLICA_STICKY_SECONDS afterwards (through the cache, so
+# replicas require a Redis cache, see CACHE_REDIS_URL below).
+DATABASE_REPLICAS = []
+for index, entry in enumerate(filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1):
+    address, _, name = entry.strip().partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica{index}'] = dict(
+        DATABASES['default'],
+        HOST=host, PORT=port or DATABASES['default']['PORT'], NAME=name or DATABASES['default']['NAME'],
+        OPTIONS=dict(DATABASES['default']['OPTIONS'], connect_timeout=2),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '5'))
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '10'))
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,6 +187,95 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (instrumented so /metrics reports hits and misses): per-process
+# memory, or Redis at CACHE_REDIS_URL. Read replicas need a cache all workers
+# share for their read-your-writes pin, so with DATABASE_REPLICAS it falls back
+# to REDIS_URL and is required.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+if DATABASE_REPLICAS and not CACHE_REDIS_URL:
+    CACHE_REDIS_URL = os.getenv('REDIS_URL', '')
+    if not CACHE_REDIS_URL:
+        raise ImproperlyConfigured(
+            'DATABASE_REPLICAS needs CACHE_REDIS_URL (or REDIS_URL): clients that wrote are pinned to the '
+            'primary through the cache, which a per-process cache would only honour on the same worker.'
+        )
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'utils.metrics.InstrumentedRedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'utils.metrics.InstrumentedLocMemCache',
+        }
+    }
+
+# Queries slower than this are logged to the SlowQuery admin table (0 turns
+# the log off), a share of them with EXPLAIN (ANALYZE, BUFFERS); only the
+# newest SLOW_QUERY_LOG_SIZE rows are kept
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', '5000'))
+
+# Requests carrying a signed PROFILING_HEADER (manage.py profiling_token), or
+# picked at PROFILING_SAMPLE_RATE, are run under cProfile and saved to
+# PROFILING_DIR with their query timeline
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_HEADER = 'X-Fixly-Profile'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', '3600'))
+
+# A MEMORY_TRACKING_SAMPLE_RATE share of requests is traced with tracemalloc
+# (MEMORY_TRACKING_FRAMES deep) and recorded to MEMORY_TRACKING_DIR for
+# manage.py memory_report
+MEMORY_TRACKING_DIR = os.getenv('MEMORY_TRACKING_DIR', os.path.join(BASE_DIR, 'memory'))
+MEMORY_TRACKING_SAMPLE_RATE = float(os.getenv('MEMORY_TRACKING_SAMPLE_RATE', '0'))
+MEMORY_TRACKING_FRAMES = int(os.getenv('MEMORY_TRACKING_FRAMES', '1'))
+MEMORY_TRACKING_TOP_SITES = 10
+
+# A TRACING_SAMPLE_RATE share of requests gets spans for the view, SQL, cache,
+# templates and SMTP, exported to TRACING_FILE as JSON lines and rotated at
+# TRACING_FILE_MAX_BYTES. Set TRACING_TRUST_TRACEPARENT when only internal
+# services reach the app, to follow the sampling flag of their traceparent
+# header (once tracing is on) instead of the rate.
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '0'))
+TRACING_TRUST_TRACEPARENT = os.getenv('TRACING_TRUST_TRACEPARENT', 'false').lower() in ('1', 'true', 'yes')
+TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(BASE_DIR, 'traces', 'spans.jsonl'))
+TRACING_FILE_MAX_BYTES = int(os.getenv('TRACING_FILE_MAX_BYTES', str(50 * 1024 * 1024)))
+TRACING_FILE_BACKUPS = int(os.getenv('TRACING_FILE_BACKUPS', '3'))
+
+# Booking change events for /booking/events/: kept per user in Redis streams
+# and announced over pub/sub, or held in-process when no Redis URL is set
+# (one process only, e.g. runserver and tests). Django 4.2 doesn't tell a
+# streaming response that its client has gone, and uvicorn drops writes to a
+# closed connection without an error, so a dead stream holds its listener
+# until BOOKING_EVENTS_MAX_SECONDS; EventSource reconnects after each cap and
+# resumes from Last-Event-ID, so it is kept short
+BOOKING_EVENTS_REDIS_URL = os.getenv('BOOKING_EVENTS_REDIS_URL', os.getenv('REDIS_URL', ''))
+BOOKING_EVENTS_HISTORY = int(os.getenv('BOOKING_EVENTS_HISTORY', '1000'))
+BOOKING_EVENTS_HEARTBEAT = 15
+BOOKING_EVENTS_MAX_SECONDS = int(os.getenv('BOOKING_EVENTS_MAX_SECONDS', '60'))
+BOOKING_EVENTS_RETRY_MS = 3000
+
+# /changes/ delta sync: rows per page, how long a change is re-sent before the
+# token moves past it (longer than any booking or review transaction runs),
+# and how long deletions are remembered, i.e. how old a sync token may be
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '500'))
+CHANGES_SETTLE_SECONDS = float(os.getenv('CHANGES_SETTLE_SECONDS', '5'))
+CHANGES_TOMBSTONE_DAYS = int(os.getenv('CHANGES_TOMBSTONE_DAYS', '30'))
+
+# /batch/: most requests one batch may hold, and threads (each with its own
+# database connection) running its read-only requests in parallel
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+
+# Prometheus metrics endpoint; scrapers send METRICS_TOKEN as a bearer token.
+# Without one it is only served with DEBUG on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -140,8 +283,21 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'utils.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'utils.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# JSON responses to GETs (and to POST /batch/) at least this large are
+# compressed with brotli or gzip
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
 AUTH_USER_MODEL = 'registration.User'
 
 CORS_ALLOWED_ORIGINS = [
@@ -249,7 +405,7 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'utils.metrics.InstrumentedEmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -4,10 +4,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 from registration.admin import custom_admin_site
 from django.views.generic import TemplateView
+from utils.metrics import metrics_view
 
 urlpatterns = [
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
     path('admin/', custom_admin_site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('registration.urls')),
     path('services/', include('service.urls')),
     path('review/', include('review.urls')),
@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+# Workers share Prometheus samples through files in this directory; it must be
+# set before any worker imports prometheus_client.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fixly-prometheus')
+)
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be merged into the new one
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # The last traced request's memory sample is otherwise only saved by the next request
+    from utils.memory import flush_pending
+    flush_pending()
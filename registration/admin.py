@@ -1,17 +1,26 @@
+import json
+import os
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Count, Avg
-from django.urls import path
+from django.db.models import Count, Avg, Sum, Q, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+from django.urls import path, reverse
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
+from django.utils.html import format_html
 from django.contrib.auth.models import Group
 from django.contrib.admin import SimpleListFilter
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 
-from .models import User
+from .models import User, DailyBookingStat, DailyRatingStat, DailyUserStat, ExportJob, SlowQuery
 from .forms import CustomUserChangeForm, CustomUserCreationForm
-from utils.admin_actions import export_as_csv_action
+from utils.admin_actions import export_as_csv_action, background_export_actions
+from utils.paginator import EstimatedCountPaginator
 from booking.models import Booking
 from review.models import Review
+from service.models import Service
 
 
 class CategoryFilter(SimpleListFilter):
@@ -29,6 +38,27 @@ class CategoryFilter(SimpleListFilter):
         return queryset
 
 
+def _per_user(queryset, field, aggregate):
+    """Correlated subquery computing one aggregate for the outer user row."""
+    return Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(value=aggregate).values('value')
+    )
+
+
+def annotate_user_stats(queryset):
+    """
+    Annotates rating and booking counts with one correlated subquery per column.
+    Unlike Avg/Count over joined reviews and bookings there is no fan-out join, each
+    subquery is an index lookup on the foreign key, and count() drops the unused
+    annotations so the changelist paginator counts the bare user table.
+    """
+    return queryset.annotate(
+        rating_avg=_per_user(Review.objects.all(), 'service_provider', Avg('rating')),
+        provider_booking_count=Coalesce(_per_user(Booking.objects.all(), 'service_provider', Count('pk')), 0),
+        user_booking_count=Coalesce(_per_user(Booking.objects.all(), 'user', Count('pk')), 0),
+    )
+
+
 class CustomUserAdmin(UserAdmin):
     form = CustomUserChangeForm
     add_form = CustomUserCreationForm
@@ -38,6 +68,9 @@ class CustomUserAdmin(UserAdmin):
         'location', 'get_category_display', 'get_rating', 'get_provider_bookings', 'get_user_bookings'
     )
     list_filter = ('user_type', CategoryFilter)
+    list_select_related = ('category',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('email', 'username', 'first_name', 'last_name', 'contact', 'location')
     ordering = ('email',)
     filter_horizontal = ()
@@ -60,11 +93,7 @@ class CustomUserAdmin(UserAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.annotate(
-            rating_avg=Avg('reviews_received__rating'),
-            provider_booking_count=Count('provider_bookings', distinct=True),
-            user_booking_count=Count('bookings', distinct=True)
-        )
+        return annotate_user_stats(qs)
 
     def get_rating(self, obj):
         return round(obj.rating_avg, 1) if obj.rating_avg else 0
@@ -95,10 +124,83 @@ class CustomUserAdmin(UserAdmin):
         export_as_csv_action(
             description="Export selected users to CSV",
             fields=['email', 'username', 'first_name', 'last_name', 'user_type', 'contact', 'location']
-        )
+        ),
+        *background_export_actions(
+            ['user_id', 'email', 'username', 'first_name', 'last_name', 'user_type', 'contact', 'location',
+             'category.category', 'date_joined'],
+            watermark_field='date_joined',
+        ),
     ]
 
 
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'model_label', 'file_format', 'status', 'get_progress', 'since', 'watermark',
+        'requested_by', 'created_at', 'finished_at', 'get_download_link',
+    )
+    list_filter = ('status', 'file_format', 'model_label')
+    list_select_related = ('requested_by',)
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        custom_urls = [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='registration_exportjob_download'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def download_view(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk, status='COMPLETE')
+        if not self.has_view_permission(request, job) or not job.file:
+            raise Http404
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
+
+    def get_progress(self, obj):
+        return f"{obj.progress}% ({obj.processed_rows}/{obj.total_rows})"
+    get_progress.short_description = 'Progress'
+
+    def get_download_link(self, obj):
+        if obj.status != 'COMPLETE' or not obj.file:
+            return '-'
+        url = reverse(f'{self.admin_site.name}:registration_exportjob_download', args=[obj.pk])
+        return format_html('<a href="{}">Download</a>', url)
+    get_download_link.short_description = 'File'
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'get_duration', 'method', 'route', 'view', 'database', 'get_sql', 'has_plan')
+    list_filter = ('method', 'route', 'database')
+    search_fields = ('sql', 'view', 'route')
+    ordering = ('-id',)
+    readonly_fields = ('created_at', 'method', 'route', 'view', 'database', 'duration_ms', 'sql', 'params', 'stack', 'plan')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_duration(self, obj):
+        return f"{obj.duration_ms:.1f} ms"
+    get_duration.short_description = 'Duration'
+    get_duration.admin_order_field = 'duration_ms'
+
+    def get_sql(self, obj):
+        return obj.sql if len(obj.sql) <= 120 else obj.sql[:117] + '...'
+    get_sql.short_description = 'SQL'
+
+    def has_plan(self, obj):
+        return bool(obj.plan)
+    has_plan.boolean = True
+    has_plan.short_description = 'EXPLAIN'
+
+
 class CustomAdminSite(admin.AdminSite):
     site_header = 'Fixly Admin'
     site_title = 'Fixly Admin Portal'
@@ -118,54 +220,58 @@ class CustomAdminSite(admin.AdminSite):
         category_filter = request.GET.get("category")
         search_query = request.GET.get("search")
 
-        bookings = Booking.objects.all()
-        reviews = Review.objects.all()
-        users = User.objects.all()
+        # Read the pre-aggregated daily rollups so page load doesn't grow with history
+        booking_stats = DailyBookingStat.objects.all()
+        rating_stats = DailyRatingStat.objects.all()
+        user_stats = DailyUserStat.objects.all()
 
         if start_date:
-            bookings = bookings.filter(date__gte=start_date)
-            reviews = reviews.filter(created_at__date__gte=start_date)
+            booking_stats = booking_stats.filter(date__gte=start_date)
+            rating_stats = rating_stats.filter(date__gte=start_date)
         if end_date:
-            bookings = bookings.filter(date__lte=end_date)
-            reviews = reviews.filter(created_at__date__lte=end_date)
+            booking_stats = booking_stats.filter(date__lte=end_date)
+            rating_stats = rating_stats.filter(date__lte=end_date)
 
         if category_filter and category_filter != "all":
-            bookings = bookings.filter(service__category=category_filter)
-            reviews = reviews.filter(service_provider__services__category=category_filter)
+            booking_stats = booking_stats.filter(category__category=category_filter)
+            rating_stats = rating_stats.filter(category__category=category_filter)
 
         if search_query:
-            bookings = bookings.filter(
-                service_provider__first_name__icontains=search_query
-            ) | bookings.filter(
-                service_provider__email__icontains=search_query
-            )
-            reviews = reviews.filter(
-                service_provider__first_name__icontains=search_query
-            ) | reviews.filter(
-                service_provider__email__icontains=search_query
+            search = (
+                Q(service_provider__first_name__icontains=search_query) |
+                Q(service_provider__email__icontains=search_query)
             )
+            booking_stats = booking_stats.filter(search)
+            rating_stats = rating_stats.filter(search)
 
-        grouped = bookings.values("date").annotate(count=Count("id")).order_by("date")
-        categories = Booking.objects.values_list('service__category', flat=True).distinct()
+        grouped = booking_stats.values("date").annotate(count=Sum("bookings")).order_by("date")
+        categories = Service.objects.values_list('category', flat=True).distinct()
+        new_users = dict(user_stats.values_list("user_type").annotate(total=Sum("new_users")).order_by())
+        ratings = rating_stats.aggregate(total=Sum("rating_sum"), count=Sum("rating_count"))
+        provider_name = ("service_provider__first_name", "service_provider__last_name")
 
         context = dict(
             self.each_context(request),
             statistics={
-                "total_users": users.filter(user_type="CUSTOMER").count(),
-                "total_providers": users.filter(user_type="SERVICE_PROVIDER").count(),
-                "total_bookings": bookings.count(),
-                "average_rating": round(reviews.aggregate(avg=Avg("rating"))["avg"] or 0, 2)
+                "total_users": new_users.get("USER", 0),
+                "total_providers": new_users.get("SERVICE_PROVIDER", 0),
+                "total_bookings": booking_stats.aggregate(total=Sum("bookings"))["total"] or 0,
+                "average_rating": round(ratings["total"] / ratings["count"], 2) if ratings["count"] else 0,
             },
             top_providers=[
-                {"name": f"{p['service_provider__first_name']} {p['service_provider__last_name']}", "bookings": p["bookings"]}
-                for p in bookings.values("service_provider__first_name", "service_provider__last_name").annotate(bookings=Count("id")).order_by("-bookings")[:5]
+                {"name": f"{p['service_provider__first_name']} {p['service_provider__last_name']}", "bookings": p["total"]}
+                for p in booking_stats.values("service_provider", *provider_name).annotate(total=Sum("bookings")).order_by("-total")[:5]
             ],
             top_rated=[
                 {"name": f"{p['service_provider__first_name']} {p['service_provider__last_name']}", "rating": round(p["rating"], 2)}
-                for p in reviews.values("service_provider__first_name", "service_provider__last_name").annotate(rating=Avg("rating")).order_by("-rating")[:5]
+                for p in rating_stats.values("service_provider", *provider_name).annotate(
+                    rating=Cast(Sum("rating_sum"), FloatField()) / Sum("rating_count")
+                ).filter(rating__isnull=False).order_by("-rating")[:5]
             ],
             categories=categories,
             bookings_over_time=grouped,
+            bookings_over_time_labels=json.dumps([str(row["date"]) for row in grouped]),
+            bookings_over_time_data=json.dumps([row["count"] for row in grouped]),
         )
         return TemplateResponse(request, "admin/dashboard.html", context)
 
@@ -173,6 +279,8 @@ class CustomAdminSite(admin.AdminSite):
 # Instantiate admin site and register models
 custom_admin_site = CustomAdminSite(name='custom_admin')
 custom_admin_site.register(User, CustomUserAdmin)
+custom_admin_site.register(ExportJob, ExportJobAdmin)
+custom_admin_site.register(SlowQuery, SlowQueryAdmin)
 
 # Register other models
 from service.models import Service
@@ -0,0 +1,150 @@
+import csv
+import os
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from .models import ExportJob
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending export job as running and returns it (None if idle).
+    """
+    with transaction.atomic():
+        job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+            status='PENDING'
+        ).order_by('created_at').first()
+        if job:
+            job.status = 'RUNNING'
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def _chunks(rows, chunk_size):
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_csv(path, header, chunks):
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        for chunk in chunks:
+            writer.writerows(chunk)
+
+
+def _write_parquet(path, header, chunks):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            frame = pd.DataFrame.from_records(chunk, columns=header)
+            for column in frame.columns:
+                # An all-null column has no type yet; store it as text
+                if frame[column].isna().all():
+                    frame[column] = frame[column].astype('string')
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+        if writer is None:
+            empty = pd.DataFrame({column: pd.Series(dtype='string') for column in header})
+            pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {
+    'CSV': ('csv', _write_csv),
+    'PARQUET': ('parquet', _write_parquet),
+}
+
+
+def changelist_queryset(model, job):
+    """
+    The rows the job's admin changelist showed: its filters and search,
+    applied by the model's ModelAdmin as the user who queued the job.
+    """
+    from .admin import custom_admin_site
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(job.changelist_query)
+    request.user = job.requested_by or AnonymousUser()
+    modeladmin = custom_admin_site._registry[model]
+    return modeladmin.get_changelist_instance(request).get_queryset(request)
+
+
+def run_export_job(job, chunk_size=5000):
+    """
+    Writes the rows selected by an export job to MEDIA_ROOT/exports in chunks,
+    recording progress on the job as each chunk is written.
+    """
+    try:
+        model = apps.get_model(job.model_label)
+        columns = [field.replace('.', '__') for field in job.fields]
+        queryset = model.objects.all()
+        if job.changelist_query:
+            queryset = changelist_queryset(model, job)
+        elif job.object_ids is not None:
+            queryset = queryset.filter(pk__in=job.object_ids)
+        if job.watermark_field:
+            if job.since:
+                queryset = queryset.filter(**{f'{job.watermark_field}__gt': job.since})
+            queryset = queryset.order_by(job.watermark_field, 'pk')
+        else:
+            queryset = queryset.order_by('pk')
+
+        job.total_rows = queryset.count()
+        job.save(update_fields=['total_rows'])
+
+        extension, write = WRITERS[job.file_format]
+        name = f"exports/{model._meta.model_name}-{job.pk}.{extension}"
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # The watermark rides along as a trailing column so the next incremental
+        # export starts exactly where this one stopped
+        select = columns + [job.watermark_field] if job.watermark_field else columns
+        rows = queryset.values_list(*select).iterator(chunk_size=chunk_size)
+        state = {'processed': 0, 'watermark': None}
+
+        def tracked_chunks():
+            for chunk in _chunks(rows, chunk_size):
+                if job.watermark_field:
+                    state['watermark'] = chunk[-1][-1]
+                    chunk = [row[:-1] for row in chunk]
+                yield chunk
+                state['processed'] += len(chunk)
+                ExportJob.objects.filter(pk=job.pk).update(processed_rows=state['processed'])
+
+        write(path, job.fields, tracked_chunks())
+
+        job.file.name = name
+        job.processed_rows = state['processed']
+        # Only whole-table exports can serve as the starting point for the next increment
+        whole_table = job.object_ids is None and not job.changelist_query
+        job.watermark = (state['watermark'] or job.since) if whole_table else None
+        job.status = 'COMPLETE'
+    except Exception as e:
+        job.status = 'FAILED'
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
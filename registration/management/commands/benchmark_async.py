@@ -0,0 +1,232 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from registration.models import User
+from registration.stats import rebuild_daily_stats
+from service.models import Service
+from utils.benchmark import (
+    BENCH_DOMAIN, BENCH_PASSWORD, RouteSamples, asgi_request, database_latency, database_options, git_revision,
+    seed_dataset, wsgi_request,
+)
+
+
+class Workload:
+    """
+    The endpoints with async views, each returning (method, path, data, headers).
+    """
+    def __init__(self):
+        bench_users = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        self.providers = list(bench_users.filter(user_type='SERVICE_PROVIDER').values_list('pk', flat=True))
+        customers = list(bench_users.filter(user_type='USER').order_by('pk')[:200])
+        if not self.providers or not customers:
+            raise CommandError('No benchmark data found; run without --skip-seed first.')
+        self.services = list(Service.objects.values_list('pk', flat=True))
+        self.tokens = [str(AccessToken.for_user(customer)) for customer in customers]
+        self.actions = [(3, self.slots), (3, self.providers_list), (3, self.reviews), (1, self.signup)]
+
+    def next(self, rng):
+        weights, actions = zip(*self.actions)
+        return rng.choices(actions, weights)[0](rng)
+
+    def slots(self, rng):
+        day = timezone.localdate() + timedelta(days=rng.randint(1, 60))
+        return 'POST', '/booking/slots/', {
+            'date': day.isoformat(), 'service_provider_id': rng.choice(self.providers),
+        }, {'Authorization': f'Bearer {rng.choice(self.tokens)}'}
+
+    def providers_list(self, rng):
+        return 'GET', '/providers/', {'category': rng.choice(self.services)}, {}
+
+    def reviews(self, rng):
+        return 'GET', '/review/all/', {'provider_id': rng.choice(self.providers)}, {}
+
+    def signup(self, rng):
+        return 'POST', '/register/customer/', {
+            'email': f'async-{rng.getrandbits(48):012x}@{BENCH_DOMAIN}', 'first_name': 'Load', 'last_name': 'Test',
+            'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD,
+            'contact': f'9{rng.randrange(10 ** 9):09d}', 'gender': 'Male',
+        }, {}
+
+
+def shares(total, parts):
+    return [total // parts + (i < total % parts) for i in range(parts)]
+
+
+def run_wsgi(workload, requests, concurrency, workers, seed):
+    """
+    `concurrency` clients against a pool of `workers` sync workers: a request
+    waits for a free worker, which it then holds until the response is sent.
+    """
+    application = get_wsgi_application()
+    pool = threading.BoundedSemaphore(workers)
+
+    def client(index, count):
+        rng = random.Random(seed * 1000 + index)
+        samples = defaultdict(RouteSamples)
+        try:
+            for _ in range(count):
+                method, path, data, headers = workload.next(rng)
+                start = time.perf_counter()
+                with pool:
+                    status = wsgi_request(application, method, path, data, headers)
+                record(samples, method, path, status, time.perf_counter() - start)
+        finally:
+            connections.close_all()
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(client, range(concurrency), shares(requests, concurrency)))
+    return time.perf_counter() - start, results
+
+
+def run_asgi(workload, requests, concurrency, seed):
+    """
+    `concurrency` clients against one event loop serving the ASGI application,
+    as a single uvicorn worker would.
+    """
+    application = get_asgi_application()
+
+    async def client(index, count):
+        rng = random.Random(seed * 1000 + index)
+        samples = defaultdict(RouteSamples)
+        for _ in range(count):
+            method, path, data, headers = workload.next(rng)
+            start = time.perf_counter()
+            status = await asgi_request(application, method, path, data, headers)
+            record(samples, method, path, status, time.perf_counter() - start)
+        return samples
+
+    async def main():
+        return await asyncio.gather(*[
+            client(index, count) for index, count in enumerate(shares(requests, concurrency))
+        ])
+
+    start = time.perf_counter()
+    # As in the ASGI deployment profile: a connection kept open by a
+    # request's thread would outlive the thread
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(database_options(alias, CONN_MAX_AGE=0))
+        results = asyncio.run(main())
+    return time.perf_counter() - start, results
+
+
+def record(samples, method, path, status, elapsed):
+    route = samples[f'{method} {path}']
+    route.latencies.append(elapsed)
+    route.statuses[status] += 1
+
+
+def merge(results, elapsed):
+    def stats(samples):
+        # Query counts aren't recorded; requests run outside this thread
+        report = samples.as_dict(elapsed)
+        report.pop('queries')
+        return report
+
+    total = RouteSamples()
+    routes = defaultdict(RouteSamples)
+    for samples in results:
+        for key, route in samples.items():
+            routes[key].merge(route)
+            total.merge(route)
+    return dict(
+        stats(total), duration_s=round(elapsed, 3),
+        routes={key: stats(routes[key]) for key in sorted(routes)},
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the sync (WSGI, fixed worker pool) and async (ASGI, one event loop) stacks on the '
+        'async endpoints at rising client concurrency, with injected database and SMTP latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=20_000, help='Bookings to seed')
+        parser.add_argument('--providers', type=int, default=200, help='Service providers to seed')
+        parser.add_argument('--customers', type=int, default=2_000, help='Customers to seed')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded rows')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Concurrent clients (repeatable, default 1, 10 and 50)',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per stack and concurrency level')
+        parser.add_argument('--workers', type=int, default=4, help='Sync workers the WSGI stack gets')
+        parser.add_argument('--db-latency', type=float, default=5, help='Milliseconds added to every SQL query')
+        parser.add_argument('--mail-latency', type=float, default=200, help='Milliseconds every OTP email takes')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request mixes')
+        parser.add_argument('--output', default='-', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+            self.stderr.write(f'Deleted {deleted} benchmark rows.')
+            return
+        if not options['skip_seed']:
+            seed_dataset(
+                options['bookings'], options['providers'], options['customers'],
+                seed=options['seed'], stdout=self.stderr,
+            )
+            rebuild_daily_stats()
+        workload = Workload()
+        # Requests run on connections of their own, in other threads
+        connections.close_all()
+
+        levels = options['concurrency'] or [1, 10, 50]
+        results = {'wsgi': {}, 'asgi': {}}
+        with override_settings(
+            EMAIL_BACKEND='utils.benchmark.LatencyEmailBackend',
+            BENCHMARK_EMAIL_LATENCY=options['mail_latency'] / 1000,
+        ), database_latency(query=options['db_latency'] / 1000):
+            for concurrency in levels:
+                elapsed, samples = run_wsgi(
+                    workload, options['requests'], concurrency, options['workers'], options['seed'],
+                )
+                results['wsgi'][str(concurrency)] = merge(samples, elapsed)
+                elapsed, samples = run_asgi(workload, options['requests'], concurrency, options['seed'])
+                results['asgi'][str(concurrency)] = merge(samples, elapsed)
+
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'options': {
+                key: options[key] for key in ('requests', 'workers', 'db_latency', 'mail_latency', 'seed')
+            },
+            'results': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        self.summarize(report, self.stderr)
+
+    def summarize(self, report, out):
+        out.write(
+            f"\n{'clients':>8} {'wsgi req/s':>11} {'asgi req/s':>11} {'wsgi p95':>10} {'asgi p95':>10}\n"
+        )
+        for level, sync in report['results']['wsgi'].items():
+            stats = report['results']['asgi'][level]
+            out.write(
+                f"{level:>8} {sync['throughput_rps']:>11.1f} {stats['throughput_rps']:>11.1f} "
+                f"{sync['latency_ms']['p95']:>8.0f}ms {stats['latency_ms']['p95']:>8.0f}ms\n"
+            )
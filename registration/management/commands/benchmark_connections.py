@@ -0,0 +1,110 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from utils.benchmark import database_latency, database_options, git_revision, summarize, wsgi_request
+
+MODES = {
+    'reconnect': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'persistent+health-checks': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+def run_mode(paths, requests, warmup):
+    """
+    Sends requests round-robin over `paths` through WSGIHandler from a single
+    thread, like one sync worker, and returns their latencies and the number
+    of connections opened for them.
+    """
+    application = get_wsgi_application()
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    def worker():
+        latencies = []
+        try:
+            for i in range(warmup + requests):
+                if i == warmup:
+                    connection_created.connect(count, weak=False)
+                start = time.perf_counter()
+                wsgi_request(application, 'GET', paths[i % len(paths)])
+                if i >= warmup:
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            connection_created.disconnect(count)
+            connections.close_all()
+        return latencies
+
+    # A thread of its own, so the caller's connection is left alone
+    with ThreadPoolExecutor(1) as executor:
+        latencies = executor.submit(worker).result()
+    return latencies, len(opened)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures per-request latency with a new database connection for every request against '
+        'persistent connections, with and without health checks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', action='append',
+            help='GET route to request (repeatable, default /services/, /providers/ and /review/all/)',
+        )
+        parser.add_argument('--requests', type=int, default=300, help='Requests per mode')
+        parser.add_argument('--warmup', type=int, default=10, help='Unrecorded requests before each mode')
+        parser.add_argument(
+            '--connect-latency', type=float, default=0,
+            help='Milliseconds added to opening a connection, e.g. the TLS and auth round trips to a hosted database',
+        )
+        parser.add_argument('--output', default='-', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/services/', '/providers/', '/review/all/']
+        modes = {}
+        with database_latency(connect=options['connect_latency'] / 1000):
+            for name, values in MODES.items():
+                with ExitStack() as stack:
+                    for alias in connections:
+                        stack.enter_context(database_options(alias, **values))
+                    latencies, opened = run_mode(paths, options['requests'], options['warmup'])
+                modes[name] = {
+                    'requests': len(latencies),
+                    'connections': opened,
+                    'latency_ms': summarize(latencies, 1000),
+                }
+        baseline = modes['reconnect']['latency_ms']['mean']
+        for stats in modes.values():
+            stats['saved_per_request_ms'] = round(baseline - stats['latency_ms']['mean'], 3)
+
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'options': {key: options[key] for key in ('requests', 'warmup', 'connect_latency')},
+            'paths': paths,
+            'modes': modes,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+
+        for name, stats in modes.items():
+            latency = stats['latency_ms']
+            self.stderr.write(
+                f"{name:<26} connections={stats['connections']:<5} mean={latency['mean']:>7.2f}ms "
+                f"p95={latency['p95']:>7.2f}ms saved={stats['saved_per_request_ms']:>6.2f}ms/request"
+            )
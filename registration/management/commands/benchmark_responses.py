@@ -0,0 +1,137 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from booking.models import Booking
+from registration.models import User
+from registration.stats import rebuild_daily_stats
+from utils.benchmark import BENCH_DOMAIN, git_revision, seed_dataset
+from utils.middleware import CompressionMiddleware, brotli
+from utils.renderers import ORJSONParser, ORJSONRenderer
+
+
+def cpu_ms(func, repeat):
+    """
+    Mean CPU time of `func` in milliseconds over `repeat` calls.
+    """
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return round((time.process_time() - start) / repeat * 1000, 3)
+
+
+def endpoints():
+    """
+    The largest API lists, fetched as the busiest customer and provider.
+    """
+    bench_bookings = Booking.objects.filter(user__email__endswith=f'@{BENCH_DOMAIN}')
+    customer = bench_bookings.values('user').annotate(total=Count('id')).order_by('-total').first()
+    provider = bench_bookings.values('service_provider').annotate(total=Count('id')).order_by('-total').first()
+    if not customer or not provider:
+        raise CommandError('No benchmark data found; run without --skip-seed first.')
+    customer = User.objects.get(pk=customer['user'])
+    provider = User.objects.get(pk=provider['service_provider'])
+    return [
+        ('/review/all/', None),
+        ('/providers/', None),
+        ('/services/', None),
+        ('/booking/my-bookings/', customer),
+        ('/booking/provider-bookings/', provider),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the stdlib and orjson renderers and parsers, and identity, gzip and brotli encodings, '
+        'on the largest API responses: bytes on the wire and CPU per request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=20_000, help='Bookings to seed')
+        parser.add_argument('--providers', type=int, default=200, help='Service providers to seed')
+        parser.add_argument('--customers', type=int, default=2_000, help='Customers to seed')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded rows')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed repetitions of each measurement')
+        parser.add_argument('--output', default='-', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+            self.stderr.write(f'Deleted {deleted} benchmark rows.')
+            return
+        if not options['skip_seed']:
+            seed_dataset(options['bookings'], options['providers'], options['customers'], stdout=self.stderr)
+            rebuild_daily_stats()
+
+        repeat = options['repeat']
+        encodings = ['identity', 'gzip'] + (['br'] if brotli else [])
+        results = {}
+        for path, user in endpoints():
+            client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+            data = client.get(path, **headers).data
+            body = ORJSONRenderer().render(data)
+
+            requests = {}
+            for encoding in encodings:
+                def request():
+                    return client.get(path, HTTP_ACCEPT_ENCODING=encoding, **headers)
+                requests[encoding] = {
+                    'bytes': len(request().content),
+                    'cpu_ms': cpu_ms(request, repeat),
+                }
+            results[path] = {
+                'render_cpu_ms': {
+                    'json': cpu_ms(lambda: JSONRenderer().render(data), repeat),
+                    'orjson': cpu_ms(lambda: ORJSONRenderer().render(data), repeat),
+                },
+                'parse_cpu_ms': {
+                    'json': cpu_ms(lambda: JSONParser().parse(io.BytesIO(body)), repeat),
+                    'orjson': cpu_ms(lambda: ORJSONParser().parse(io.BytesIO(body)), repeat),
+                },
+                'compress_cpu_ms': {
+                    'gzip': cpu_ms(lambda: compress_string(body), repeat),
+                    **({'br': cpu_ms(
+                        lambda: brotli.compress(body, quality=CompressionMiddleware.brotli_quality), repeat,
+                    )} if brotli else {}),
+                },
+                'requests': requests,
+            }
+
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'options': {'repeat': repeat},
+            'endpoints': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        self.summarize(report, self.stderr)
+
+    def summarize(self, report, out):
+        for path, stats in report['endpoints'].items():
+            render, parse = stats['render_cpu_ms'], stats['parse_cpu_ms']
+            out.write(
+                f"\n{path}\n  render json={render['json']:.2f}ms orjson={render['orjson']:.2f}ms  "
+                f"parse json={parse['json']:.2f}ms orjson={parse['orjson']:.2f}ms\n"
+            )
+            for encoding, request in stats['requests'].items():
+                compress = stats['compress_cpu_ms'].get(encoding, 0)
+                out.write(
+                    f"  {encoding:<8} {request['bytes']:>10} bytes  request cpu={request['cpu_ms']:>8.2f}ms "
+                    f"(compression {compress:.2f}ms)\n"
+                )
@@ -0,0 +1,399 @@
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from booking.models import Booking
+from registration.models import User
+from registration.stats import rebuild_daily_stats
+from review.models import Review
+from service.models import Service
+from utils.benchmark import (
+    BENCH_DOMAIN, BENCH_PASSWORD, git_revision, project_routes, run_scenario, seed_dataset,
+)
+
+# Routes the suite deliberately leaves alone
+EXCLUDED_ROUTES = {
+    '/create-admin/': 'creates a fixed admin@example.com account on GET',
+    '/booking/events/': 'a server-sent events stream, served by the ASGI application only',
+}
+
+
+class Context:
+    """
+    Seeded rows the scenarios draw from, plus per-user tokens minted outside
+    the timed requests.
+    """
+    def __init__(self, sample_size):
+        bench_users = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}')
+        self.providers = list(bench_users.filter(user_type='SERVICE_PROVIDER').order_by('pk'))
+        self.customers = list(bench_users.filter(user_type='USER').order_by('pk')[:sample_size])
+        if not self.providers or not self.customers:
+            raise CommandError('No benchmark data found; run without --skip-seed first.')
+        self.services = list(Service.objects.values_list('pk', flat=True))
+        self.admin = User.objects.filter(email=f'admin@{BENCH_DOMAIN}').first() or User.objects.create_superuser(
+            username=f'admin@{BENCH_DOMAIN}', email=f'admin@{BENCH_DOMAIN}', password=BENCH_PASSWORD,
+        )
+        self.tokens = {}
+        self.provider_bookings = {}
+
+    def token(self, user):
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(AccessToken.for_user(user))
+        return self.tokens[user.pk]
+
+    def bookings_of(self, provider):
+        if provider.pk not in self.provider_bookings:
+            self.provider_bookings[provider.pk] = list(
+                Booking.objects.filter(service_provider=provider).values_list('pk', flat=True)[:50]
+            )
+        return self.provider_bookings[provider.pk]
+
+    def signup(self, rng):
+        key = uuid.UUID(int=rng.getrandbits(128)).hex[:12]
+        return {
+            'email': f'signup-{key}@{BENCH_DOMAIN}', 'first_name': 'Load', 'last_name': 'Test',
+            'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD,
+            'contact': f'9{rng.randrange(10 ** 9):09d}', 'gender': 'Male',
+        }
+
+
+def as_customer(client, context, rng):
+    customer = rng.choice(context.customers)
+    client.token = context.token(customer)
+    return customer
+
+
+def as_provider(client, context, rng):
+    # Weighted like the seed data, so busy providers show up more often
+    index = min(int(rng.paretovariate(1)) - 1, len(context.providers) - 1)
+    provider = context.providers[index]
+    client.token = context.token(provider)
+    return provider
+
+
+def future_date(rng):
+    return (timezone.localdate() + timedelta(days=rng.randint(1, 60))).isoformat()
+
+
+# Anonymous browsing: service catalogue, provider directory and reviews
+
+def home(client, context, rng):
+    client.request('GET', '/')
+
+
+def list_services(client, context, rng):
+    client.request('GET', '/services/')
+
+
+def service_detail(client, context, rng):
+    client.request('GET', f'/services/{rng.choice(context.services)}/')
+
+
+def list_providers(client, context, rng):
+    client.request('GET', '/providers/', {'category': rng.choice(context.services)})
+
+
+def list_all_providers(client, context, rng):
+    client.request('GET', '/providers/')
+
+
+def provider_reviews(client, context, rng):
+    client.request('GET', '/review/all/', {'provider_id': rng.choice(context.providers).pk})
+
+
+def category_reviews(client, context, rng):
+    client.request('GET', '/review/all/', {'category': rng.choice(context.services)})
+
+
+def all_reviews(client, context, rng):
+    client.request('GET', '/review/all/')
+
+
+# Signed-in customers
+
+def check_slots(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('POST', '/booking/slots/', {
+        'date': future_date(rng), 'service_provider_id': rng.choice(context.providers).pk,
+    })
+
+
+def book_slot(client, context, rng):
+    as_customer(client, context, rng)
+    provider, day = rng.choice(context.providers), future_date(rng)
+    response = client.request('POST', '/booking/slots/', {'date': day, 'service_provider_id': provider.pk})
+    slots = response.json().get('available_slots') if response.status_code == 200 else None
+    if slots:
+        client.request('POST', '/booking/create/', {
+            'date': day, 'time_slot': rng.choice(slots), 'service_provider': provider.pk,
+        })
+
+
+def my_bookings(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('GET', '/booking/my-bookings/')
+
+
+def app_start(client, context, rng):
+    customer = as_customer(client, context, rng)
+    client.request('POST', '/batch/', {'requests': [
+        {'path': '/profile/'}, {'path': '/services/'}, {'path': '/booking/my-bookings/'},
+        {'path': f'/review/all/?reviewer_id={customer.pk}'},
+    ]})
+
+
+def sync_changes(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('GET', '/changes/')
+
+
+def customer_profile(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('GET', '/profile/')
+
+
+def update_customer(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('PATCH', '/update/customer/', {'last_name': str(rng.randrange(10 ** 6))})
+
+
+def write_review(client, context, rng):
+    as_customer(client, context, rng)
+    client.request('POST', '/review/create/', {
+        'service_provider': rng.choice(context.providers).pk, 'rating': rng.randint(1, 5), 'comment': 'Load test',
+    })
+
+
+def login(client, context, rng):
+    client.request('POST', '/login/', {'email': rng.choice(context.customers).email, 'password': BENCH_PASSWORD})
+
+
+def refresh(client, context, rng):
+    client.request('POST', '/refresh/', {'refresh': str(RefreshToken.for_user(rng.choice(context.customers)))})
+
+
+def logout(client, context, rng):
+    customer = as_customer(client, context, rng)
+    client.request('POST', '/logout/', {'refresh_token': str(RefreshToken.for_user(customer))})
+
+
+# Signed-in providers
+
+def provider_bookings(client, context, rng):
+    as_provider(client, context, rng)
+    client.request('GET', '/booking/provider-bookings/')
+
+
+def update_booking_status(client, context, rng):
+    provider = as_provider(client, context, rng)
+    bookings = context.bookings_of(provider)
+    if bookings:
+        client.request('PUT', f'/booking/update-status/{rng.choice(bookings)}/', {
+            'status': rng.choice(('PENDING', 'COMPLETE')),
+        })
+
+
+def update_provider(client, context, rng):
+    as_provider(client, context, rng)
+    client.request('PATCH', '/update/provider/', {'location': rng.choice(('Pune', 'Mumbai', 'Delhi'))})
+
+
+def provider_profile(client, context, rng):
+    as_provider(client, context, rng)
+    client.request('GET', '/profile/')
+
+
+# Sign-up flows
+
+def register_customer(client, context, rng):
+    data = context.signup(rng)
+    client.request('POST', '/register/customer/', data)
+    stored = cache.get(f"registration_otp_{data['email']}")
+    if stored:
+        client.request('POST', '/validate-otp/', {'email': data['email'], 'otp': stored['otp']})
+
+
+def resend_otp(client, context, rng):
+    client.request('POST', '/resend-otp/', {'email': context.signup(rng)['email']})
+
+
+def register_provider(client, context, rng):
+    data = dict(context.signup(rng), location='Pune', category=rng.choice(context.services))
+    client.request('POST', '/register/provider/', data)
+    # A wrong OTP keeps this to the cache lookup instead of creating an account
+    client.request('POST', '/validate-provider-otp/', {'email': data['email'], 'otp': 'x'})
+
+
+def resend_provider_otp(client, context, rng):
+    client.request('POST', '/resend-provider-otp/', {'email': context.signup(rng)['email']})
+
+
+# Staff using the admin
+
+def as_admin(client, context):
+    if '_auth_user_id' not in client.client.session:
+        client.client.force_login(context.admin)
+
+
+def admin_page(path, params=None):
+    def action(client, context, rng):
+        as_admin(client, context)
+        client.request('GET', path, params)
+    return action
+
+
+def admin_search(client, context, rng):
+    as_admin(client, context)
+    client.request('GET', '/admin/booking/booking/', {'q': rng.choice(context.customers).last_name})
+
+
+def admin_autocomplete(client, context, rng):
+    as_admin(client, context)
+    client.request('GET', '/admin/booking/booking/autocomplete/providers/', {'term': 'provider'})
+
+
+def scrape_metrics(client, context, rng):
+    client.request('GET', '/metrics', HTTP_AUTHORIZATION=f'Bearer {settings.METRICS_TOKEN}')
+
+
+SCENARIOS = {
+    'browse': [
+        (1, home), (4, list_services), (2, service_detail), (4, list_providers), (1, list_all_providers),
+        (4, provider_reviews), (1, category_reviews), (1, all_reviews),
+    ],
+    'customer': [
+        (6, check_slots), (3, book_slot), (3, my_bookings), (2, sync_changes), (2, app_start),
+        (2, customer_profile), (1, update_customer), (1, write_review), (1, login), (1, refresh), (1, logout),
+    ],
+    'provider': [
+        (4, provider_bookings), (3, update_booking_status), (1, update_provider), (1, provider_profile),
+    ],
+    'signup': [
+        (3, register_customer), (1, resend_otp), (2, register_provider), (1, resend_provider_otp),
+    ],
+    'admin': [
+        (3, admin_page('/admin/registration/dashboard/')), (1, admin_page('/admin/')),
+        (2, admin_page('/admin/registration/user/')), (2, admin_page('/admin/booking/booking/')),
+        (2, admin_page('/admin/review/review/')), (1, admin_search), (1, admin_autocomplete),
+        (1, scrape_metrics),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds benchmark data and drives every API route with realistic request mixes, '
+        'reporting throughput, latency percentiles and SQL query counts as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=100_000, help='Bookings to seed')
+        parser.add_argument('--providers', type=int, default=500, help='Service providers to seed')
+        parser.add_argument('--customers', type=int, default=10_000, help='Customers to seed')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded rows')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario to run (repeatable, default all)',
+        )
+        parser.add_argument('--iterations', type=int, default=500, help='User actions per scenario')
+        parser.add_argument('--warmup', type=int, default=50, help='Unrecorded actions before each scenario')
+        parser.add_argument('--concurrency', type=int, default=1, help='Client threads per scenario')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request mixes')
+        parser.add_argument('--output', default='-', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to print p95 latency and query deltas against')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+            self.stderr.write(f'Deleted {deleted} benchmark rows.')
+            return
+        if not options['skip_seed']:
+            seed_dataset(
+                options['bookings'], options['providers'], options['customers'],
+                seed=options['seed'], stdout=self.stderr,
+            )
+            rebuild_daily_stats()
+        context = Context(sample_size=1000)
+
+        scenarios = {}
+        covered = set()
+        # Emails go nowhere so SMTP latency doesn't drown out the application's own;
+        # the metrics scrape authenticates like a real one
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.dummy.EmailBackend',
+            METRICS_TOKEN=settings.METRICS_TOKEN or uuid.uuid4().hex,
+        ):
+            for offset, name in enumerate(options['scenario'] or SCENARIOS):
+                elapsed, samples = run_scenario(
+                    SCENARIOS[name], options['iterations'], context, seed=options['seed'] + offset,
+                    warmup=options['warmup'], concurrency=options['concurrency'],
+                )
+                requests = sum(len(route.latencies) for route in samples.values())
+                scenarios[name] = {
+                    'requests': requests,
+                    'duration_s': round(elapsed, 3),
+                    'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+                    'routes': {key: samples[key].as_dict(elapsed) for key in sorted(samples)},
+                }
+                covered.update(key.split(' ', 1)[1] for key in samples)
+
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'options': {
+                key: options[key] for key in ('iterations', 'warmup', 'concurrency', 'seed', 'scenario')
+            },
+            'dataset': {
+                'users': User.objects.count(),
+                'bookings': Booking.objects.count(),
+                'reviews': Review.objects.count(),
+            },
+            'scenarios': scenarios,
+            'uncovered_routes': [
+                route for route in project_routes()
+                if route not in covered and route not in EXCLUDED_ROUTES
+            ],
+        }
+        text = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        self.summarize(report, self.stderr)
+        if options['compare']:
+            with open(options['compare']) as handle:
+                self.compare(json.load(handle), report, self.stderr)
+
+    def summarize(self, report, out):
+        for name, scenario in report['scenarios'].items():
+            out.write(f"\n{name}: {scenario['requests']} requests, {scenario['throughput_rps']} req/s\n")
+            for route, stats in scenario['routes'].items():
+                latency, queries = stats['latency_ms'], stats['queries']
+                out.write(
+                    f"  {route:<50} n={stats['requests']:<5} p50={latency['p50']:>8.1f}ms "
+                    f"p95={latency['p95']:>8.1f}ms p99={latency['p99']:>8.1f}ms queries={queries['max']:g}\n"
+                )
+        if report['uncovered_routes']:
+            out.write(f"\nRoutes not exercised: {', '.join(report['uncovered_routes'])}\n")
+
+    def compare(self, baseline, report, out):
+        out.write(f"\nAgainst {baseline.get('revision')}:\n")
+        for name, scenario in report['scenarios'].items():
+            previous = baseline.get('scenarios', {}).get(name, {}).get('routes', {})
+            for route, stats in scenario['routes'].items():
+                if route not in previous:
+                    continue
+                before, after = previous[route], stats
+                p95 = after['latency_ms']['p95'] - before['latency_ms']['p95']
+                queries = after['queries']['max'] - before['queries']['max']
+                out.write(f"  {name:<9} {route:<50} p95 {p95:+9.1f}ms  queries {queries:+g}\n")
@@ -0,0 +1,125 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking.models import Booking
+from booking.serializers import ProviderBookingSerializer, UserBookingSerializer
+from registration.models import User
+from registration.serializers import ProviderSerializer
+from review.models import Review
+from review.serializers import ReviewListSerializer
+from utils.benchmark import BENCH_DOMAIN, git_revision, seed_dataset
+
+
+def best(func, repeat):
+    """
+    Fastest of `repeat` calls of `func`, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def lists():
+    """
+    The list endpoints' serializers with a queryset of seeded rows each.
+    """
+    bench = f'@{BENCH_DOMAIN}'
+    return [
+        ('/booking/my-bookings/', UserBookingSerializer, Booking.objects.filter(user__email__endswith=bench)),
+        (
+            '/booking/provider-bookings/', ProviderBookingSerializer,
+            Booking.objects.filter(service_provider__email__endswith=bench),
+        ),
+        ('/review/all/', ReviewListSerializer, Review.objects.filter(reviewer__email__endswith=bench)),
+        ('/providers/', ProviderSerializer, User.objects.filter(email__endswith=bench, user_type='SERVICE_PROVIDER')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares serializer instances over model objects with .values() rows and compiled row mappers '
+        'on the booking, review and provider lists: time per row to fetch and serialize'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows serialized per list')
+        parser.add_argument('--bookings', type=int, default=100_000, help='Bookings to seed (a tenth become reviews)')
+        parser.add_argument('--providers', type=int, default=10_000, help='Service providers to seed')
+        parser.add_argument('--customers', type=int, default=2_000, help='Customers to seed')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded rows')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement (best is reported)')
+        parser.add_argument('--output', default='-', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+            self.stderr.write(f'Deleted {deleted} benchmark rows.')
+            return
+        if not options['skip_seed']:
+            seed_dataset(options['bookings'], options['providers'], options['customers'], stdout=self.stderr)
+
+        rows, repeat = options['rows'], options['repeat']
+        results = {}
+        for path, serializer_class, queryset in lists():
+            queryset = queryset.order_by('pk')
+            instances = serializer_class.prune_queryset(queryset)[:rows]
+            values = serializer_class.values_queryset(queryset)[:rows]
+            count = len(values)
+            if not count:
+                raise CommandError('No benchmark data found; run without --skip-seed first.')
+            if serializer_class(instances, many=True).data != [serializer_class.row_mapper()(row) for row in values]:
+                raise CommandError(f'{path}: the row mapper and the serializer disagree.')
+
+            fetched_instances, fetched_values = list(instances), list(values)
+            timings = {
+                'serializer': {
+                    'total': best(lambda: serializer_class(list(instances.all()), many=True).data, repeat),
+                    'serialize': best(lambda: serializer_class(fetched_instances, many=True).data, repeat),
+                },
+                'values': {
+                    # Compiling the mapper is cached after the first call, as in the views
+                    'total': best(
+                        lambda: [serializer_class.row_mapper()(row) for row in values.all()], repeat,
+                    ),
+                    'serialize': best(lambda: list(map(serializer_class.row_mapper(), fetched_values)), repeat),
+                },
+            }
+            results[path] = {
+                'rows': count,
+                'us_per_row': {
+                    path_name: {stage: round(seconds / count * 1_000_000, 2) for stage, seconds in stages.items()}
+                    for path_name, stages in timings.items()
+                },
+            }
+
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'options': {'rows': rows, 'repeat': repeat},
+            'lists': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+        else:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        self.summarize(report, self.stderr)
+
+    def summarize(self, report, out):
+        for path, stats in report['lists'].items():
+            out.write(f"\n{path} ({stats['rows']} rows), microseconds per row")
+            serializer, values = stats['us_per_row']['serializer'], stats['us_per_row']['values']
+            for stage in ('total', 'serialize'):
+                speedup = serializer[stage] / values[stage] if values[stage] else 0
+                out.write(
+                    f"  {stage:<10} serializer={serializer[stage]:>8.2f}  values={values[stage]:>8.2f}  "
+                    f"({speedup:.1f}x)"
+                )
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count
+
+from booking.models import Booking
+from registration.admin import annotate_user_stats
+from registration.models import User
+from utils.benchmark import BENCH_DOMAIN, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Seeds a benchmark dataset and times the user admin changelist queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1_000_000, help='Bookings to seed')
+        parser.add_argument('--providers', type=int, default=500, help='Service providers to seed')
+        parser.add_argument('--customers', type=int, default=50_000, help='Customers to seed')
+        parser.add_argument('--page-size', type=int, default=100, help='Changelist rows per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (best is reported)')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse previously seeded rows')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_DOMAIN}').delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} benchmark rows.'))
+            return
+        if not options['skip_seed']:
+            seed_dataset(options['bookings'], options['providers'], options['customers'], stdout=self.stdout)
+
+        users = User.objects.order_by('email')
+        legacy = users.annotate(
+            rating_avg=Avg('reviews_received__rating'),
+            provider_booking_count=Count('provider_bookings', distinct=True),
+            user_booking_count=Count('bookings', distinct=True),
+        )
+        current = annotate_user_stats(users)
+        page = options['page_size']
+
+        self.stdout.write(f'Bookings: {Booking.objects.count()}  Users: {User.objects.count()}')
+        for label, queryset in (('join + Count(distinct)', legacy), ('correlated subqueries', current)):
+            count_time = self.best(lambda: queryset.count(), options['repeat'])
+            page_time = self.best(lambda: list(queryset[:page]), options['repeat'])
+            self.stdout.write(f'{label:<24} count: {count_time * 1000:9.1f} ms   page of {page}: {page_time * 1000:9.1f} ms')
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from booking.models import Booking
+from registration.models import User
+from registration.stats import rebuild_daily_stats
+from review.models import Review
+from service.models import Service
+from utils.synthetic import SyntheticDataset, delete_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Generates production-scale users, bookings and reviews with NumPy and loads them with parallel COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=500_000, help='Customers to generate')
+        parser.add_argument('--providers', type=int, default=20_000, help='Service providers to generate')
+        parser.add_argument('--bookings', type=int, default=10_000_000, help='Bookings to generate')
+        parser.add_argument('--days', type=int, default=730, help='Days of booking history, ending --future-days ahead')
+        parser.add_argument('--future-days', type=int, default=60, help='Days of upcoming bookings')
+        parser.add_argument('--review-rate', type=float, default=0.3, help='Share of completed bookings reviewed')
+        parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of bookings across providers')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel COPY connections')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Most providers generated per COPY batch')
+        parser.add_argument(
+            '--skip-fk-checks', action='store_true',
+            help='Disable foreign key triggers on the COPY connections (needs a superuser role)',
+        )
+        parser.add_argument('--skip-rollup', action='store_true', help='Leave the dashboard rollup tables stale')
+        parser.add_argument('--cleanup', action='store_true', help='Delete previously generated rows and exit')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('generate_synthetic_data loads rows with COPY and needs PostgreSQL.')
+        if options['skip_fk_checks'] and settings.DATABASE_POOLER:
+            # The SET would stay on a pooled server connection other clients then get
+            raise CommandError('--skip-fk-checks changes session state; run it against the database directly.')
+        if options['cleanup']:
+            deleted = delete_synthetic_data()
+            if not options['skip_rollup']:
+                rebuild_daily_stats()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} synthetic rows.'))
+            return
+
+        services = list(Service.objects.all()) or [
+            Service.objects.create(category=name, description=name, price=500)
+            for name in ('Plumber', 'Carpenter', 'Electrician', 'Cleaning')
+        ]
+        dataset = SyntheticDataset(
+            options['customers'], options['providers'], options['bookings'], days=options['days'],
+            future_days=options['future_days'], review_rate=options['review_rate'], skew=options['skew'],
+            seed=options['seed'], workers=options['workers'], chunk_size=options['chunk_size'],
+            skip_fk_checks=options['skip_fk_checks'], stdout=self.stdout,
+        )
+        started = time.perf_counter()
+        try:
+            loaded = dataset.run(services)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Fresh planner statistics (and reltuples for the estimated admin counts)
+        with connection.cursor() as cursor:
+            for model in (User, Booking, Review):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        if not options['skip_rollup']:
+            rebuild_daily_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {loaded['users']} users, {loaded['bookings']} bookings and {loaded['reviews']} reviews "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.memory import load_samples
+
+
+def summarize_route(samples, top, growth_threshold, min_samples):
+    """
+    Peak and retained memory of one route's samples. A route is flagged as
+    growing when most of its requests left at least `growth_threshold` bytes
+    allocated after they were done: each of them adds to the worker's RSS.
+    """
+    peaks = [sample['peak_bytes'] for sample in samples]
+    retained = [sample['retained_bytes'] for sample in samples]
+    sites = Counter()
+    for sample in samples:
+        for site, size, _ in sample['top_sites']:
+            sites[site] += size
+    median_retained = statistics.median(retained)
+    return {
+        'samples': len(samples),
+        'peak_bytes': {'mean': round(statistics.fmean(peaks)), 'max': max(peaks)},
+        'retained_bytes': {'median': round(median_retained), 'max': max(retained), 'total': sum(retained)},
+        'held_bytes': round(statistics.fmean(sample['held_bytes'] for sample in samples)),
+        'response_bytes': round(statistics.fmean(sample['response_bytes'] for sample in samples)),
+        'growing': len(samples) >= min_samples and median_retained >= growth_threshold,
+        'top_sites': [[site, size // len(samples)] for site, size in sites.most_common(top)],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarizes the memory samples recorded by MemoryTrackingMiddleware per route: peak and retained '
+        'allocation, top allocation sites, and routes whose retained memory keeps growing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Directory with the samples (default MEMORY_TRACKING_DIR)')
+        parser.add_argument('--top', type=int, default=5, help='Allocation sites to show per route')
+        parser.add_argument(
+            '--growth-threshold', type=int, default=16,
+            help='KiB a request has to keep alive, in most requests to a route, to flag the route',
+        )
+        parser.add_argument('--min-samples', type=int, default=3, help='Samples a route needs to be flagged')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+        parser.add_argument('--clear', action='store_true', help='Delete the samples after summarizing them')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.MEMORY_TRACKING_DIR
+        if not os.path.isdir(directory):
+            raise CommandError(f'No memory samples in {directory}; set MEMORY_TRACKING_SAMPLE_RATE to record some.')
+        by_route = defaultdict(list)
+        for sample in load_samples(directory):
+            by_route[f"{sample['method']} {sample['route']}"].append(sample)
+
+        routes = {
+            route: summarize_route(samples, options['top'], options['growth_threshold'] * 1024, options['min_samples'])
+            for route, samples in by_route.items()
+        }
+        ordered = sorted(routes.items(), key=lambda item: (not item[1]['growing'], -item[1]['peak_bytes']['max']))
+        if options['json']:
+            self.stdout.write(json.dumps(dict(ordered), indent=2))
+        else:
+            for route, stats in ordered:
+                flag = '  GROWING' if stats['growing'] else ''
+                self.stdout.write(
+                    f"{route}  samples={stats['samples']} peak mean={kib(stats['peak_bytes']['mean'])} "
+                    f"max={kib(stats['peak_bytes']['max'])} held={kib(stats['held_bytes'])} "
+                    f"retained median={kib(stats['retained_bytes']['median'])} "
+                    f"max={kib(stats['retained_bytes']['max'])}{flag}"
+                )
+                for site, size in stats['top_sites']:
+                    self.stdout.write(f'    {kib(size):>10}  {site}')
+        if options['clear']:
+            shutil.rmtree(directory)
+
+
+def kib(size):
+    return f'{size / 1024:.1f}KiB'
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.profiling import profiling_token
+
+
+class Command(BaseCommand):
+    help = 'Prints a signed header that makes ProfilingMiddleware profile the request carrying it'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{settings.PROFILING_HEADER}: {profiling_token()}')
+        self.stderr.write(
+            f'Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds; profiles are saved to {settings.PROFILING_DIR}.'
+        )
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from registration.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the tombstones of bookings and reviews removed more than CHANGES_TOMBSTONE_DAYS ago; '
+        'sync tokens that old are refused anyway'
+    )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.CHANGES_TOMBSTONE_DAYS)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {cutoff:%Y-%m-%d %H:%M}.'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from registration.stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily dashboard statistics from bookings, reviews and users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Number of recent days to recompute')
+        parser.add_argument('--full', action='store_true', help='Recompute the whole history')
+
+    def handle(self, *args, **options):
+        since = None if options['full'] else timezone.localdate() - timedelta(days=options['days'])
+        bookings, ratings, users = rebuild_daily_stats(since=since)
+        scope = 'all history' if since is None else f'since {since}'
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {scope}: {bookings} booking rows, {ratings} rating rows, {users} user rows.'
+        ))
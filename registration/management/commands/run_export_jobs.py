@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from registration.exports import claim_next_job, run_export_job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued admin export jobs off the request path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls when idle')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched and written per chunk')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            job = run_export_job(job, chunk_size=options['chunk_size'])
+            if job.status == 'COMPLETE':
+                self.stdout.write(self.style.SUCCESS(f'{job}: {job.processed_rows} rows written to {job.file.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'{job}: {job.error}'))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:09
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0001_initial'),
+        ('registration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='user_id',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='service.service', verbose_name='service category'),
+        ),
+        migrations.AlterField(
+            model_name='usertoken',
+            name='expired_at',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 26, 13, 9, 22, 561853, tzinfo=datetime.timezone.utc)),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0001_initial'),
+        ('registration', '0002_user_user_id_alter_user_category_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('user_type', models.CharField(max_length=20)),
+                ('new_users', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('date', 'user_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRatingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='service.service')),
+                ('service_provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rating_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('date', 'service_provider')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBookingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=10)),
+                ('bookings', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='service.service')),
+                ('service_provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_booking_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('date', 'service_provider', 'status')},
+            },
+        ),
+    ]
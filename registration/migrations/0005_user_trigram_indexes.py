@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from utils.search import trigram_indexes
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('registration', '0004_exportjob'),
+    ]
+
+    operations = [
+        trigram_indexes(
+            'registration_user',
+            ['email', 'username', 'first_name', 'last_name', 'contact', 'location'],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:19
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_category_names(apps, schema_editor):
+    User = apps.get_model('registration', 'User')
+    Service = apps.get_model('service', 'Service')
+    User.objects.filter(category__isnull=False).update(
+        category_name=Subquery(Service.objects.filter(pk=OuterRef('category_id')).values('category')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0005_user_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='category_name',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(copy_category_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0006_user_category_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('route', models.CharField(max_length=255)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('database', models.CharField(default='default', max_length=50)),
+                ('duration_ms', models.FloatField()),
+                ('sql', models.TextField()),
+                ('params', models.JSONField(default=list)),
+                ('stack', models.TextField(blank=True)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from utils.changes import track_changes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0007_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('booking', 'Booking'), ('review', 'Review')], max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('owner_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('change_seq', models.BigIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner_id', 'change_seq'], name='tombstone_owner_changes_idx'), models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx')],
+            },
+        ),
+        track_changes('registration_tombstone', 'deleted_at'),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from utils.changes import fire_always
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0008_tombstone'),
+    ]
+
+    operations = [
+        fire_always('registration_tombstone'),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0009_tombstone_trigger_always'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='changelist_query',
+            field=models.TextField(blank=True),
+        ),
+    ]
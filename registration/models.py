@@ -52,6 +52,8 @@ class User(AbstractUser):
         blank=True,
         verbose_name=_('service category')
     )
+    # Copy of category.category so provider lists and pickers need no join
+    category_name = models.CharField(max_length=50, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'user_type', 'contact', 'location', 'category']
@@ -66,6 +68,16 @@ class User(AbstractUser):
             self.is_superuser = True
 
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'category' in update_fields:
+            self.category_name = self.category.category if self.category_id else ''
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'category_name'}
+        # Trusted internal writes (last_login, profile patches) pass update_fields and
+        # are validated upstream, so skip full_clean() and its unique-check SELECTs.
+        if update_fields is not None and self.pk and self.user_id:
+            super().save(*args, **kwargs)
+            return
         if not self.user_id:
             from datetime import datetime
             year = datetime.now().year % 100  # last two digits of year
@@ -94,4 +106,149 @@ class UserToken(models.Model):
         return f"{self.user.email} - {self.token[:10]}..."
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class DailyBookingStat(models.Model):
+    date = models.DateField()
+    service_provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_booking_stats')
+    category = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10)
+    bookings = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.service_provider} {self.status}: {self.bookings}"
+
+    class Meta:
+        unique_together = ('date', 'service_provider', 'status')
+        ordering = ['-date']
+
+
+class DailyRatingStat(models.Model):
+    date = models.DateField()
+    service_provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rating_stats')
+    category = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, blank=True)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.service_provider}: {self.rating_sum}/{self.rating_count}"
+
+    class Meta:
+        unique_together = ('date', 'service_provider')
+        ordering = ['-date']
+
+
+class DailyUserStat(models.Model):
+    date = models.DateField()
+    user_type = models.CharField(max_length=20)
+    new_users = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.user_type}: {self.new_users}"
+
+    class Meta:
+        unique_together = ('date', 'user_type')
+        ordering = ['-date']
+
+
+class ExportJob(models.Model):
+    FORMAT_CHOICES = (
+        ('CSV', 'CSV'),
+        ('PARQUET', 'Parquet'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETE', 'Complete'),
+        ('FAILED', 'Failed'),
+    )
+
+    model_label = models.CharField(max_length=100)
+    fields = models.JSONField(default=list)
+    object_ids = models.JSONField(null=True, blank=True)
+    changelist_query = models.TextField(blank=True)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='CSV')
+    watermark_field = models.CharField(max_length=50, blank=True)
+    since = models.DateTimeField(null=True, blank=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export #{self.pk} of {self.model_label} ({self.file_format}) - {self.status}"
+
+    @property
+    def progress(self):
+        if self.status == 'COMPLETE':
+            return 100
+        return int(self.processed_rows * 100 / self.total_rows) if self.total_rows else 0
+
+    @classmethod
+    def last_watermark(cls, model_label, file_format):
+        """Returns the watermark of the latest completed export, for incremental exports."""
+        return cls.objects.filter(
+            model_label=model_label, file_format=file_format, status='COMPLETE', watermark__isnull=False
+        ).order_by('-watermark').values_list('watermark', flat=True).first()
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class SlowQuery(models.Model):
+    """
+    A query that took longer than SLOW_QUERY_THRESHOLD_MS while serving a
+    request, recorded by utils.slow_queries.SlowQueryMiddleware.
+    """
+    method = models.CharField(max_length=10)
+    route = models.CharField(max_length=255)
+    view = models.CharField(max_length=255, blank=True)
+    database = models.CharField(max_length=50, default='default')
+    duration_ms = models.FloatField()
+    sql = models.TextField()
+    params = models.JSONField(default=list)
+    stack = models.TextField(blank=True)
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms in {self.method} {self.route}"
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'slow queries'
+
+
+class Tombstone(models.Model):
+    """
+    A booking or review one user no longer sees, because it was deleted or
+    moved to another user, so their /changes/ sync can drop it. Kept for
+    CHANGES_TOMBSTONE_DAYS (manage.py prune_tombstones).
+    """
+    MODEL_CHOICES = (
+        ('booking', 'Booking'),
+        ('review', 'Review'),
+    )
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.IntegerField()
+    # Not a foreign key: the tombstones of a deleted user's bookings outlive them
+    owner_id = models.IntegerField()
+    # Both set by a database trigger (see utils.changes)
+    deleted_at = models.DateTimeField(default=timezone.now, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} for user {self.owner_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'change_seq'], name='tombstone_owner_changes_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
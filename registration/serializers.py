@@ -1,7 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import User
 import re
+from urllib.parse import urlsplit
 from service.models import Service
+from service.serializers import ServiceSerializer
+from utils.batch import resolve_api_view
+from utils.fieldsets import SparseFieldsetMixin
 
 
 def validate_email_format(email):
@@ -37,13 +42,14 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
 
-class ProviderSerializer(serializers.ModelSerializer):
+class ProviderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
             'id', 'email', 'first_name', 'last_name',
             'contact', 'gender', 'location', 'category'
         ]
+        expandable_fields = {'category': (ServiceSerializer, 'category')}
 
 
 class CustomerRegistrationSerializer(serializers.ModelSerializer):
@@ -158,7 +164,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        instance.save(update_fields=list(validated_data))
         return instance
 
 
@@ -188,5 +194,29 @@ class ServiceProviderUpdateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        instance.save(update_fields=list(validated_data))
         return instance
+
+
+class BatchEntrySerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET'
+    )
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False, allow_null=True)
+
+    def validate(self, data):
+        match = resolve_api_view(urlsplit(data['path']).path)
+        if match is None:
+            raise serializers.ValidationError({"path": "Not an API route that can be batched."})
+        data['match'] = match
+        return data
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchEntrySerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"A batch can hold at most {settings.BATCH_MAX_REQUESTS} requests.")
+        return value
@@ -0,0 +1,147 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import User, DailyBookingStat, DailyRatingStat, DailyUserStat, Tombstone
+from .stats import bump, local_date
+from booking.signals import saved_row
+from service.models import Service
+
+
+# Bookings
+
+def _booking_key(booking):
+    return {'date': booking.date, 'service_provider_id': booking.service_provider_id, 'status': booking.status}
+
+
+@receiver(post_save, sender='booking.Booking', dispatch_uid='booking_stat_post_save')
+def update_booking_stats(sender, instance, created, **kwargs):
+    key = _booking_key(instance)
+    previous = saved_row(instance)
+    previous = previous and {field: previous[field] for field in key}
+    if not created and previous == key:
+        return
+    if previous:
+        bump(DailyBookingStat, previous, create=False, bookings=-1)
+    # The category alone, rather than loading the provider
+    category_id = User.objects.filter(pk=instance.service_provider_id).values_list('category_id', flat=True).first()
+    bump(DailyBookingStat, key, defaults={'category_id': category_id}, bookings=1)
+
+
+@receiver(post_delete, sender='booking.Booking', dispatch_uid='booking_stat_post_delete')
+def remove_booking_stats(sender, instance, **kwargs):
+    bump(DailyBookingStat, _booking_key(instance), create=False, bookings=-1)
+
+
+# Reviews
+
+def _review_key(review):
+    return {'date': local_date(review.created_at), 'service_provider_id': review.service_provider_id}
+
+
+@receiver(pre_save, sender='review.Review', dispatch_uid='review_stat_pre_save')
+def remember_review_rating(sender, instance, **kwargs):
+    instance._stat_previous = None
+    if instance.pk:
+        instance._stat_previous = sender.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender='review.Review', dispatch_uid='review_stat_post_save')
+def update_rating_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stat_previous', None)
+    if previous:
+        if (previous.service_provider_id, previous.rating) == (instance.service_provider_id, instance.rating):
+            return
+        bump(DailyRatingStat, _review_key(previous), create=False, rating_sum=-previous.rating, rating_count=-1)
+    bump(
+        DailyRatingStat, _review_key(instance),
+        defaults={'category_id': instance.service_provider.category_id},
+        rating_sum=instance.rating, rating_count=1,
+    )
+
+
+@receiver(post_delete, sender='review.Review', dispatch_uid='review_stat_post_delete')
+def remove_rating_stats(sender, instance, **kwargs):
+    bump(DailyRatingStat, _review_key(instance), create=False, rating_sum=-instance.rating, rating_count=-1)
+
+
+# Users
+
+def _user_key(user):
+    return {'date': local_date(user.date_joined), 'user_type': user.user_type}
+
+
+@receiver(pre_save, sender=User, dispatch_uid='user_stat_pre_save')
+def remember_user_type(sender, instance, update_fields=None, **kwargs):
+    instance._stat_key = None
+    # Fast-path saves (last_login, profile patches) can't move the user between rows
+    if instance.pk and (update_fields is None or {'user_type', 'date_joined'} & set(update_fields)):
+        previous = sender.objects.filter(pk=instance.pk).values('date_joined', 'user_type').first()
+        if previous:
+            instance._stat_key = {'date': local_date(previous['date_joined']), 'user_type': previous['user_type']}
+
+
+@receiver(post_save, sender=User, dispatch_uid='user_stat_post_save')
+def update_user_stats(sender, instance, created, **kwargs):
+    key = _user_key(instance)
+    previous = getattr(instance, '_stat_key', None)
+    if not created and previous in (None, key):
+        return
+    if previous:
+        bump(DailyUserStat, previous, create=False, new_users=-1)
+    bump(DailyUserStat, key, new_users=1)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='user_stat_post_delete')
+def remove_user_stats(sender, instance, **kwargs):
+    bump(DailyUserStat, _user_key(instance), create=False, new_users=-1)
+
+
+# Tombstones for /changes/: a booking or review that is deleted, or moved to
+# another customer or provider, disappears from the sync of the user who had it
+
+def _bury(model, object_id, owner_ids):
+    Tombstone.objects.bulk_create([
+        Tombstone(model=model, object_id=object_id, owner_id=owner_id) for owner_id in owner_ids
+    ])
+
+
+@receiver(post_save, sender='booking.Booking', dispatch_uid='booking_tombstone_post_save')
+def bury_moved_booking(sender, instance, created, **kwargs):
+    previous = saved_row(instance)
+    if created or not previous:
+        return
+    owners = {previous['user_id'], previous['service_provider_id']}
+    _bury('booking', instance.pk, owners - {instance.user_id, instance.service_provider_id})
+
+
+@receiver(post_delete, sender='booking.Booking', dispatch_uid='booking_tombstone_post_delete')
+def bury_booking(sender, instance, **kwargs):
+    _bury('booking', instance.pk, {instance.user_id, instance.service_provider_id})
+
+
+@receiver(post_save, sender='review.Review', dispatch_uid='review_tombstone_post_save')
+def bury_moved_review(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stat_previous', None)
+    if created or not previous:
+        return
+    owners = {previous.reviewer_id, previous.service_provider_id}
+    _bury('review', instance.pk, owners - {instance.reviewer_id, instance.service_provider_id})
+
+
+@receiver(post_delete, sender='review.Review', dispatch_uid='review_tombstone_post_delete')
+def bury_review(sender, instance, **kwargs):
+    _bury('review', instance.pk, {instance.reviewer_id, instance.service_provider_id})
+
+
+# Denormalized category names
+
+@receiver(post_save, sender=Service, dispatch_uid='service_category_name_post_save')
+def sync_category_name(sender, instance, **kwargs):
+    User.objects.filter(category=instance).exclude(category_name=instance.category).update(
+        category_name=instance.category
+    )
+
+
+@receiver(pre_delete, sender=Service, dispatch_uid='service_category_name_pre_delete')
+def clear_category_name(sender, instance, **kwargs):
+    User.objects.filter(category=instance).update(category_name='')
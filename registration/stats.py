@@ -0,0 +1,88 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import User, DailyBookingStat, DailyRatingStat, DailyUserStat
+
+
+def bump(model, keys, defaults=None, create=True, **deltas):
+    """
+    Atomically add deltas to the rollup row identified by keys, creating it if needed.
+    Decrements pass create=False so cascading deletes never resurrect a row.
+    """
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another worker created the row between our UPDATE and INSERT
+        model.objects.filter(**keys).update(**updates)
+
+
+def local_date(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def rebuild_daily_stats(since=None, batch_size=1000):
+    """
+    Recompute the rollup tables from the source tables.
+    :param since: Only rebuild rows dated on or after this date (None rebuilds everything)
+    :return: Tuple of (booking rows, rating rows, user rows) written
+    """
+    from booking.models import Booking
+    from review.models import Review
+
+    bookings = Booking.objects.all()
+    reviews = Review.objects.annotate(day=TruncDate('created_at'))
+    users = User.objects.annotate(day=TruncDate('date_joined'))
+    stats = [DailyBookingStat.objects.all(), DailyRatingStat.objects.all(), DailyUserStat.objects.all()]
+
+    if since:
+        bookings = bookings.filter(date__gte=since)
+        reviews = reviews.filter(day__gte=since)
+        users = users.filter(day__gte=since)
+        stats = [qs.filter(date__gte=since) for qs in stats]
+
+    booking_rows = (
+        DailyBookingStat(
+            date=row['date'],
+            service_provider_id=row['service_provider_id'],
+            category_id=row['service_provider__category_id'],
+            status=row['status'],
+            bookings=row['total'],
+        )
+        for row in bookings.values(
+            'date', 'service_provider_id', 'service_provider__category_id', 'status'
+        ).annotate(total=Count('id')).order_by().iterator()
+    )
+    rating_rows = (
+        DailyRatingStat(
+            date=row['day'],
+            service_provider_id=row['service_provider_id'],
+            category_id=row['service_provider__category_id'],
+            rating_sum=row['rating_total'],
+            rating_count=row['total'],
+        )
+        for row in reviews.values(
+            'day', 'service_provider_id', 'service_provider__category_id'
+        ).annotate(rating_total=Sum('rating'), total=Count('id')).order_by().iterator()
+    )
+    user_rows = (
+        DailyUserStat(date=row['day'], user_type=row['user_type'], new_users=row['total'])
+        for row in users.values('day', 'user_type').annotate(total=Count('id')).order_by().iterator()
+    )
+
+    with transaction.atomic():
+        for qs in stats:
+            qs.delete()
+        return tuple(
+            len(model.objects.bulk_create(list(rows), batch_size=batch_size))
+            for model, rows in (
+                (DailyBookingStat, booking_rows),
+                (DailyRatingStat, rating_rows),
+                (DailyUserStat, user_rows),
+            )
+        )
@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from booking.models import Booking
+from registration.serializers import ProviderSerializer
+from review.models import Review
+from service.models import Service
+from service.views import ServiceListCreateView
+from utils import batch, db_router, memory, observers, profiling
+from utils.benchmark import project_routes
+from utils.changes import change_token
+from utils.middleware import brotli, negotiate_encoding
+from utils.profiling import profiling_token
+from utils.fixtures import ProviderCustomerMixin, RowMapperMixin
+from utils.query_budget import QueryBudgetMixin
+from utils.renderers import ORJSONParser, ORJSONRenderer
+
+from .admin import annotate_user_stats, custom_admin_site
+from .exports import claim_next_job, run_export_job
+from .models import User, DailyBookingStat, DailyRatingStat, DailyUserStat, ExportJob, SlowQuery, Tombstone
+from .stats import rebuild_daily_stats
+
+
+class UserFastSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='customer@example.com',
+            email='customer@example.com',
+            password='Passw0rd!',
+            first_name='Asha',
+            last_name='Khan',
+            user_type='USER',
+        )
+
+    def test_full_save_runs_unique_checks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.user.save()
+        self.assertGreater(len(ctx.captured_queries), 1)
+
+    def test_login_updates_last_login_in_one_query(self):
+        with self.assertNumQueries(1):
+            update_last_login(None, self.user)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_profile_patch_writes_only_changed_columns(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.patch('/update/customer/', {'first_name': 'Ayesha'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        self.assertIn('first_name', sql)
+        self.assertNotIn('last_name', sql)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Ayesha')
+
+    def test_new_user_is_still_validated(self):
+        provider = User(
+            username='provider@example.com',
+            email='provider@example.com',
+            user_type='SERVICE_PROVIDER',
+        )
+        with self.assertRaises(ValidationError):
+            provider.save()
+
+
+class DailyStatsTests(ProviderCustomerMixin, TestCase):
+    def snapshot(self):
+        return (
+            sorted(DailyBookingStat.objects.filter(bookings__gt=0).values_list(
+                'date', 'service_provider_id', 'category_id', 'status', 'bookings')),
+            sorted(DailyRatingStat.objects.filter(rating_count__gt=0).values_list(
+                'date', 'service_provider_id', 'rating_sum', 'rating_count')),
+            sorted(DailyUserStat.objects.filter(new_users__gt=0).values_list('date', 'user_type', 'new_users')),
+        )
+
+    def test_signals_keep_rollups_in_sync(self):
+        booking = Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10, 0)
+        )
+        stat = DailyBookingStat.objects.get(service_provider=self.provider, status='PENDING')
+        self.assertEqual((stat.bookings, stat.category_id), (1, self.service.id))
+
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = 'COMPLETE'
+        booking.save()
+        # The category is read without loading the provider
+        self.assertFalse(Booking.service_provider.is_cached(booking))
+        self.assertEqual(DailyBookingStat.objects.get(status='PENDING').bookings, 0)
+        self.assertEqual(DailyBookingStat.objects.get(status='COMPLETE').bookings, 1)
+
+        review = Review.objects.create(reviewer=self.customer, service_provider=self.provider, rating=4)
+        review.rating = 2
+        review.save()
+        stat = DailyRatingStat.objects.get(service_provider=self.provider)
+        self.assertEqual((stat.rating_sum, stat.rating_count), (2, 1))
+
+        self.assertEqual(
+            dict(DailyUserStat.objects.values_list('user_type', 'new_users')),
+            {'USER': 1, 'SERVICE_PROVIDER': 1},
+        )
+
+        incremental = self.snapshot()
+        rebuild_daily_stats()
+        self.assertEqual(self.snapshot(), incremental)
+
+        booking.delete()
+        review.delete()
+        self.assertEqual(DailyBookingStat.objects.get(status='COMPLETE').bookings, 0)
+        self.assertEqual(DailyRatingStat.objects.get().rating_count, 0)
+
+    def test_dashboard_reads_rollups(self):
+        admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        for hour in (10, 11):
+            Booking.objects.create(
+                user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(hour, 0)
+            )
+        Review.objects.create(reviewer=self.customer, service_provider=self.provider, rating=5)
+        self.client.force_login(admin)
+
+        response = self.client.get('/admin/registration/dashboard/', {'category': 'Plumber'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['statistics']['total_bookings'], 2)
+        self.assertEqual(response.context['statistics']['average_rating'], 5)
+        self.assertEqual(response.context['top_providers'][0]['bookings'], 2)
+
+
+class ExportJobTests(ProviderCustomerMixin, TestCase):
+    fields = ['booking_id', 'user.email', 'service_provider.category.category', 'date', 'status']
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for hour in (10, 11, 12):
+            self.book(hour)
+
+    def book(self, hour):
+        return Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(hour, 0)
+        )
+
+    def queue(self, file_format, **kwargs):
+        ExportJob.objects.create(
+            model_label='booking.Booking', fields=self.fields, file_format=file_format,
+            watermark_field='created_at', **kwargs
+        )
+        return run_export_job(claim_next_job(), chunk_size=2)
+
+    def test_csv_export_writes_file_and_progress(self):
+        job = self.queue('CSV')
+
+        self.assertEqual(job.status, 'COMPLETE', job.error)
+        self.assertEqual((job.processed_rows, job.total_rows, job.progress), (3, 3, 100))
+        with job.file.open('r') as handle:
+            lines = handle.read().splitlines()
+        self.assertEqual(lines[0], ','.join(self.fields))
+        self.assertEqual(len(lines), 4)
+        self.assertIn('customer@example.com,Plumber,2030-01-01,PENDING', lines[1])
+
+    def test_incremental_parquet_export_resumes_from_watermark(self):
+        import pandas as pd
+
+        first = self.queue('PARQUET')
+        self.assertEqual(first.status, 'COMPLETE', first.error)
+        self.assertEqual(len(pd.read_parquet(first.file.path)), 3)
+
+        new_booking = self.book(13)
+        second = self.queue('PARQUET', since=ExportJob.last_watermark('booking.Booking', 'PARQUET'))
+
+        frame = pd.read_parquet(second.file.path)
+        self.assertEqual(list(frame.columns), self.fields)
+        self.assertEqual(list(frame['booking_id']), [new_booking.booking_id])
+        self.assertEqual(second.watermark, new_booking.created_at)
+        self.assertTrue(os.path.basename(second.file.name).endswith('.parquet'))
+
+
+    def test_select_all_keeps_changelist_filters(self):
+        Booking.objects.filter(time_slot=time(10, 0)).update(status='COMPLETE')
+        admin_user = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        self.client.force_login(admin_user)
+        url = reverse('admin:booking_booking_changelist')
+
+        def queue_all(query, action='queue_csv_export'):
+            self.client.post(f'{url}{query}', {
+                'action': action, 'select_across': '1', 'index': '0',
+                '_selected_action': list(Booking.objects.values_list('pk', flat=True)[:1]),
+            })
+            return ExportJob.objects.latest('pk')
+
+        def exported(queued):
+            job = run_export_job(claim_next_job())
+            self.assertEqual((job.pk, job.status), (queued.pk, 'COMPLETE'), job.error)
+            with job.file.open('r') as handle:
+                return [line.split(',')[0] for line in handle.read().splitlines()[1:]]
+
+        completed = list(Booking.objects.filter(status='COMPLETE').values_list('booking_id', flat=True))
+        job = queue_all('?status__exact=COMPLETE')
+        self.assertEqual((job.object_ids, job.changelist_query), (None, 'status__exact=COMPLETE'))
+        self.assertEqual(exported(job), completed)
+        self.assertEqual(exported(queue_all('?q=customer@example.com&status__exact=COMPLETE')), completed)
+        self.assertEqual(exported(queue_all('?q=nobody@example.com')), [])
+
+        job = queue_all('')
+        self.assertEqual((job.object_ids, job.changelist_query), (None, ''))
+        self.assertEqual(len(exported(job)), 3)
+        self.assertIsNotNone(ExportJob.objects.get(pk=job.pk).watermark)
+
+        job = queue_all('?status__exact=COMPLETE', 'queue_parquet_export_incremental')
+        self.assertEqual(job.changelist_query, 'status__exact=COMPLETE')
+        self.assertEqual(run_export_job(claim_next_job()).total_rows, len(completed))
+
+
+class UserAdminStatsTests(TestCase):
+    def test_subquery_annotations_match_and_count_skips_them(self):
+        service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        provider = User.objects.create_user(
+            username='provider@example.com', email='provider@example.com', password='Passw0rd!',
+            first_name='Ravi', last_name='Das', user_type='SERVICE_PROVIDER', category=service,
+        )
+        customers = [
+            User.objects.create_user(
+                username=f'customer{index}@example.com', email=f'customer{index}@example.com',
+                password='Passw0rd!', first_name='Asha', last_name='Khan', user_type='USER',
+            )
+            for index in range(2)
+        ]
+        for hour, customer in zip((10, 11, 12), customers + customers[:1]):
+            Booking.objects.create(
+                user=customer, service_provider=provider, date=date(2030, 1, 1), time_slot=time(hour, 0)
+            )
+        for rating, customer in zip((3, 4), customers):
+            Review.objects.create(reviewer=customer, service_provider=provider, rating=rating)
+
+        users = {user.email: user for user in annotate_user_stats(User.objects.all())}
+        self.assertEqual(users['provider@example.com'].rating_avg, 3.5)
+        self.assertEqual(users['provider@example.com'].provider_booking_count, 3)
+        self.assertEqual(users['customer0@example.com'].user_booking_count, 2)
+        self.assertIsNone(users['customer0@example.com'].rating_avg)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(annotate_user_stats(User.objects.all()).count(), 3)
+        self.assertNotIn('booking_booking', ctx.captured_queries[0]['sql'])
+
+
+def has_trigram_indexes():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'registration_user_email_trgm'")
+        return cursor.fetchone() is not None
+
+
+class TrigramSearchIndexTests(TestCase):
+    def test_icontains_search_uses_trigram_index(self):
+        if not has_trigram_indexes():
+            self.skipTest('requires PostgreSQL with pg_trgm')
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = User.objects.filter(email__icontains='example').explain()
+        self.assertIn('registration_user_email_trgm', plan)
+
+
+class BenchmarkRoutesTests(TestCase):
+    def test_report_covers_routes_with_latency_and_query_counts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_routes', bookings=200, providers=5, customers=20, iterations=60, warmup=0,
+                output=path, stderr=StringIO(),
+            )
+            with open(path) as handle:
+                report = json.load(handle)
+
+        self.assertEqual(set(report['scenarios']), {'browse', 'customer', 'provider', 'signup', 'admin'})
+        self.assertEqual(report['uncovered_routes'], [])
+        slots = report['scenarios']['customer']['routes']['POST /booking/slots/']
+        self.assertEqual(set(slots['latency_ms']), {'mean', 'p50', 'p95', 'p99', 'max'})
+        self.assertLessEqual(slots['latency_ms']['p50'], slots['latency_ms']['p99'])
+        self.assertGreater(slots['queries']['max'], 0)
+        self.assertEqual(slots['statuses'], {'200': slots['requests']})
+        self.assertIn('GET /admin/registration/dashboard/', report['scenarios']['admin']['routes'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+class SyntheticDataTests(TransactionTestCase):
+    def test_generates_consistent_rows_and_cleans_up(self):
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        call_command(
+            'generate_synthetic_data', customers=300, providers=20, bookings=3000, days=60, future_days=10,
+            workers=2, chunk_size=5, stdout=StringIO(),
+        )
+
+        providers = User.objects.filter(user_type='SERVICE_PROVIDER')
+        self.assertEqual(User.objects.filter(user_type='USER').count(), 300)
+        self.assertEqual(providers.count(), 20)
+        self.assertFalse(providers.filter(category_name='').exists())
+        self.assertEqual(Booking.objects.count(), 3000)
+        self.assertEqual(Booking.objects.values('booking_id').distinct().count(), 3000)
+        self.assertFalse(Booking.objects.filter(user__user_type='SERVICE_PROVIDER').exists())
+        self.assertFalse(Booking.objects.filter(date__gt=date.today() + timedelta(days=10)).exists())
+        self.assertTrue(Review.objects.exists())
+        self.assertFalse(Review.objects.exclude(rating__range=(1, 5)).exists())
+        # The rollups were rebuilt from the loaded rows
+        self.assertEqual(DailyBookingStat.objects.aggregate(total=Sum('bookings'))['total'], 3000)
+
+        call_command('generate_synthetic_data', cleanup=True, stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Booking.objects.exists())
+
+    def test_skipping_fk_checks_keeps_change_tracking(self):
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        call_command(
+            'generate_synthetic_data', customers=100, providers=10, bookings=500, days=30, future_days=5,
+            workers=2, chunk_size=5, skip_fk_checks=True, stdout=StringIO(),
+        )
+
+        self.assertEqual(Booking.objects.count(), 500)
+        self.assertTrue(Review.objects.exists())
+        # The triggers numbered the COPYed rows, so /changes/ sees them
+        self.assertFalse(Booking.objects.filter(change_seq=0).exists())
+        self.assertFalse(Review.objects.filter(change_seq=0).exists())
+        self.assertEqual(Booking.objects.values('change_seq').distinct().count(), 500)
+
+
+class AsyncViewTests(TestCase):
+    def test_otp_email_is_sent_from_the_async_view(self):
+        response = APIClient().post('/register/customer/', {
+            'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User', 'password': 'Passw0rd!',
+            'confirm_password': 'Passw0rd!', 'contact': '9876500001', 'gender': 'Male',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn(cache.get('registration_otp_new@example.com')['otp'], mail.outbox[0].body)
+
+
+class BenchmarkAsyncTests(TransactionTestCase):
+    def test_both_stacks_serve_every_request(self):
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_async', bookings=100, providers=5, customers=20, requests=24, concurrency=[1, 4],
+                workers=2, db_latency=1, mail_latency=10, output=path, stderr=StringIO(),
+            )
+            with open(path) as handle:
+                report = json.load(handle)
+
+        for stack in ('wsgi', 'asgi'):
+            self.assertEqual(set(report['results'][stack]), {'1', '4'})
+            for level in report['results'][stack].values():
+                self.assertEqual(level['statuses'], {'200': 24})
+                self.assertIn('GET /review/all/', level['routes'])
+
+
+class BenchmarkConnectionsTests(TestCase):
+    def test_persistent_modes_reuse_one_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('benchmark_connections', requests=6, warmup=2, output=path, stderr=StringIO())
+            with open(path) as handle:
+                modes = json.load(handle)['modes']
+
+        # At least one per request; more when replicas are configured
+        self.assertGreaterEqual(modes['reconnect']['connections'], 6)
+        self.assertEqual(modes['persistent']['connections'], 0)
+        self.assertEqual(modes['persistent+health-checks']['connections'], 0)
+        self.assertEqual(modes['reconnect']['saved_per_request_ms'], 0)
+
+    @override_settings(DATABASE_POOLER='transaction')
+    def test_synthetic_data_refuses_session_state_behind_a_pooler(self):
+        with self.assertRaisesMessage(CommandError, 'run it against the database directly'):
+            call_command('generate_synthetic_data', skip_fk_checks=True, stdout=StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_MAX_LAG=5)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        self.router = db_router.ReplicaRouter()
+
+    def read_alias(self, state):
+        with db_router.routing(state):
+            return self.router.db_for_read(User)
+
+    def test_only_reads_in_read_only_requests_use_a_replica(self):
+        with mock.patch.object(db_router, 'replica_lag', return_value=0):
+            self.assertEqual(self.read_alias(db_router.RequestRouting(read_only=True)), 'replica1')
+            self.assertEqual(self.read_alias(db_router.RequestRouting(read_only=False)), 'default')
+            self.assertIsNone(self.router.db_for_read(User))
+
+            state = db_router.RequestRouting(read_only=True)
+            with db_router.routing(state):
+                self.assertEqual(self.router.db_for_write(User), 'default')
+                self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_lagging_or_unreachable_replicas_fall_back_to_the_primary(self):
+        with mock.patch.object(db_router, 'replica_lag', return_value=60) as lag:
+            self.assertEqual(self.read_alias(db_router.RequestRouting(read_only=True)), 'default')
+            self.assertEqual(self.read_alias(db_router.RequestRouting(read_only=True)), 'default')
+        # The health check result is reused between requests
+        self.assertEqual(lag.call_count, 1)
+
+        db_router._health.clear()
+        with mock.patch.object(db_router, 'replica_lag', side_effect=OperationalError):
+            self.assertEqual(self.read_alias(db_router.RequestRouting(read_only=True)), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReadYourWritesTests(ProviderCustomerMixin, TransactionTestCase):
+    """
+    replica1 isn't a real connection here, so any read routed to it fails.
+    TestCase can't be used: reads inside its transaction stay on the primary.
+    """
+    def setUp(self):
+        super().setUp()
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+
+    def test_a_client_that_wrote_reads_from_the_primary(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.customer)}')
+
+        with mock.patch.object(db_router, 'replica_lag', return_value=0):
+            response = client.post('/booking/create/', {
+                'service_provider': self.provider.pk, 'date': '2030-01-02', 'time_slot': '10:00',
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertTrue(cache.get(db_router.pin_key(f'user:{self.customer.pk}')))
+
+            response = client.get('/booking/my-bookings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['bookings']), 1)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'needs DATABASE_REPLICAS')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Runs against a replica configured in the environment, which the test
+    runner points at the test database.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+
+    def test_get_requests_read_from_the_replica(self):
+        service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        User.objects.create_user(
+            username='provider@example.com', email='provider@example.com', password='Passw0rd!',
+            user_type='SERVICE_PROVIDER', category=service,
+        )
+        replica = settings.DATABASE_REPLICAS[0]
+        with CaptureQueriesContext(connections[replica]) as replica_queries, \
+                CaptureQueriesContext(connections['default']) as primary_queries:
+            response = self.client.get('/providers/')
+
+        self.assertEqual(len(response.json()['providers']), 1)
+        self.assertTrue(any('registration_user' in query['sql'] for query in replica_queries))
+        self.assertFalse(any('registration_user' in query['sql'] for query in primary_queries))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ResponseEncodingTests(TestCase):
+    def test_orjson_renderer_matches_the_stdlib_renderer(self):
+        data = {
+            'price': Decimal('499.50'), 'date': date(2024, 5, 1), 'time': time(9, 30),
+            'created': datetime(2024, 5, 1, 9, 30, tzinfo=dt_timezone.utc), 'name': 'Ravi\u2028Das', 'id': 7,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONParser().parse(BytesIO(b'{"a": [1, 2.5]}')), {'a': [1, 2.5]})
+        with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(negotiate_encoding('*'), 'br')
+        self.assertIsNone(negotiate_encoding('identity'))
+        self.assertIsNone(negotiate_encoding('gzip;q=0, br;q=0'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=200)
+    def test_large_get_responses_are_compressed(self):
+        service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        for i in range(10):
+            User.objects.create_user(
+                username=f'provider{i}@example.com', email=f'provider{i}@example.com', password='Passw0rd!',
+                first_name='Ravi', last_name='Das', user_type='SERVICE_PROVIDER', category=service,
+            )
+        plain = self.client.get('/providers/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/providers/', HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        response = self.client.get('/providers/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        # Below the threshold, and responses to writes, stay as they are
+        response = self.client.get('/services/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.post('/register/customer/', {}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        # HTML isn't compressed: admin pages carry CSRF tokens
+        response = self.client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertGreater(len(response.content), 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_benchmark_reports_every_encoding(self):
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_responses', bookings=100, providers=5, customers=20, repeat=1,
+                output=path, stderr=StringIO(),
+            )
+            with open(path) as handle:
+                endpoints = json.load(handle)['endpoints']
+
+        self.assertIn('/booking/provider-bookings/', endpoints)
+        requests = endpoints['/review/all/']['requests']
+        self.assertEqual(set(requests), {'identity', 'gzip', 'br'})
+        self.assertLess(requests['br']['bytes'], requests['identity']['bytes'])
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.001, SLOW_QUERY_EXPLAIN_RATE=1, SLOW_QUERY_LOG_SIZE=1000)
+class SlowQueryLogTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(self.customer)}'
+
+    def test_logs_query_with_view_stack_params_and_plan(self):
+        self.assertEqual(self.client.get('/booking/my-bookings/').status_code, 200)
+
+        entry = SlowQuery.objects.filter(sql__contains='"booking_booking"').get()
+        self.assertEqual((entry.method, entry.route), ('GET', '/booking/my-bookings/'))
+        self.assertEqual(entry.view, 'booking.views.UserBookingsView')
+        self.assertEqual(entry.params, [self.customer.pk])
+        self.assertIn('booking/views.py', entry.stack)
+        self.assertIn('actual time=', entry.plan)
+        self.assertIn('Buffers', entry.plan)
+
+    def test_writes_are_logged_without_explain(self):
+        booking = Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 2), time_slot=time(10, 0),
+        )
+        response = self.client.put(
+            f'/booking/update-status/{booking.pk}/', {'status': 'COMPLETE'}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.provider)}',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        update = SlowQuery.objects.get(sql__startswith='UPDATE "booking_booking"')
+        self.assertEqual(update.view, 'booking.views.UpdateBookingStatusView')
+        self.assertEqual(update.plan, '')
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=2)
+    def test_keeps_only_the_newest_rows(self):
+        for _ in range(3):
+            self.client.get('/booking/my-bookings/')
+        self.assertEqual(SlowQuery.objects.count(), 2)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_zero_threshold_turns_the_log_off(self):
+        self.client.get('/booking/my-bookings/')
+        self.assertFalse(SlowQuery.objects.exists())
+
+
+class QueryHookTests(TestCase):
+    def test_hooks_follow_the_context_into_other_threads(self):
+        seen = []
+
+        def hook(name):
+            def record(execute, sql, params, many, context):
+                seen.append((name, threading.get_ident()))
+                return execute(sql, params, many, context)
+            return record
+
+        def query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connection.close()
+
+        with observers.observe_queries(hook('outer')), observers.observe_queries(hook('inner')):
+            query()
+            thread = threading.Thread(target=copy_context().run, args=(query,))
+            thread.start()
+            thread.join()
+        query()
+
+        main, other = threading.get_ident(), thread.ident
+        self.assertEqual(seen, [('outer', main), ('inner', main), ('outer', other), ('inner', other)])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(PROFILING_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+
+    def test_signed_header_saves_profile_and_query_timeline(self):
+        response = self.client.get(
+            '/services/', HTTP_X_FIXLY_PROFILE=profiling_token(), HTTP_X_REQUEST_ID='req-42',
+        )
+        profile_id = response['X-Profile-ID']
+        self.assertRegex(profile_id, r'^req-42-[0-9a-f]{12}$')
+
+        stats = pstats.Stats(os.path.join(self.directory, f'{profile_id}.prof'))
+        self.assertTrue(any(name == 'list' for _, _, name in stats.stats))
+        with open(os.path.join(self.directory, f'{profile_id}.json')) as handle:
+            report = json.load(handle)
+        self.assertEqual((report['route'], report['status']), ('/services/', 200))
+        self.assertIn('FROM "service_service"', report['queries'][0]['sql'])
+        self.assertGreaterEqual(report['queries'][0]['start_ms'], 0)
+
+    def test_unsigned_requests_are_not_profiled(self):
+        response = self.client.get('/services/', HTTP_X_FIXLY_PROFILE='profile:forged')
+        self.assertNotIn('X-Profile-ID', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests_get_a_fresh_id(self):
+        response = self.client.get('/services/', HTTP_X_REQUEST_ID='../../etc/passwd')
+        profile_id = response['X-Profile-ID']
+        self.assertRegex(profile_id, r'^[0-9a-f]{32}$')
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{profile_id}.json', f'{profile_id}.prof'])
+
+    def test_callers_cannot_reuse_a_profile_id(self):
+        token = profiling_token()
+        ids = {
+            self.client.get('/services/', HTTP_X_FIXLY_PROFILE=token, HTTP_X_REQUEST_ID='req-42')['X-Profile-ID']
+            for _ in range(2)
+        }
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+    async def test_concurrent_async_requests_are_profiled_one_at_a_time(self):
+        headers = {'X-Fixly-Profile': profiling_token()}
+        responses = await asyncio.gather(*[self.async_client.get('/review/all/', headers=headers) for _ in range(2)])
+
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(sum('X-Profile-ID' in response for response in responses), 1)
+        self.assertFalse(profiling.PROFILER_LOCK.locked())
+
+
+class MemoryTrackingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(MEMORY_TRACKING_DIR=self.directory, MEMORY_TRACKING_SAMPLE_RATE=1)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(memory.flush_pending)
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+
+    def report(self, **options):
+        out = StringIO()
+        call_command('memory_report', json=True, stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def test_flags_a_route_that_keeps_memory_after_each_request(self):
+        leaked = []
+
+        def leak(view):
+            leaked.append(bytearray(256 * 1024))
+            return [AllowAny()]
+
+        with mock.patch.object(ServiceListCreateView, 'get_permissions', autospec=True, side_effect=leak):
+            for _ in range(4):
+                self.client.get('/services/')
+        memory.flush_pending()
+
+        route = self.report()['GET /services/']
+        self.assertEqual(route['samples'], 4)
+        self.assertTrue(route['growing'])
+        self.assertGreaterEqual(route['retained_bytes']['median'], 256 * 1024)
+        self.assertGreaterEqual(route['peak_bytes']['max'], 256 * 1024)
+        self.assertIn('registration/tests.py', route['top_sites'][0][0])
+
+    def test_requests_that_free_their_memory_are_not_flagged(self):
+        for _ in range(4):
+            self.client.get('/services/')
+        memory.flush_pending()
+
+        route = self.report()['GET /services/']
+        self.assertFalse(route['growing'])
+        self.assertGreater(route['held_bytes'], route['response_bytes'])
+        call_command('memory_report', clear=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(self.directory))
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class ChangesTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.providers = [self.provider, User.objects.create_user(
+            username='provider1@example.com', email='provider1@example.com', password='Passw0rd!',
+            first_name='Meera', last_name='Das', user_type='SERVICE_PROVIDER', category=self.service,
+        )]
+        self.booking = Booking.objects.create(
+            user=self.customer, service_provider=self.providers[0], date=date(2030, 1, 1), time_slot=time(10, 0)
+        )
+        self.review = Review.objects.create(reviewer=self.customer, service_provider=self.providers[0], rating=4)
+
+    def sync(self, user, since=None, expected_status=200):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/changes/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, expected_status, response.content)
+        return response.json()
+
+    def test_sync_returns_only_what_changed(self):
+        first = self.sync(self.customer)
+        self.assertEqual([row['id'] for row in first['bookings']], [self.booking.pk])
+        self.assertEqual([row['id'] for row in first['reviews']], [self.review.pk])
+        self.assertFalse(first['has_more'])
+
+        self.assertEqual(self.sync(self.customer, first['next'])['bookings'], [])
+
+        client = APIClient()
+        client.force_authenticate(self.providers[0])
+        response = client.put(f'/booking/update-status/{self.booking.pk}/', {'status': 'COMPLETE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        second = self.sync(self.customer, first['next'])
+        self.assertEqual([(row['id'], row['status']) for row in second['bookings']], [(self.booking.pk, 'COMPLETE')])
+        self.assertEqual(second['reviews'], [])
+        provider = self.sync(self.providers[0])
+        self.assertEqual([row['customer_id'] for row in provider['bookings']], [self.customer.pk])
+        self.assertEqual([row['id'] for row in provider['reviews']], [self.review.pk])
+
+    def test_deleted_and_moved_rows_are_tombstoned(self):
+        token = self.sync(self.customer)['next']
+        provider_token = self.sync(self.providers[0])['next']
+        self.booking.service_provider = self.providers[1]
+        self.booking.save()
+        review_id = self.review.pk
+        self.review.delete()
+
+        customer = self.sync(self.customer, token)
+        self.assertEqual([row['id'] for row in customer['bookings']], [self.booking.pk])
+        self.assertEqual(customer['deleted'], {'bookings': [], 'reviews': [review_id]})
+        provider = self.sync(self.providers[0], provider_token)
+        self.assertEqual(provider['bookings'], [])
+        self.assertEqual(provider['deleted'], {'bookings': [self.booking.pk], 'reviews': [review_id]})
+
+        # Moved back, the booking is the first provider's again
+        self.booking.service_provider = self.providers[0]
+        self.booking.save()
+        provider = self.sync(self.providers[0], provider_token)
+        self.assertEqual([row['id'] for row in provider['bookings']], [self.booking.pk])
+        self.assertEqual(provider['deleted']['bookings'], [])
+
+    def test_pages_follow_the_sequence(self):
+        for day in range(2, 6):
+            Booking.objects.create(
+                user=self.customer, service_provider=self.providers[1], date=date(2030, 1, day), time_slot=time(10, 0)
+            )
+        seen, token = [], None
+        with self.settings(CHANGES_PAGE_SIZE=2):
+            while True:
+                page = self.sync(self.customer, token)
+                seen += [('booking', row['id']) for row in page['bookings']]
+                seen += [('review', row['id']) for row in page['reviews']]
+                token = page['next']
+                if not page['has_more']:
+                    break
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_unsettled_changes_are_sent_again(self):
+        with self.settings(CHANGES_SETTLE_SECONDS=3600):
+            page = self.sync(self.customer)
+            self.assertEqual(len(page['bookings']), 1)
+            self.assertEqual(len(self.sync(self.customer, page['next'])['bookings']), 1)
+
+    def test_bad_and_expired_tokens(self):
+        self.assertIn('since', self.sync(self.customer, 'nonsense', expected_status=400))
+        token = change_token(0)
+        with mock.patch('django.core.signing.time.time', return_value=datetime.now().timestamp() + 31 * 86400):
+            self.sync(self.customer, token, expected_status=410)
+
+    def test_old_tombstones_are_pruned(self):
+        self.review.delete()
+        between = timezone.now()
+        self.booking.delete()
+        with mock.patch('django.utils.timezone.now', return_value=between + timedelta(days=30)):
+            call_command('prune_tombstones', stdout=StringIO())
+        self.assertEqual(sorted(Tombstone.objects.values_list('model', flat=True)), ['booking', 'booking'])
+
+
+class BatchTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Review.objects.create(reviewer=self.customer, service_provider=self.provider, rating=5)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.customer)}')
+
+    def batch(self, *requests, expected_status=200):
+        response = self.client.post('/batch/', {'requests': list(requests)}, format='json')
+        self.assertEqual(response.status_code, expected_status, response.content)
+        return response.json()
+
+    def test_start_up_requests_in_one_round_trip(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.batch(
+                {'path': '/profile/'}, {'path': '/services/'}, {'path': '/booking/my-bookings/'},
+                {'path': f'/review/all/?reviewer_id={self.customer.pk}'},
+            )
+        profile, services, bookings, reviews = data['responses']
+        self.assertEqual(profile, {'status': 200, 'body': {
+            'user': {'id': self.customer.pk, 'first_name': 'Asha', 'last_name': 'Khan', 'email': self.customer.email},
+            'is_admin': False,
+        }})
+        self.assertEqual([row['category'] for row in services['body']], ['Plumber'])
+        self.assertEqual(bookings['body']['bookings'], [])
+        self.assertEqual([row['provider_name'] for row in reviews['body']], ['Ravi Das'])
+        # The user is loaded once, for the batch
+        self.assertEqual(sum('FROM "registration_user"' in query['sql'] for query in ctx.captured_queries), 1)
+
+    @override_settings(COMPRESSION_MIN_SIZE=200)
+    def test_batch_responses_are_compressed(self):
+        # Large enough that gzip's random padding can't outweigh the savings
+        Service.objects.bulk_create(
+            Service(category=f'Category {index}', description='Pipes', price='100.00') for index in range(20)
+        )
+        body = {'requests': [{'path': '/profile/'}, {'path': '/services/'}, {'path': '/booking/my-bookings/'}]}
+        plain = self.client.post('/batch/', body, format='json')
+        self.assertGreater(len(plain.content), 1000)
+        response = self.client.post('/batch/', body, format='json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_writes_run_in_order_and_errors_stay_per_entry(self):
+        booking = {'date': '2031-01-01', 'time_slot': '10:00', 'service_provider': self.provider.pk}
+        data = self.batch(
+            {'path': '/booking/my-bookings/'},
+            {'method': 'POST', 'path': '/booking/create/', 'body': booking},
+            {'method': 'POST', 'path': '/booking/create/', 'body': booking},
+            {'path': '/booking/my-bookings/'},
+            {'path': '/booking/provider-bookings/'},
+        )
+        self.assertEqual([entry['status'] for entry in data['responses']], [200, 201, 400, 200, 403])
+        self.assertEqual(data['responses'][0]['body']['bookings'], [])
+        self.assertEqual(len(data['responses'][3]['body']['bookings']), 1)
+
+    def test_anonymous_callers_cannot_batch(self):
+        self.client.credentials()
+        self.batch({'path': '/services/'}, expected_status=401)
+
+    def test_rejects_what_cannot_be_batched(self):
+        for path in (
+            '/batch/', '/booking/events/', '/admin/', '/metrics', '/nowhere/',
+            '/login/', '/register/customer/', '/validate-otp/', '/resend-provider-otp/',
+        ):
+            with self.subTest(path):
+                self.assertIn('path', self.batch({'path': path}, expected_status=400)['requests'][0])
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            self.batch(*[{'path': '/services/'}] * 3, expected_status=400)
+        self.batch(expected_status=400)
+
+
+class BatchParallelTests(ProviderCustomerMixin, TransactionTestCase):
+    def test_read_only_requests_run_in_parallel(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.customer)}')
+        request_context = ContextVar('request_context', default=None)
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            seen.append((threading.get_ident(), request_context.get(), sql))
+            return execute(sql, params, many, context)
+
+        token = request_context.set('batch')
+        try:
+            with connection.execute_wrapper(record), \
+                    mock.patch('utils.batch.run_in_thread', wraps=batch.run_in_thread) as run_in_thread:
+                response = client.post('/batch/', {'requests': [
+                    {'path': '/profile/'}, {'path': '/services/'}, {'path': '/booking/my-bookings/'},
+                    {'method': 'PATCH', 'path': '/update/customer/', 'body': {'last_name': 'Rao'}},
+                    {'path': '/profile/'},
+                ]}, format='json')
+        finally:
+            request_context.reset(token)
+        responses = response.json()['responses']
+        self.assertEqual([entry['status'] for entry in responses], [200, 200, 200, 200, 200])
+        self.assertEqual(responses[1]['body'][0]['category'], 'Plumber')
+        self.assertEqual(responses[4]['body']['user']['last_name'], 'Rao')
+        # The first read runs on the request's thread, the next two beside it
+        self.assertEqual(run_in_thread.call_count, 2)
+        # Their queries go through the request's wrappers, in the request's context
+        self.assertGreater(len({thread for thread, _, _ in seen}), 1)
+        self.assertEqual({value for _, value, _ in seen}, {'batch'})
+        self.assertTrue(any('service_service' in sql for _, _, sql in seen))
+
+
+class SparseFieldsetTests(ProviderCustomerMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(10, 0)
+        )
+        Review.objects.create(reviewer=self.customer, service_provider=self.provider, rating=4, comment='Good')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, path, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        return response.json(), ctx.captured_queries[0]['sql']
+
+    def test_fields_prune_columns_and_joins(self):
+        reviews, sql = self.get('/review/all/', fields='rating,comment')
+        self.assertEqual(reviews, [{'rating': 4, 'comment': 'Good'}])
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('created_at', sql.split('FROM')[0])
+
+        reviews, sql = self.get('/review/all/', fields='rating,provider_name')
+        self.assertEqual(reviews, [{'rating': 4, 'provider_name': 'Ravi Das'}])
+        self.assertEqual(sql.count('JOIN'), 1)
+
+        bookings, sql = self.get('/booking/my-bookings/', fields='id,service_provider_id')
+        self.assertEqual(bookings['bookings'], [{'id': self.booking.pk, 'service_provider_id': self.provider.pk}])
+        self.assertNotIn('JOIN', sql)
+
+        providers, sql = self.get('/providers/', fields='id,first_name')
+        self.assertEqual(providers['providers'], [{'id': self.provider.pk, 'first_name': 'Ravi'}])
+        self.assertNotIn('password', sql)
+
+        services, sql = self.get('/services/', fields='category')
+        self.assertEqual(services, [{'category': 'Plumber'}])
+        self.assertNotIn('description', sql)
+
+    def test_default_output_is_unchanged(self):
+        bookings, _ = self.get('/booking/my-bookings/')
+        self.assertEqual(bookings['bookings'], [{
+            'id': self.booking.pk, 'date': '2030-01-01', 'time_slot': '10:00:00',
+            'service_provider_id': self.provider.pk, 'service_provider_name': 'Ravi Das', 'status': 'PENDING',
+        }])
+        reviews, _ = self.get('/review/all/')
+        self.assertEqual(
+            {key: value for key, value in reviews[0].items() if key != 'created_at'},
+            {
+                'id': reviews[0]['id'], 'reviewer_name': 'Asha Khan', 'provider_name': 'Ravi Das',
+                'provider_email': 'provider@example.com', 'service_category': 'Plumber', 'rating': 4,
+                'comment': 'Good',
+            },
+        )
+
+    def test_expand_nests_related_objects_in_the_same_query(self):
+        bookings, sql = self.get('/booking/my-bookings/', fields='id', expand='service_provider.category')
+        provider = bookings['bookings'][0]['service_provider']
+        self.assertEqual((provider['first_name'], provider['category']['category']), ('Ravi', 'Plumber'))
+        self.assertEqual(sql.count('JOIN'), 2)
+
+        providers, _ = self.get('/providers/', expand='category', fields='id,category')
+        self.assertEqual(providers['providers'], [{'id': self.provider.pk, 'category': {
+            'id': self.service.pk, 'category': 'Plumber', 'description': 'Pipes', 'price': '100.00',
+        }}])
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/review/all/', {'fields': 'rating,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: secret.']})
+        response = self.client.get('/booking/my-bookings/', {'expand': 'service_provider.password'})
+        self.assertEqual(response.json(), {'expand': ['service_provider.password cannot be expanded.']})
+
+
+class RowMapperTests(RowMapperMixin, TestCase):
+    def test_rows_match_the_serializer(self):
+        providers = User.objects.filter(user_type='SERVICE_PROVIDER').order_by('pk')
+        self.assertMatchesSerializer(ProviderSerializer, providers)
+        rows = self.assertMatchesSerializer(ProviderSerializer, providers, ['id'], {'category': {}})
+        self.assertEqual([row['category'] and row['category']['price'] for row in rows], ['99.50', None])
+
+    def test_benchmark_reports_per_row_cost(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_serializers', bookings=200, providers=20, customers=20, rows=50, repeat=1,
+                output=path, stderr=StringIO(),
+            )
+            with open(path) as handle:
+                report = json.load(handle)['lists']
+
+        self.assertEqual(
+            set(report), {'/booking/my-bookings/', '/booking/provider-bookings/', '/review/all/', '/providers/'},
+        )
+        self.assertEqual(report['/providers/']['rows'], 20)
+        self.assertEqual(set(report['/review/all/']['us_per_row']), {'serializer', 'values'})
+
+
+class QueryBudgetTests(ProviderCustomerMixin, QueryBudgetMixin, TestCase):
+    """
+    Every API route and admin changelist must run a fixed number of queries
+    however many rows it returns. Each case runs in a savepoint that is rolled
+    back, so all of them start from the same data.
+    """
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Passw0rd!',
+        )
+        self.rows = 0
+        self.calls = 0
+
+    def grow(self, count):
+        """
+        Adds rows that every list in the API and admin should return.
+        """
+        for _ in range(count):
+            self.rows += 1
+            i = self.rows
+            service = Service.objects.create(category='Cleaning', description=f'Service {i}', price='100.00')
+            provider = User.objects.create_user(
+                username=f'provider{i}@example.com', email=f'provider{i}@example.com', password='Passw0rd!',
+                first_name='Ravi', last_name=f'Das{i}', user_type='SERVICE_PROVIDER', category=service,
+            )
+            customer = User.objects.create_user(
+                username=f'customer{i}@example.com', email=f'customer{i}@example.com', password='Passw0rd!',
+                first_name='Asha', last_name=f'Khan{i}', user_type='USER',
+            )
+            day = date(2030, 1, 1) + timedelta(days=i)
+            Booking.objects.create(user=self.customer, service_provider=provider, date=day, time_slot=time(10, 0))
+            Booking.objects.create(user=customer, service_provider=self.provider, date=day, time_slot=time(11, 0))
+            Review.objects.create(reviewer=customer, service_provider=self.provider, rating=4)
+            Review.objects.create(reviewer=self.customer, service_provider=provider, rating=5)
+            token = OutstandingToken.objects.create(
+                user=customer, jti=f'jti-{i}', token=f'token-{i}', expires_at=timezone.now() + timedelta(days=1),
+            )
+            BlacklistedToken.objects.create(token=token)
+            ExportJob.objects.create(model_label='booking.Booking', fields=['id'], requested_by=customer)
+
+    @contextmanager
+    def rolled_back(self):
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+        self.rows = 0
+
+    def next_call(self):
+        self.calls += 1
+        return self.calls
+
+    def api_cases(self):
+        customer, provider = self.customer, self.provider
+
+        def signup():
+            n = self.next_call()
+            return {
+                'email': f'signup{n}@example.com', 'first_name': 'Load', 'last_name': 'Test',
+                'password': 'Passw0rd!', 'confirm_password': 'Passw0rd!', 'contact': f'98765{n:05d}',
+                'gender': 'Male', 'location': 'Pune', 'category': self.service.pk,
+            }
+
+        def booking():
+            return {
+                'date': str(date(2031, 1, 1) + timedelta(days=self.next_call())), 'time_slot': '10:00',
+                'service_provider': provider.pk,
+            }
+
+        def review():
+            n = self.next_call()
+            spare = User.objects.create_user(
+                username=f'spare{n}@example.com', email=f'spare{n}@example.com', password='Passw0rd!',
+                first_name='Spare', last_name=f'Provider{n}', user_type='SERVICE_PROVIDER', category=self.service,
+            )
+            return {'service_provider': spare.pk, 'rating': 4}
+
+        return [
+            ('GET', '/', None, None),
+            ('GET', '/metrics', None, None),
+            ('POST', '/register/customer/', None, signup),
+            ('POST', '/register/provider/', None, signup),
+            ('POST', '/login/', None, lambda: {'email': customer.email, 'password': 'Passw0rd!'}),
+            ('POST', '/logout/', customer, lambda: {'refresh_token': str(RefreshToken.for_user(customer))}),
+            ('POST', '/refresh/', None, lambda: {'refresh': str(RefreshToken.for_user(customer))}),
+            ('GET', '/profile/', customer, None),
+            ('PATCH', '/update/customer/', customer, lambda: {'last_name': f'Khan{self.next_call()}'}),
+            ('PATCH', '/update/provider/', provider, lambda: {'location': f'Pune{self.next_call()}'}),
+            ('GET', '/providers/', None, None),
+            ('GET', '/changes/', customer, None),
+            ('GET', '/changes/', provider, lambda: {'since': change_token(0)}),
+            ('POST', '/batch/', customer, lambda: {'requests': [
+                {'path': '/profile/'}, {'path': '/services/'}, {'path': '/booking/my-bookings/'},
+                {'path': f'/review/all/?reviewer_id={customer.pk}'},
+            ]}),
+            ('POST', '/validate-otp/', None, lambda: {'email': 'nobody@example.com', 'otp': '000000'}),
+            ('POST', '/resend-otp/', None, lambda: {'email': signup()['email']}),
+            ('POST', '/validate-provider-otp/', None, lambda: {'email': 'nobody@example.com', 'otp': '000000'}),
+            ('POST', '/resend-provider-otp/', None, lambda: {'email': signup()['email']}),
+            ('GET', '/services/', None, None),
+            ('GET', f'/services/{self.service.pk}/', None, None),
+            ('POST', '/review/create/', customer, review),
+            ('GET', '/review/all/', None, None),
+            ('POST', '/booking/create/', customer, booking),
+            ('GET', '/booking/my-bookings/', customer, None),
+            ('GET', '/booking/provider-bookings/', provider, None),
+            ('POST', '/booking/slots/', customer, lambda: {'date': '2030-01-02', 'service_provider_id': provider.pk}),
+            ('PUT', f'/booking/update-status/{{booking}}/', provider, lambda: {'status': 'COMPLETE'}),
+        ]
+
+    def admin_paths(self):
+        paths = ['/admin/', '/admin/registration/dashboard/']
+        for model in custom_admin_site._registry:
+            paths.append(reverse(f'custom_admin:{model._meta.app_label}_{model._meta.model_name}_changelist'))
+        paths += [
+            reverse('custom_admin:booking_customer_autocomplete') + '?term=Khan',
+            reverse('custom_admin:booking_provider_autocomplete') + '?term=Das',
+        ]
+        return paths
+
+    def test_every_route_has_a_case(self):
+        covered = {re.sub(r'/\d+/$', '/<int:pk>/', path).replace('{booking}', '<int:pk>')
+                   for _, path, _, _ in self.api_cases()}
+        # The event stream runs one query, to authenticate, and only under ASGI
+        self.assertEqual(sorted(set(project_routes()) - covered - {'/create-admin/', '/booking/events/'}), [])
+
+    def test_api_queries_do_not_grow_with_rows(self):
+        booking = Booking.objects.create(
+            user=self.customer, service_provider=self.provider, date=date(2030, 1, 1), time_slot=time(12, 0),
+        )
+        for method, path, user, data in self.api_cases():
+            path = path.replace('{booking}', str(booking.pk))
+            with self.subTest(f'{method} {path}'), self.rolled_back():
+                client = APIClient()
+                if user:
+                    client.force_authenticate(user)
+
+                def request():
+                    response = getattr(client, method.lower())(path, data() if data else None, format='json')
+                    self.assertLess(response.status_code, 500, response.content[:500])
+
+                self.assertQueriesDoNotGrow(f'{method} {path}', request, self.grow)
+
+    def test_admin_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        for path in self.admin_paths():
+            with self.subTest(path), self.rolled_back():
+                def request():
+                    self.assertEqual(self.client.get(path).status_code, 200)
+
+                self.assertQueriesDoNotGrow(f'GET {path}', request, self.grow)
+
+    def test_growth_report_shows_the_repeated_query_and_its_caller(self):
+        def request():
+            return [booking.user.email for booking in Booking.objects.all()]
+
+        with self.assertRaises(AssertionError) as ctx:
+            self.assertQueriesDoNotGrow('bookings', request, self.grow)
+        message = str(ctx.exception)
+        self.assertIn('bookings: 5 queries with 2 rows, 13 with 6 rows.', message)
+        self.assertIn('4 -> 12 x SELECT', message)
+        self.assertIn('FROM "registration_user"', message)
+        self.assertIn('in request', message)
@@ -13,7 +13,9 @@ from .views import (
     ValidateOTPView,
     ResendOTPView,
     ValidateProviderOTPView,
-    ResendProviderOTPView
+    ResendProviderOTPView,
+    ChangesView,
+    BatchView,
 )
 from . import views
 
@@ -29,6 +31,8 @@ urlpatterns = [
     path('update/customer/', UserUpdateView.as_view(), name='update_customer'),
     path('update/provider/', ProviderUpdateView.as_view(), name='update_provider'),
     path('providers/', ServiceProviderListView.as_view(), name='provider_list'),
+    path('changes/', ChangesView.as_view(), name='changes'),
+    path('batch/', BatchView.as_view(), name='batch'),
     path('validate-otp/', ValidateOTPView.as_view(), name='validate_otp'),
     path('resend-otp/', ResendOTPView.as_view(), name='resend_otp'),
     path('validate-provider-otp/', ValidateProviderOTPView.as_view(), name='validate_provider_otp'),
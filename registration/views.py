@@ -1,3 +1,5 @@
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.views import APIView
@@ -9,18 +11,31 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.http import JsonResponse
 import random
 import string
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.core.cache import cache
 from datetime import timedelta
 from django.utils import timezone
+from django.core import signing
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Now
+from itertools import chain
+
+from booking.models import Booking
+from booking.serializers import UserBookingSerializer, ProviderBookingSerializer
+from review.models import Review
+from review.serializers import ReviewListSerializer
+from utils.batch import build_subrequest, run_batch
+from utils.changes import change_token, read_change_token
+from utils.email import asend_mail
+
+from .models import Tombstone
 
 from .serializers import (
     CustomerRegistrationSerializer, ServiceProviderRegistrationSerializer,
     UserUpdateSerializer, ServiceProviderUpdateSerializer,
-    UserSerializer, ProviderSerializer
+    UserSerializer, ProviderSerializer, BatchSerializer
 )
 
 User = get_user_model()
@@ -57,7 +72,7 @@ def index(request):
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
-def send_otp_email(email, otp):
+async def send_otp_email(email, otp):
     subject = 'Your Fixly Registration OTP'
     html_message = render_to_string('registration/email/otp_email.html', {
         'otp': otp,
@@ -67,7 +82,7 @@ def send_otp_email(email, otp):
     plain_message = strip_tags(html_message)
     
     try:
-        send_mail(
+        await asend_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -80,16 +95,17 @@ def send_otp_email(email, otp):
         print(f"Error sending email: {str(e)}")
         return False
 
-class CustomerRegistrationView(APIView):
+class CustomerRegistrationView(AsyncAPIView):
     permission_classes = [AllowAny]
+    batchable = False
 
-    def post(self, request):
+    async def post(self, request):
         serializer = CustomerRegistrationSerializer(data=request.data)
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             email = serializer.validated_data['email']
             
             # Check if user already exists
-            if User.objects.filter(email=email).exists():
+            if await User.objects.filter(email=email).aexists():
                 return Response({
                     'error': 'Email already registered.'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -98,13 +114,13 @@ class CustomerRegistrationView(APIView):
             
             # Store OTP in cache with 10 minutes expiration
             cache_key = f'registration_otp_{email}'
-            cache.set(cache_key, {
+            await cache.aset(cache_key, {
                 'otp': otp,
                 'data': serializer.validated_data
             }, timeout=600)  # 10 minutes
 
             # Send OTP via email
-            if send_otp_email(email, otp):
+            if await send_otp_email(email, otp):
                 return Response({
                     'message': 'OTP sent to your email.',
                     'email': email,
@@ -119,6 +135,7 @@ class CustomerRegistrationView(APIView):
 
 class ValidateOTPView(APIView):
     permission_classes = [AllowAny]
+    batchable = False
 
     def post(self, request):
         email = request.data.get('email')
@@ -182,10 +199,11 @@ class ValidateOTPView(APIView):
                 'error': f'Failed to create user: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class ResendOTPView(APIView):
+class ResendOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
+    batchable = False
 
-    def post(self, request):
+    async def post(self, request):
         email = request.data.get('email')
         if not email:
             return Response({
@@ -193,18 +211,18 @@ class ResendOTPView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if user already exists
-        if User.objects.filter(email=email).exists():
+        if await User.objects.filter(email=email).aexists():
             return Response({
                 'error': 'Email already registered.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if there's an existing OTP request
         cache_key = f'registration_otp_{email}'
-        stored_data = cache.get(cache_key)
+        stored_data = await cache.aget(cache_key)
         
         if stored_data:
             # Check if enough time has passed (1 minute cooldown)
-            if cache.ttl(cache_key) > 540:  # 9 minutes (allowing 1 minute cooldown)
+            if await sync_to_async(cache.ttl)(cache_key) > 540:  # 9 minutes (allowing 1 minute cooldown)
                 return Response({
                     'error': 'Please wait before requesting a new OTP.'
                 }, status=status.HTTP_429_TOO_MANY_REQUESTS)
@@ -213,13 +231,13 @@ class ResendOTPView(APIView):
         otp = generate_otp()
         
         # Store new OTP in cache
-        cache.set(cache_key, {
+        await cache.aset(cache_key, {
             'otp': otp,
             'data': stored_data['data'] if stored_data else None
         }, timeout=600)  # 10 minutes
 
         # Send new OTP
-        if send_otp_email(email, otp):
+        if await send_otp_email(email, otp):
             return Response({
                 'message': 'New OTP sent to your email.',
                 'email': email,
@@ -230,16 +248,17 @@ class ResendOTPView(APIView):
                 'error': 'Failed to send OTP. Please try again.'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class ServiceProviderRegistrationView(APIView):
+class ServiceProviderRegistrationView(AsyncAPIView):
     permission_classes = [AllowAny]
+    batchable = False
 
-    def post(self, request):
+    async def post(self, request):
         serializer = ServiceProviderRegistrationSerializer(data=request.data)
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             email = serializer.validated_data['email']
             
             # Check if user already exists
-            if User.objects.filter(email=email).exists():
+            if await User.objects.filter(email=email).aexists():
                 return Response({
                     'error': 'Email already registered.'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -248,13 +267,13 @@ class ServiceProviderRegistrationView(APIView):
             
             # Store OTP in cache with 10 minutes expiration
             cache_key = f'provider_registration_otp_{email}'
-            cache.set(cache_key, {
+            await cache.aset(cache_key, {
                 'otp': otp,
                 'data': serializer.validated_data
             }, timeout=600)  # 10 minutes
 
             # Send OTP via email
-            if send_otp_email(email, otp):
+            if await send_otp_email(email, otp):
                 return Response({
                     'message': 'OTP sent to your email.',
                     'email': email,
@@ -269,6 +288,7 @@ class ServiceProviderRegistrationView(APIView):
 
 class ValidateProviderOTPView(APIView):
     permission_classes = [AllowAny]
+    batchable = False
 
     def post(self, request):
         email = request.data.get('email')
@@ -349,10 +369,11 @@ class ValidateProviderOTPView(APIView):
                 'error': f'Failed to create service provider: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class ResendProviderOTPView(APIView):
+class ResendProviderOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
+    batchable = False
 
-    def post(self, request):
+    async def post(self, request):
         email = request.data.get('email')
         if not email:
             return Response({
@@ -360,18 +381,18 @@ class ResendProviderOTPView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if user already exists
-        if User.objects.filter(email=email).exists():
+        if await User.objects.filter(email=email).aexists():
             return Response({
                 'error': 'Email already registered.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # Check if there's an existing OTP request
         cache_key = f'provider_registration_otp_{email}'
-        stored_data = cache.get(cache_key)
+        stored_data = await cache.aget(cache_key)
         
         if stored_data:
             # Check if enough time has passed (1 minute cooldown)
-            if cache.ttl(cache_key) > 540:  # 9 minutes (allowing 1 minute cooldown)
+            if await sync_to_async(cache.ttl)(cache_key) > 540:  # 9 minutes (allowing 1 minute cooldown)
                 return Response({
                     'error': 'Please wait before requesting a new OTP.'
                 }, status=status.HTTP_429_TOO_MANY_REQUESTS)
@@ -380,13 +401,13 @@ class ResendProviderOTPView(APIView):
         otp = generate_otp()
         
         # Store new OTP in cache
-        cache.set(cache_key, {
+        await cache.aset(cache_key, {
             'otp': otp,
             'data': stored_data['data'] if stored_data else None
         }, timeout=600)  # 10 minutes
 
         # Send new OTP
-        if send_otp_email(email, otp):
+        if await send_otp_email(email, otp):
             return Response({
                 'message': 'New OTP sent to your email.',
                 'email': email,
@@ -399,6 +420,7 @@ class ResendProviderOTPView(APIView):
 
 class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    batchable = False
 
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
@@ -462,10 +484,10 @@ class ProviderUpdateView(APIView):
             return Response({'message': 'Service provider profile updated successfully.', 'provider': serializer.data}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ServiceProviderListView(APIView):
+class ServiceProviderListView(AsyncAPIView):
     permission_classes = [AllowAny]
 
-    def get(self, request):
+    async def get(self, request):
         filters = {'user_type': 'SERVICE_PROVIDER'}
         category = request.query_params.get('category')
         location = request.query_params.get('location')
@@ -474,9 +496,132 @@ class ServiceProviderListView(APIView):
         if location:
             filters['location'] = location
 
-        queryset = User.objects.filter(**filters)
-        serializer = ProviderSerializer(queryset, many=True)
-        return Response({'providers': serializer.data}, status=status.HTTP_200_OK)
+        fields, expand = ProviderSerializer.fieldset(request)
+        providers = ProviderSerializer.values_queryset(User.objects.filter(**filters), fields, expand)
+        to_row = ProviderSerializer.row_mapper(fields, expand)
+        return Response({'providers': [to_row(user) async for user in providers]}, status=status.HTTP_200_OK)
+
+def changed_rows(queryset, after, timestamp, limit):
+    """
+    The first `limit` + 1 rows of `queryset` changed after sequence `after`,
+    each annotated with whether it is settled: changed over
+    CHANGES_SETTLE_SECONDS ago, when any transaction that took an earlier
+    sequence value has committed.
+    """
+    settle_before = Now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    return list(
+        queryset.filter(change_seq__gt=after).annotate(
+            settled=ExpressionWrapper(Q(**{f'{timestamp}__lte': settle_before}), output_field=BooleanField())
+        ).order_by('change_seq')[:limit + 1]
+    )
+
+
+class ChangesView(APIView):
+    """
+    The user's bookings and reviews (written or received) created or changed
+    since their last sync, and the ids of those deleted or moved to someone
+    else, so clients can keep local copies instead of downloading the lists
+    again. Without `since` every row is returned, as the initial sync.
+
+    Pass `next` back as `since`, and again straight away while `has_more` is
+    set. Rows changed in the last CHANGES_SETTLE_SECONDS are returned but the
+    token stops before them, as a transaction that took an earlier sequence
+    value may not have committed yet; they come again on the next sync, so
+    clients must apply changes as upserts. A token older than
+    CHANGES_TOMBSTONE_DAYS gets 410 Gone: download the lists again.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        since = request.query_params.get('since')
+        try:
+            after = read_change_token(since) if since else 0
+        except signing.SignatureExpired:
+            return Response(
+                {'error': 'This sync token has expired; download the full lists again.'}, status=status.HTTP_410_GONE
+            )
+        except (signing.BadSignature, ValueError):
+            return Response({'since': ['Not a valid sync token.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        if user.user_type == 'SERVICE_PROVIDER':
+            bookings = Booking.objects.filter(service_provider=user).select_related('user')
+            booking_serializer = ProviderBookingSerializer
+        else:
+            bookings = Booking.objects.filter(user=user).select_related('service_provider')
+            booking_serializer = UserBookingSerializer
+        reviews = Review.objects.filter(Q(reviewer=user) | Q(service_provider=user)).select_related(
+            'service_provider', 'reviewer'
+        )
+
+        limit = settings.CHANGES_PAGE_SIZE
+        rows = sorted(chain(
+            changed_rows(bookings, after, 'updated_at', limit),
+            changed_rows(reviews, after, 'updated_at', limit),
+            # A first sync has nothing to delete
+            changed_rows(Tombstone.objects.filter(owner_id=user.pk), after, 'deleted_at', limit) if after else [],
+        ), key=lambda row: row.change_seq)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        last = after
+        for row in rows:
+            if not row.settled:
+                break
+            last = row.change_seq
+
+        changed = {Booking: [], Review: []}
+        deleted = {'booking': set(), 'review': set()}
+        for row in rows:
+            if isinstance(row, Tombstone):
+                deleted[row.model].add(row.object_id)
+            else:
+                changed[type(row)].append(row)
+        # A row the user got back after it was moved away is theirs again
+        deleted['booking'] -= {booking.pk for booking in changed[Booking]}
+        deleted['review'] -= {review.pk for review in changed[Review]}
+
+        return Response({
+            'bookings': booking_serializer(changed[Booking], many=True).data,
+            'reviews': ReviewListSerializer(changed[Review], many=True).data,
+            'deleted': {'bookings': sorted(deleted['booking']), 'reviews': sorted(deleted['review'])},
+            'next': change_token(last),
+            # Not when only unsettled rows are left: asking again right away would return them again
+            'has_more': has_more and last > after,
+        }, status=status.HTTP_200_OK)
+
+
+class BatchView(APIView):
+    """
+    Runs several API requests in one round trip, e.g. what the app loads at
+    start-up: profile/, services/, booking/my-bookings/ and
+    review/all/?reviewer_id=. The caller is authenticated once, for all of
+    them, and middleware runs once. Read-only requests in a row run in
+    parallel (see utils.batch.run_batch); each entry's status and body come
+    back in order, whatever the others returned. Signed-in callers only:
+    sub-requests skip the middleware, rate limits included. That is why
+    views that send OTP emails or check OTPs or passwords set
+    `batchable = False`: each request is one email or one guess, not a
+    batch's worth. Batches can't contain batches either.
+
+    The combined body is usually the largest the API sends, so it is
+    compressed even though this is a POST: callers sign in with a bearer
+    token, which a cross-site page can't attach to a forged request.
+    """
+    permission_classes = [IsAuthenticated]
+    batchable = False
+    compress_response = True
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        subrequests = [
+            build_subrequest(request, entry['method'], entry['path'], entry.get('body'), entry['match'])
+            for entry in serializer.validated_data['requests']
+        ]
+        return Response({'responses': run_batch(subrequests)}, status=status.HTTP_200_OK)
+
 
 def get_category_name(user):
     if user.category:  # New ForeignKey
@@ -1,10 +1,18 @@
 from django.contrib import admin
 from .models import Review
-from utils.admin_actions import export_as_csv_action
+from utils.admin_actions import export_as_csv_action, background_export_actions
+from utils.paginator import EstimatedCountPaginator
+from utils.search import TrigramSearchMixin
 from django.utils.html import format_html
 
+EXPORT_FIELDS = [
+    'id', 'reviewer.email', 'service_provider.email', 'service_provider.category.category',
+    'rating', 'comment', 'created_at',
+]
+
+
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = (
         'get_reviewer_name',
         'get_reviewer_email',
@@ -14,6 +22,9 @@ class ReviewAdmin(admin.ModelAdmin):
         'created_at'
     )
     list_filter = ('rating', 'created_at')
+    list_select_related = ('reviewer', 'service_provider')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = (
         'reviewer__email', 'reviewer__first_name', 'reviewer__last_name',
         'service_provider__email', 'service_provider__first_name', 'service_provider__last_name',
@@ -21,7 +32,10 @@ class ReviewAdmin(admin.ModelAdmin):
     )
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
-    actions = [export_as_csv_action()]
+    actions = [
+        export_as_csv_action(),
+        *background_export_actions(EXPORT_FIELDS, watermark_field='created_at'),
+    ]
 
     fieldsets = (
         ('Review Details', {
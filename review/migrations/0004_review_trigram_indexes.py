@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from utils.search import trigram_indexes
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('review', '0003_alter_review_created_at'),
+    ]
+
+    operations = [
+        trigram_indexes('review_review', ['comment']),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from utils.changes import track_changes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0004_review_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewer', 'change_seq'], name='review_reviewer_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['service_provider', 'change_seq'], name='review_provider_changes_idx'),
+        ),
+        track_changes('review_review', 'updated_at', backfill_from='created_at'),
+    ]
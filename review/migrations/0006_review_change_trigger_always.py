@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from utils.changes import fire_always
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0005_review_change_tracking'),
+    ]
+
+    operations = [
+        fire_always('review_review'),
+    ]
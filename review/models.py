@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from registration.models import User 
 
 class Review(models.Model):
@@ -6,11 +7,18 @@ class Review(models.Model):
     service_provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews_received')
     rating = models.PositiveIntegerField()
     comment = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Both set by a database trigger on every change (see utils.changes)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    change_seq = models.BigIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ('reviewer', 'service_provider')
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['reviewer', 'change_seq'], name='review_reviewer_changes_idx'),
+            models.Index(fields=['service_provider', 'change_seq'], name='review_provider_changes_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.reviewer.email} for {self.service_provider.first_name} - {self.rating}★"
@@ -5,6 +5,8 @@ from registration.models import User
 from rest_framework import serializers
 from .models import Review
 from registration.models import User  
+from registration.serializers import ProviderSerializer
+from utils.fieldsets import SparseFieldsetMixin, full_name
 
 class ReviewCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -39,11 +41,11 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ReviewListSerializer(serializers.ModelSerializer):
+class ReviewListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     reviewer_name = serializers.CharField(source='reviewer.get_full_name', read_only=True)
     provider_name = serializers.CharField(source='service_provider.get_full_name', read_only=True)
     provider_email = serializers.EmailField(source='service_provider.email', read_only=True)
-    service_category = serializers.CharField(source='service_provider.category.category', read_only=True)
+    service_category = serializers.CharField(source='service_provider.category_name', read_only=True)
 
     class Meta:
         model = Review
@@ -51,3 +53,12 @@ class ReviewListSerializer(serializers.ModelSerializer):
             'id', 'reviewer_name', 'provider_name', 'provider_email',
             'service_category', 'rating', 'comment', 'created_at'
         ]
+        field_paths = {
+            'reviewer_name': ['reviewer__first_name', 'reviewer__last_name'],
+            'provider_name': ['service_provider__first_name', 'service_provider__last_name'],
+        }
+        row_fields = {
+            'reviewer_name': full_name('reviewer', strip=True),
+            'provider_name': full_name('service_provider', strip=True),
+        }
+        expandable_fields = {'service_provider': (ProviderSerializer, 'service_provider')}
@@ -1,3 +1,14 @@
 from django.test import TestCase
 
-# Create your tests here.
+from utils.fixtures import RowMapperMixin
+from .models import Review
+from .serializers import ReviewListSerializer
+
+
+class ReviewRowMapperTests(RowMapperMixin, TestCase):
+    def test_rows_match_the_serializer(self):
+        rows = self.assertMatchesSerializer(ReviewListSerializer, Review.objects.order_by('pk'))
+        self.assertEqual([row['service_category'] for row in rows], ['Plumber', ''])
+        self.assertEqual(rows[0]['reviewer_name'], 'Asha')
+        # The provider's denormalized category name, without joining the services
+        self.assertNotIn('service_service', str(ReviewListSerializer.values_queryset(Review.objects.all()).query))
@@ -1,3 +1,4 @@
+from adrf.views import APIView as AsyncAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -15,15 +16,16 @@ class CreateReviewView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ListReviewView(APIView):
+class ListReviewView(AsyncAPIView):
     permission_classes = []  
 
-    def get(self, request):
+    async def get(self, request):
         category_id = request.query_params.get('category')  # ID of Service
         provider_id = request.query_params.get('provider_id')
         reviewer_id = request.query_params.get('reviewer_id')
 
-        reviews = Review.objects.select_related('service_provider', 'reviewer')
+        fields, expand = ReviewListSerializer.fieldset(request)
+        reviews = ReviewListSerializer.values_queryset(Review.objects.all(), fields, expand)
 
         if category_id:
             reviews = reviews.filter(service_provider__category=category_id)
@@ -32,8 +34,8 @@ class ListReviewView(APIView):
         if reviewer_id:
             reviews = reviews.filter(reviewer_id=reviewer_id)
 
-        serializer = ReviewListSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        to_row = ReviewListSerializer.row_mapper(fields, expand)
+        return Response([to_row(review) async for review in reviews], status=status.HTTP_200_OK)
 
 
 
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Service
 import re
+from utils.fieldsets import SparseFieldsetMixin
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'category', 'description', 'price']
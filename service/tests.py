@@ -1,3 +1,159 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from utils import tracing
+from utils.metrics import InstrumentedEmailBackend
+
+from .models import Service
+
+
+class FakeSMTPBackend(InstrumentedEmailBackend):
+    def open(self):
+        self.connection = object()
+        return False
+
+    def _send(self, message):
+        return True
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsEndpointTests(TestCase):
+    def sample(self, body, name, **labels):
+        prefix = name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+        for line in body.splitlines():
+            if line.startswith(prefix + ' '):
+                return float(line.split()[-1])
+        return 0.0
+
+    def metrics(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_request_latency_and_query_counts_are_exported(self):
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        before = self.metrics()
+        self.client.get('/services/')
+        after = self.metrics()
+
+        latency = 'fixly_http_request_duration_seconds_count'
+        labels = {'method': 'GET', 'route': '/services/', 'status': '200'}
+        self.assertEqual(self.sample(after, latency, **labels) - self.sample(before, latency, **labels), 1)
+        queries = 'fixly_db_queries_per_request_sum'
+        self.assertEqual(self.sample(after, queries, route='/services/') - self.sample(before, queries, route='/services/'), 1)
+
+    def test_cache_hits_and_misses_are_counted(self):
+        before = self.metrics()
+        cache.set('metrics-test', 1)
+        cache.get('metrics-test')
+        cache.get('metrics-test-missing')
+        after = self.metrics()
+        for result in ('hit', 'miss'):
+            name, labels = 'fixly_cache_requests_total', {'backend': 'locmem', 'result': result}
+            self.assertEqual(self.sample(after, name, **labels) - self.sample(before, name, **labels), 1)
+
+    def test_email_send_duration_is_recorded(self):
+        before = self.metrics()
+        mail.send_mail('Hi', 'Body', 'from@example.com', ['to@example.com'], connection=FakeSMTPBackend())
+        after = self.metrics()
+        name = 'fixly_email_send_duration_seconds_count'
+        self.assertEqual(self.sample(after, name, outcome='sent') - self.sample(before, name, outcome='sent'), 1)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secrets').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_a_token_unless_debugging(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class TracingTests(TestCase):
+    traceparent = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'spans.jsonl')
+        override = override_settings(TRACING_FILE=self.path, TRACING_SAMPLE_RATE=0.001)
+        override.enable()
+        self.addCleanup(override.disable)
+        Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+
+    def spans(self):
+        with open(self.path) as handle:
+            return [json.loads(line) for line in handle]
+
+    @override_settings(TRACING_TRUST_TRACEPARENT=True)
+    def test_request_joins_the_callers_trace(self):
+        response = self.client.get('/services/', HTTP_TRACEPARENT=self.traceparent)
+        self.assertEqual(response['X-Trace-ID'], '4bf92f3577b34da6a3ce929d0e0e4736')
+
+        root, *children = self.spans()
+        self.assertEqual(root['name'], 'GET /services/')
+        self.assertEqual(root['parent_span_id'], '00f067aa0ba902b7')
+        self.assertEqual(root['attributes']['view'], 'service.views.ServiceListCreateView')
+        self.assertEqual(root['attributes']['http.status_code'], 200)
+        query = next(span for span in children if span['name'] == 'db.select')
+        self.assertEqual((query['trace_id'], query['parent_span_id']), (root['trace_id'], root['span_id']))
+        self.assertIn('FROM "service_service"', query['attributes']['db.statement'])
+
+    @override_settings(TRACING_TRUST_TRACEPARENT=True)
+    def test_trusted_callers_sampling_decision_is_followed(self):
+        response = self.client.get('/services/', HTTP_TRACEPARENT=self.traceparent[:-2] + '00')
+        self.assertNotIn('X-Trace-ID', response)
+        self.assertFalse(os.path.exists(self.path))
+        with override_settings(TRACING_SAMPLE_RATE=1):
+            response = self.client.get('/services/', HTTP_TRACEPARENT='00-not-a-trace-01')
+        self.assertNotEqual(response['X-Trace-ID'], '4bf92f3577b34da6a3ce929d0e0e4736')
+        self.assertIsNone(self.spans()[0]['parent_span_id'])
+
+    @override_settings(TRACING_SAMPLE_RATE=0, TRACING_TRUST_TRACEPARENT=True)
+    def test_zero_rate_ignores_sampled_callers(self):
+        response = self.client.get('/services/', HTTP_TRACEPARENT=self.traceparent)
+        self.assertNotIn('X-Trace-ID', response)
+
+    def test_untrusted_callers_cannot_force_sampling(self):
+        with mock.patch('utils.tracing.random.random', return_value=0.5):
+            response = self.client.get('/services/', HTTP_TRACEPARENT=self.traceparent)
+            self.assertNotIn('X-Trace-ID', response)
+            with override_settings(TRACING_SAMPLE_RATE=1):
+                response = self.client.get('/services/', HTTP_TRACEPARENT=self.traceparent[:-2] + '00')
+        # Sampled locally, the request still joins the caller's trace
+        self.assertEqual(response['X-Trace-ID'], '4bf92f3577b34da6a3ce929d0e0e4736')
+
+    @override_settings(TRACING_SAMPLE_RATE=1, TRACING_FILE_MAX_BYTES=1, TRACING_FILE_BACKUPS=2)
+    def test_export_file_is_rotated(self):
+        for _ in range(4):
+            self.client.get('/services/')
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(self.path))), ['spans.jsonl', 'spans.jsonl.1', 'spans.jsonl.2'],
+        )
+        self.assertEqual(self.spans()[0]['name'], 'GET /services/')
+
+    def test_cache_template_and_email_spans(self):
+        root = tracing.Span('test', tracing.new_id(128))
+        token = tracing.CURRENT_SPAN.set(root)
+        try:
+            cache.set('tracing-test', 1)
+            cache.get('tracing-test')
+            render_to_string('registration/email/otp_email.html', {'otp': '123456'})
+            mail.send_mail('Hi', 'Body', 'from@example.com', ['to@example.com'], connection=FakeSMTPBackend())
+        finally:
+            tracing.CURRENT_SPAN.reset(token)
+
+        self.assertEqual(
+            [span.name for span in root.children], ['cache.set', 'cache.get', 'template.render', 'smtp.send'],
+        )
+        self.assertEqual(root.children[2].attributes['template.name'], 'registration/email/otp_email.html')
+        self.assertTrue(all(span.duration_ms is not None for span in root.walk() if span is not root))
@@ -1,5 +1,6 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework.response import Response
 from .models import Service
 from .serializers import ServiceSerializer
 
@@ -12,6 +13,12 @@ class ServiceListCreateView(generics.ListCreateAPIView):
             return [AllowAny()]
         return [IsAdminUser()]
 
+    def list(self, request, *args, **kwargs):
+        fields, expand = ServiceSerializer.fieldset(request)
+        services = ServiceSerializer.prune_queryset(self.filter_queryset(self.get_queryset()), fields, expand)
+        serializer = self.get_serializer(services, many=True, fields=fields, expand=expand)
+        return Response(serializer.data)
+
 class ServiceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
@@ -0,0 +1,25 @@
+(function($) {
+    'use strict';
+    $(document).ready(function() {
+        $('.booking-autocomplete').not('[name*=__prefix__]').each(function(i, element) {
+            $(element).select2({
+                ajax: {
+                    data: function(params) {
+                        return {
+                            term: params.term,
+                            page: params.page,
+                            date: $('#id_date').val(),
+                            time_slot: $('#id_time_slot').val(),
+                            booking_id: element.dataset.bookingId
+                        };
+                    }
+                }
+            });
+        });
+
+        // A provider picked for another slot may no longer be free
+        $('#id_date, #id_time_slot').change(function() {
+            $('#id_service_provider').val(null).trigger('change');
+        });
+    });
+})(django.jQuery);
@@ -0,0 +1,148 @@
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.db import connection, connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Parent request headers a sub-request doesn't inherit
+BODY_HEADERS = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING')
+
+
+def resolve_api_view(path):
+    """
+    The resolver match for `path` if it is an API view a batch may call,
+    None otherwise: admin pages, the event stream and views setting
+    `batchable = False` are left out (see BatchView for which and why).
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not issubclass(view_class, APIView) or not getattr(view_class, 'batchable', True):
+        return None
+    return match
+
+
+def build_subrequest(request, method, path, body, match):
+    """
+    An HttpRequest for one entry of a batch, carrying the parent's headers
+    and the user the batch authenticated, so the view doesn't decode the
+    JWT and load the user again.
+    """
+    url = urlsplit(path)
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.resolver_match = match
+    sub.META = {key: value for key, value in request.META.items() if key not in BODY_HEADERS}
+    sub.META.update(REQUEST_METHOD=method, PATH_INFO=url.path, QUERY_STRING=url.query)
+    sub.GET = QueryDict(url.query)
+    sub.COOKIES = request.COOKIES
+    payload = b'' if body is None else json.dumps(body).encode()
+    if payload:
+        sub.META.update(CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(payload)))
+    sub._stream = BytesIO(payload)
+    sub._read_started = False
+    if request.user.is_authenticated:
+        sub.user = request.user
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+    return sub
+
+
+def response_body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    content = response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content) if content else None
+    return content.decode(response.charset, errors='replace')
+
+
+def run_subrequest(sub):
+    view = sub.resolver_match.func
+    try:
+        if iscoroutinefunction(view):
+            response = async_to_sync(view)(sub, *sub.resolver_match.args, **sub.resolver_match.kwargs)
+        else:
+            response = view(sub, *sub.resolver_match.args, **sub.resolver_match.kwargs)
+    except Exception as exc:
+        response = response_for_exception(sub, exc)
+    return {'status': response.status_code, 'body': response_body(response)}
+
+
+def query_wrappers():
+    """
+    The execute wrappers on this thread's connections, by alias. The
+    middleware's query hooks travel in the context (utils.observers); these
+    are the ones installed on the connections directly, as tests and
+    benchmarks do.
+    """
+    return {connection.alias: list(connection.execute_wrappers) for connection in connections.all()}
+
+
+def run_in_thread(sub, wrappers=None):
+    try:
+        with ExitStack() as stack:
+            for alias, functions in (wrappers or {}).items():
+                connection = connections[alias]
+                for function in functions:
+                    if function not in connection.execute_wrappers:
+                        stack.enter_context(connection.execute_wrapper(function))
+            return run_subrequest(sub)
+    finally:
+        # The thread goes away with the batch; so does its connection
+        connections.close_all()
+
+
+def run_batch(subrequests):
+    """
+    Runs the sub-requests in order and returns their results. Consecutive
+    read-only ones run side by side on up to BATCH_MAX_WORKERS threads, each
+    with its own database connection. A write waits for the reads before it
+    and the reads after it wait for the write.
+
+    Inside a transaction (ATOMIC_REQUESTS, tests) everything runs on this
+    thread: other connections couldn't see what the transaction wrote.
+    """
+    parallel = settings.BATCH_MAX_WORKERS > 1 and not connection.in_atomic_block
+    results = []
+    group = []
+
+    def flush():
+        if len(group) > 1 and parallel:
+            with ThreadPoolExecutor(min(settings.BATCH_MAX_WORKERS, len(group)) - 1) as executor:
+                # Each thread runs in a copy of this request's context and with its query
+                # wrappers, so tracing, metrics, the slow query log and profiling see the
+                # sub-requests it runs as they would serial ones
+                wrappers = query_wrappers()
+                futures = [
+                    executor.submit(contextvars.copy_context().run, run_in_thread, sub, wrappers)
+                    for sub in group[1:]
+                ]
+                results.append(run_subrequest(group[0]))
+                results.extend(future.result() for future in futures)
+        else:
+            results.extend(run_subrequest(sub) for sub in group)
+        group.clear()
+
+    for sub in subrequests:
+        if sub.method in READ_ONLY_METHODS:
+            group.append(sub)
+            continue
+        flush()
+        results.append(run_subrequest(sub))
+    flush()
+    return results
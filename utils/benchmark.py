@@ -0,0 +1,361 @@
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, time as slot_time, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, RequestFactory
+from django.urls import Resolver404, URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+
+from utils.metrics import QueryCounter
+
+BENCH_DOMAIN = 'bench.fixly'
+BENCH_PASSWORD = 'Bench@1234'
+SLOTS = [slot_time(hour, 0) for hour in range(10, 18)]
+
+
+def seed_dataset(bookings, providers, customers, seed=42, stdout=None):
+    """
+    Inserts users, bookings and reviews with bulk_create, bypassing model save()
+    and its per-row validation. Providers get a Zipf-like share of the bookings,
+    so a handful of them carry most of the traffic. Every seeded account uses the
+    @bench.fixly domain and BENCH_PASSWORD.
+    """
+    from booking.models import Booking
+    from registration.models import User
+    from review.models import Review
+    from service.models import Service
+
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+    services = list(Service.objects.all()) or [
+        Service.objects.create(category=name, description=name, price=500)
+        for name in ('Plumber', 'Carpenter', 'Electrician', 'Cleaning')
+    ]
+
+    def make_users(prefix, count, user_type, category=False):
+        users = []
+        for i in range(count):
+            service = rng.choice(services) if category else None
+            users.append(User(
+                username=f'{prefix}{i}@{BENCH_DOMAIN}', email=f'{prefix}{i}@{BENCH_DOMAIN}',
+                user_id=f'B{prefix[:3].upper()}{i:09d}', password=password, first_name=prefix.title(),
+                last_name=str(i), user_type=user_type, category=service,
+                category_name=service.category if service else '',
+            ))
+        return users
+
+    provider_rows = User.objects.bulk_create(make_users('provider', providers, 'SERVICE_PROVIDER', True), 5000)
+    customer_rows = User.objects.bulk_create(make_users('customer', customers, 'USER'), 5000)
+    if stdout:
+        stdout.write(f'Seeded {len(provider_rows)} providers and {len(customer_rows)} customers.')
+
+    weights = [1 / (rank + 1) for rank in range(providers)]
+    picks = rng.choices(range(providers), weights, k=bookings)
+    next_slot = [0] * providers
+    start = date.today() - timedelta(days=365)
+    batch = []
+    for i, index in enumerate(picks):
+        position = next_slot[index]
+        next_slot[index] += 1
+        batch.append(Booking(
+            user=rng.choice(customer_rows), service_provider=provider_rows[index],
+            date=start + timedelta(days=position // len(SLOTS)), time_slot=SLOTS[position % len(SLOTS)],
+            status=rng.choice(('PENDING', 'COMPLETE')), booking_id=f'{i:08X}'[-8:],
+        ))
+        if len(batch) == 10000:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    Booking.objects.bulk_create(batch)
+
+    reviews = {
+        (rng.randrange(customers), rng.randrange(providers)) for _ in range(bookings // 10)
+    }
+    Review.objects.bulk_create(
+        [
+            Review(reviewer=customer_rows[c], service_provider=provider_rows[p], rating=rng.randint(1, 5))
+            for c, p in reviews
+        ],
+        batch_size=10000,
+    )
+    if stdout:
+        stdout.write(f'Seeded {bookings} bookings and {len(reviews)} reviews.')
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+    return values[max(1, math.ceil(percent / 100 * len(values))) - 1]
+
+
+def summarize(values, scale=1):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        'mean': round(sum(values) / len(values) * scale, 3),
+        'p50': round(percentile(values, 50) * scale, 3),
+        'p95': round(percentile(values, 95) * scale, 3),
+        'p99': round(percentile(values, 99) * scale, 3),
+        'max': round(values[-1] * scale, 3),
+    }
+
+
+class RouteSamples:
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = defaultdict(int)
+
+    def merge(self, other):
+        self.latencies += other.latencies
+        self.queries += other.queries
+        for code, count in other.statuses.items():
+            self.statuses[code] += count
+
+    def as_dict(self, elapsed):
+        return {
+            'requests': len(self.latencies),
+            'throughput_rps': round(len(self.latencies) / elapsed, 2) if elapsed else None,
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items())},
+            'latency_ms': summarize(self.latencies, 1000),
+            'queries': summarize(self.queries),
+        }
+
+
+class BenchmarkClient:
+    """
+    Test client that records latency, status and SQL query count for every
+    request, grouped by the URL pattern the request resolved to.
+    """
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+        self.samples = defaultdict(RouteSamples)
+        self.recording = True
+        self.token = None
+
+    def request(self, method, path, data=None, **extra):
+        if self.token:
+            extra.setdefault('HTTP_AUTHORIZATION', f'Bearer {self.token}')
+        if method != 'GET':
+            extra.setdefault('content_type', 'application/json')
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            start = time.perf_counter()
+            response = getattr(self.client, method.lower())(path, data, **extra)
+            elapsed = time.perf_counter() - start
+        if self.recording:
+            samples = self.samples[f'{method} {route_of(response)}']
+            samples.latencies.append(elapsed)
+            samples.queries.append(counter.count)
+            samples.statuses[response.status_code] += 1
+        return response
+
+
+def route_of(response):
+    try:
+        return '/' + response.resolver_match.route
+    except Resolver404:
+        return '<unmatched>'
+
+
+def run_scenario(actions, iterations, context, seed=0, warmup=0, concurrency=1):
+    """
+    Runs `iterations` weighted actions (each may issue several requests) split
+    across `concurrency` threads, after `warmup` unrecorded ones. Returns the
+    wall-clock time and the merged per-route samples.
+    """
+    weights = [weight for weight, _ in actions]
+    funcs = [func for _, func in actions]
+
+    def worker(index, count, recording=True):
+        rng = random.Random(seed * 1000 + index)
+        client = BenchmarkClient()
+        client.recording = recording
+        try:
+            for func in rng.choices(funcs, weights, k=count):
+                client.token = None
+                func(client, context, rng)
+        finally:
+            if concurrency > 1:
+                connections.close_all()
+        return client.samples
+
+    if warmup:
+        worker(-1, warmup, recording=False)
+    shares = [iterations // concurrency + (i < iterations % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [worker(0, iterations)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(worker, range(concurrency), shares))
+    elapsed = time.perf_counter() - start
+
+    merged = defaultdict(RouteSamples)
+    for samples in results:
+        for route, route_samples in samples.items():
+            merged[route].merge(route_samples)
+    return elapsed, merged
+
+
+@contextmanager
+def database_latency(query=0.0, connect=0.0):
+    """
+    Adds blocking latency to connections opened inside the block, from any
+    thread, like a database across a slow network: `query` seconds to every
+    query and `connect` seconds to opening the connection (TLS and auth).
+    """
+    def delay(execute, sql, params, many, context):
+        time.sleep(query)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        time.sleep(connect)
+        if query:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+@contextmanager
+def database_options(alias='default', **options):
+    """
+    Overrides connection settings such as CONN_MAX_AGE inside the block. The
+    settings dict is shared by every thread's connection; the new values
+    apply from each one's next connect or request.
+    """
+    settings_dict = connections.settings[alias]
+    saved = {key: settings_dict[key] for key in options}
+    settings_dict.update(options)
+    try:
+        yield
+    finally:
+        settings_dict.update(saved)
+
+
+class LatencyEmailBackend(BaseEmailBackend):
+    """
+    Stands in for a slow SMTP server: every batch takes
+    BENCHMARK_EMAIL_LATENCY seconds, blocking in send_messages() and yielding
+    to the event loop in asend_messages().
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = getattr(settings, 'BENCHMARK_EMAIL_LATENCY', 0.2)
+
+    def send_messages(self, email_messages):
+        time.sleep(self.latency)
+        return len(email_messages)
+
+    async def asend_messages(self, email_messages):
+        await asyncio.sleep(self.latency)
+        return len(email_messages)
+
+
+def wsgi_request(application, method, path, data=None, headers=None):
+    """
+    Calls a WSGI application directly, as a gunicorn sync worker would, and
+    returns the response status. Unlike the test client this goes through
+    WSGIHandler, so database connections are closed after every request.
+    """
+    factory = RequestFactory(headers=headers)
+    if method == 'GET':
+        request = factory.get(path, data)
+    else:
+        request = factory.generic(method, path, json.dumps(data or {}), content_type='application/json')
+    statuses = []
+    response = application(request.environ, lambda status, response_headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_request(application, method, path, data=None, headers=None):
+    """
+    Sends one HTTP request to an ASGI application, as uvicorn would, and
+    returns the response status.
+    """
+    query, body = b'', b''
+    raw_headers = [(b'host', b'testserver')]
+    if method == 'GET':
+        query = urlencode(data or {}).encode()
+    else:
+        body = json.dumps(data or {}).encode()
+        raw_headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query,
+        'root_path': '', 'headers': raw_headers, 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    started = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects early
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            started.update(message)
+
+    await application(scope, receive, send)
+    return started['status']
+
+
+def project_routes(skip=('admin/',)):
+    """
+    Lists the path() routes of the root URLconf, skipping included URLconfs
+    whose prefix is in `skip` (the admin site alone has hundreds of patterns).
+    """
+    routes = []
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if not isinstance(pattern.pattern, RoutePattern):
+                continue
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                if route not in skip:
+                    walk(pattern.url_patterns, route)
+            elif '/' + route not in routes:
+                routes.append('/' + route)
+
+    walk(get_resolver().url_patterns, '')
+    return routes
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
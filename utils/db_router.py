@@ -0,0 +1,173 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Seconds a replica's health check result is reused for
+HEALTH_CHECK_INTERVAL = 5
+
+# Replication lag in seconds; 0 when the replica has replayed everything it
+# received (an idle primary would otherwise look like growing lag), and on a
+# server that isn't a replica at all
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+ROUTING = ContextVar('fixly_db_routing', default=None)
+
+# alias -> (checked at, usable)
+_health = {}
+
+
+class RequestRouting:
+    """
+    Routing state of one request: whether its reads may go to a replica, the
+    replica picked for it, and whether it has written anything yet.
+    """
+    def __init__(self, client_key=None, read_only=False):
+        self.client_key = client_key
+        self.read_only = read_only
+        self.wrote = False
+        self.replica = None
+
+    def read_alias(self):
+        # Inside a transaction on the primary, reads have to see its writes
+        if self.wrote or not self.read_only or connections['default'].in_atomic_block:
+            return 'default'
+        if self.replica is None:
+            pinned = self.client_key and cache.get(pin_key(self.client_key))
+            self.replica = 'default' if pinned else pick_replica()
+        return self.replica
+
+
+@contextmanager
+def routing(state):
+    token = ROUTING.set(state)
+    try:
+        yield state
+    finally:
+        ROUTING.reset(token)
+
+
+def pin_key(client_key):
+    return f'db_pinned_{client_key}'
+
+
+def client_key(request):
+    """
+    Identifies the caller without touching the database: the user id claim of
+    a valid bearer token, or else the session cookie.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            return f'user:{AccessToken(header[7:])[api_settings.USER_ID_CLAIM]}'
+        except (TokenError, KeyError):
+            return None
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f'session:{session}' if session else None
+
+
+def replica_lag(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_is_usable(alias):
+    """
+    Whether `alias` answers and is within DATABASE_REPLICA_MAX_LAG seconds of
+    the primary, checked at most every HEALTH_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and now - checked[0] < HEALTH_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        usable = replica_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG
+    except DatabaseError:
+        usable = False
+    _health[alias] = (now, usable)
+    return usable
+
+
+def pick_replica():
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_is_usable(alias)]
+    return random.choice(replicas) if replicas else 'default'
+
+
+class ReplicaRouter:
+    """
+    Sends reads made while serving GET/HEAD/OPTIONS requests to a healthy
+    replica from DATABASE_REPLICAS. Everything else uses the primary: writes,
+    reads in other requests, after a write in the same request or inside a
+    transaction, reads by a client that wrote within the last
+    DATABASE_REPLICA_STICKY_SECONDS, and anything outside a request
+    (management commands, background jobs).
+    """
+    def db_for_read(self, model, **hints):
+        state = ROUTING.get()
+        if state is None or not settings.DATABASE_REPLICAS:
+            return None
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = ROUTING.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sets up ReplicaRouter's state for each request, and pins a client that
+    wrote to the primary for DATABASE_REPLICA_STICKY_SECONDS so it reads its
+    own writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        with routing(RequestRouting(client_key(request), request.method in READ_ONLY_METHODS)) as state:
+            response = self.get_response(request)
+        if state.wrote and state.client_key:
+            cache.set(pin_key(state.client_key), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        with routing(RequestRouting(client_key(request), request.method in READ_ONLY_METHODS)) as state:
+            response = await self.get_response(request)
+        if state.wrote and state.client_key:
+            await cache.aset(pin_key(state.client_key), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
@@ -1,4 +1,5 @@
-from django.core.mail import send_mail
+from asgiref.sync import sync_to_async
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
@@ -43,4 +44,19 @@ def send_booking_confirmation_email(user, booking, action):
                 fail_silently=True,
             )
         except Exception:
-            pass 
\ No newline at end of file
+            pass 
+
+
+async def asend_mail(subject, message, from_email, recipient_list, fail_silently=False, html_message=None):
+    """
+    Async counterpart of django.core.mail.send_mail(). Backends with an
+    asend_messages() method (the SMTP one in utils.metrics) send without
+    blocking; any other backend runs in a worker thread.
+    """
+    connection = get_connection(fail_silently=fail_silently)
+    mail = EmailMultiAlternatives(subject, message, from_email, recipient_list, connection=connection)
+    if html_message:
+        mail.attach_alternative(html_message, 'text/html')
+    if hasattr(connection, 'asend_messages'):
+        return await connection.asend_messages([mail])
+    return await sync_to_async(connection.send_messages, thread_sensitive=False)([mail])
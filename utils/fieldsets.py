@@ -0,0 +1,258 @@
+from functools import lru_cache
+from operator import itemgetter, methodcaller
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields as drf_fields, relations
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() returns database values unchanged
+PASSTHROUGH = (
+    drf_fields.CharField.to_representation,
+    drf_fields.IntegerField.to_representation,
+    drf_fields.BooleanField.to_representation,
+    drf_fields.ChoiceField.to_representation,
+)
+
+# Date and time fields with the setting for their format; in ISO 8601 their
+# to_representation() is value.isoformat()
+ISO_FIELDS = {drf_fields.DateField: 'DATE_FORMAT', drf_fields.TimeField: 'TIME_FORMAT'}
+
+# Marks a field the serializer would leave out, as DRF does for a read-only
+# dotted source through an empty relation
+SKIP = object()
+
+
+def parse_expand(value):
+    """
+    'service_provider.category,reviewer' -> {'service_provider': {'category': {}}, 'reviewer': {}}
+    """
+    tree = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        node = tree
+        for name in item.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def full_name(relation, strip=False):
+    """
+    Meta.row_fields entry for '<first_name> <last_name>' of `relation`;
+    `strip` matches User.get_full_name().
+    """
+    def compile(column):
+        first, last = column(f'{relation}__first_name'), column(f'{relation}__last_name')
+        if strip:
+            return lambda row: f'{row[first]} {row[last]}'.strip()
+        return lambda row: f'{row[first]} {row[last]}'
+    return compile
+
+
+def expand_key(expand):
+    return tuple((name, expand_key(nested)) for name, nested in expand.items())
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ?fields= and ?expand= on list endpoints.
+
+    `fields` limits the output to the named fields. `expand` adds the
+    relations listed in Meta.expandable_fields (name: (serializer class,
+    source)) as nested objects, replacing a field of the same name; dotted
+    names expand inside those (expand=service_provider.category).
+
+    prune_queryset() narrows a queryset to what that output reads: only()
+    the columns and select_related() the relations it needs. The ORM path
+    of a field comes from its source; fields computed in Python (method
+    fields, model methods) list the paths they read in Meta.field_paths.
+
+    For long lists, values_queryset() and row_mapper() skip model instances
+    and serializer fields altogether: the rows come from .values() and a
+    mapper compiled once per field selection turns each into the dict
+    serializing would have produced. Fields computed in Python give a
+    compiler for it in Meta.row_fields (see full_name()).
+    """
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = expand or {}
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+        for name, nested in expand.items():
+            serializer_class, source = self.Meta.expandable_fields[name]
+            # DRF refuses a source that repeats the field name
+            extra = {'source': source} if source != name else {}
+            self.fields[name] = serializer_class(read_only=True, expand=nested, **extra)
+
+    @classmethod
+    def fieldset(cls, request):
+        """
+        The validated `fields` (None for all of them) and `expand` of a request.
+        """
+        expand = parse_expand(request.query_params.get('expand', ''))
+        cls.check_expand(expand)
+        fields = request.query_params.get('fields')
+        if fields is not None:
+            fields = [name.strip() for name in fields.split(',') if name.strip()]
+            unknown = set(fields) - set(cls.Meta.fields) - set(expand)
+            if unknown:
+                raise ValidationError({'fields': [f"Unknown field: {name}." for name in sorted(unknown)]})
+        return fields, expand
+
+    @classmethod
+    def check_expand(cls, expand, prefix=''):
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        for name, nested in expand.items():
+            if name not in expandable:
+                raise ValidationError({'expand': [f"{prefix}{name} cannot be expanded."]})
+            expandable[name][0].check_expand(nested, f'{prefix}{name}.')
+
+    @classmethod
+    def field_paths(cls, name):
+        paths = getattr(cls.Meta, 'field_paths', {})
+        if name in paths:
+            return paths[name]
+        field = cls._declared_fields.get(name)
+        source = getattr(field, 'source', None) or name
+        if source == '*' or '(' in source:
+            raise ImproperlyConfigured(f"{cls.__name__}.Meta.field_paths has no entry for '{name}'.")
+        return [source.replace('.', '__')]
+
+    @classmethod
+    def query_paths(cls, fields=None, expand=None):
+        """
+        The ORM paths the serialized output reads.
+        """
+        expand = expand or {}
+        names = [name for name in (fields if fields is not None else cls.Meta.fields) if name not in expand]
+        paths = [path for name in names for path in cls.field_paths(name)]
+        for name, nested in expand.items():
+            serializer_class, source = cls.Meta.expandable_fields[name]
+            paths.append(source)
+            paths += [f'{source}__{path}' for path in serializer_class.query_paths(None, nested)]
+        return paths
+
+    @classmethod
+    def prune_queryset(cls, queryset, fields=None, expand=None):
+        paths = cls.query_paths(fields, expand)
+        relations = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+        # Loading a relation needs its foreign key column on the row that points to it
+        columns = set(paths)
+        for relation in relations:
+            parts = relation.split('__')
+            columns.update('__'.join(parts[:index]) for index in range(1, len(parts) + 1))
+        queryset = queryset.select_related(None)
+        if relations:
+            # select_related() without arguments would follow every foreign key
+            queryset = queryset.select_related(*sorted(relations))
+        return queryset.only(*sorted(columns))
+
+    @classmethod
+    def value_columns(cls, fields=None, expand=None):
+        """
+        The .values() columns row_mapper() reads: query_paths() plus the
+        foreign keys a dotted path goes through, to tell an empty relation.
+        """
+        columns = set()
+        for path in cls.query_paths(fields, expand):
+            parts = path.split('__')
+            columns.update('__'.join(parts[:index]) for index in range(1, len(parts) + 1))
+        return sorted(columns)
+
+    @classmethod
+    def values_queryset(cls, queryset, fields=None, expand=None):
+        return queryset.values(*cls.value_columns(fields, expand))
+
+    @classmethod
+    def row_mapper(cls, fields=None, expand=None):
+        """
+        A function turning a values_queryset() row into this serializer's
+        representation of it, for the same `fields` and `expand`.
+        """
+        return compile_mapper(cls, None if fields is None else tuple(fields), expand_key(expand or {}))
+
+    @classmethod
+    def row_readers(cls, fields, expand, prefix=''):
+        """
+        (name, reader) for each output field, in the serializer's order; a
+        reader takes the row and returns the value or SKIP.
+        """
+        def column(path):
+            return f'{prefix}{path}'
+
+        serializer_fields = cls(fields=fields, expand={name: {} for name in expand}).fields
+        row_fields = getattr(cls.Meta, 'row_fields', {})
+        readers = []
+        for name, field in serializer_fields.items():
+            if name in expand:
+                serializer_class, source = cls.Meta.expandable_fields[name]
+                nested = serializer_class.row_readers(None, expand[name], f'{prefix}{source}__')
+                readers.append((name, nested_reader(column(source), nested)))
+            elif name in row_fields:
+                readers.append((name, row_fields[name](column)))
+            else:
+                readers.append((name, cls.field_reader(name, field, column)))
+        return readers
+
+    @classmethod
+    def field_reader(cls, name, field, column):
+        if isinstance(field, relations.ManyRelatedField) or (
+            isinstance(field, relations.RelatedField)
+            and not (isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None)
+        ):
+            raise ImproperlyConfigured(f"{cls.__name__}.{name} can't be read from .values() rows.")
+        paths = cls.field_paths(name)
+        if len(paths) != 1:
+            raise ImproperlyConfigured(f"{cls.__name__}.Meta.row_fields has no entry for '{name}'.")
+        path = paths[0]
+        key = column(path)
+        if isinstance(field, relations.RelatedField) or type(field).to_representation in PASSTHROUGH:
+            read = itemgetter(key)
+        else:
+            convert = field.to_representation
+            if type(field) in ISO_FIELDS:
+                output_format = getattr(field, 'format', getattr(api_settings, ISO_FIELDS[type(field)]))
+                if output_format and output_format.lower() == drf_fields.ISO_8601:
+                    convert = methodcaller('isoformat')
+
+            def read(row):
+                value = row[key]
+                return None if value is None else convert(value)
+        parts = path.split('__')
+        through = [column('__'.join(parts[:index])) for index in range(1, len(parts))]
+        if not through:
+            return read
+        empty = None if field.allow_null else SKIP
+
+        def read_through(row):
+            for relation in through:
+                if row[relation] is None:
+                    return empty
+            return read(row)
+        return read_through
+
+
+def nested_reader(key, readers):
+    to_row = row_reader(readers)
+
+    def read(row):
+        return None if row[key] is None else to_row(row)
+    return read
+
+
+def row_reader(readers):
+    def to_row(row):
+        item = {}
+        for name, read in readers:
+            value = read(row)
+            if value is not SKIP:
+                item[name] = value
+        return item
+    return to_row
+
+
+@lru_cache(maxsize=256)
+def compile_mapper(serializer_class, fields, expand):
+    def unfreeze(key):
+        return {name: unfreeze(nested) for name, nested in key}
+    return row_reader(serializer_class.row_readers(fields, unfreeze(expand)))
@@ -0,0 +1,66 @@
+import json
+from datetime import date, time
+
+from booking.models import Booking
+from registration.models import User
+from review.models import Review
+from service.models import Service
+
+
+class ProviderCustomerMixin:
+    """
+    TestCase mixin with what most tests start from: a Plumber service, a
+    provider offering it and a customer, as self.service, self.provider and
+    self.customer.
+    """
+    def setUp(self):
+        super().setUp()
+        self.service = Service.objects.create(category='Plumber', description='Pipes', price='100.00')
+        self.provider = User.objects.create_user(
+            username='provider@example.com', email='provider@example.com', password='Passw0rd!',
+            first_name='Ravi', last_name='Das', user_type='SERVICE_PROVIDER', category=self.service,
+        )
+        self.customer = User.objects.create_user(
+            username='customer@example.com', email='customer@example.com', password='Passw0rd!',
+            first_name='Asha', last_name='Khan', user_type='USER',
+        )
+
+
+class RowMapperMixin:
+    """
+    TestCase mixin for comparing a SparseFieldsetMixin serializer's row
+    mapper with the serializer itself, over rows with the edge cases the
+    mappers handle: an empty last name, a price that needs padding and a
+    provider without a category.
+    """
+    def setUp(self):
+        super().setUp()
+        service = Service.objects.create(category='Plumber', description='Pipes', price='99.5')
+        self.customer = User.objects.create_user(
+            username='customer@example.com', email='customer@example.com', password='Passw0rd!',
+            first_name='Asha', last_name='', user_type='USER',
+        )
+        providers = [
+            User.objects.create_user(
+                username=f'provider{index}@example.com', email=f'provider{index}@example.com', password='Passw0rd!',
+                first_name='Ravi', last_name=str(index), user_type='SERVICE_PROVIDER', category=service,
+                gender='Male', location='Pune',
+            )
+            for index in range(2)
+        ]
+        # A provider whose category was removed, as clear_category_name leaves it
+        User.objects.filter(pk=providers[1].pk).update(category=None, category_name='')
+        for index, provider in enumerate(providers):
+            Booking.objects.create(user=self.customer, service_provider=provider, date=date(2030, 1, 1),
+                                   time_slot=time(10 + index, 0))
+            Review.objects.create(reviewer=self.customer, service_provider=provider, rating=3 + index)
+
+    def assertMatchesSerializer(self, serializer_class, queryset, fields=None, expand=None):
+        expand = expand or {}
+        expected = serializer_class(
+            serializer_class.prune_queryset(queryset, fields, expand), many=True, fields=fields, expand=expand,
+        ).data
+        to_row = serializer_class.row_mapper(fields, expand)
+        rows = [to_row(row) for row in serializer_class.values_queryset(queryset, fields, expand)]
+        self.assertEqual(json.dumps(rows), json.dumps(expected))
+        return rows
@@ -0,0 +1,156 @@
+import gc
+import json
+import os
+import random
+import sysconfig
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import timezone
+
+from utils.metrics import get_route
+from utils.observers import ObserverMiddleware
+
+# tracemalloc is process-wide, so one request is traced at a time. Its sample
+# stays pending until the next request arrives: by then the request, its
+# response and whatever they referenced are gone, and what is still traced
+# is what the request left behind.
+_lock = threading.Lock()
+_state = {'tracing': False, 'pending': None}
+
+STDLIB = sysconfig.get_paths()['stdlib'] + os.sep
+
+
+def site_name(frame):
+    path = frame.filename
+    if path.startswith(str(settings.BASE_DIR) + os.sep):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    elif 'site-packages' in path:
+        path = path.split('site-packages' + os.sep, 1)[1]
+    elif path.startswith(STDLIB):
+        path = os.path.relpath(path, STDLIB)
+    return f'{path}:{frame.lineno}'
+
+
+def top_sites(snapshot, limit):
+    """
+    The lines holding the most memory in `snapshot`, as [site, bytes, blocks].
+    """
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        [site_name(stat.traceback[0]), stat.size, stat.count]
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+
+def save_sample(sample):
+    os.makedirs(settings.MEMORY_TRACKING_DIR, exist_ok=True)
+    path = os.path.join(settings.MEMORY_TRACKING_DIR, f"memory-{sample['pid']}.jsonl")
+    with open(path, 'a') as handle:
+        handle.write(json.dumps(sample) + '\n')
+
+
+def load_samples(directory):
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('memory-') and name.endswith('.jsonl'):
+            with open(os.path.join(directory, name)) as handle:
+                samples.extend(json.loads(line) for line in handle if line.strip())
+    return samples
+
+
+def stop_tracing():
+    tracemalloc.stop()
+    _state['tracing'] = False
+    _state['pending'] = None
+
+
+def finish_pending():
+    """
+    Completes the pending sample with the memory its request retained and
+    where that was allocated, and saves it. Called with _lock held.
+    """
+    sample = _state['pending']
+    if sample is None:
+        return
+    try:
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        stop_tracing()
+    sample['retained_bytes'] = retained
+    sample['top_sites'] = top_sites(snapshot, settings.MEMORY_TRACKING_TOP_SITES)
+    save_sample(sample)
+
+
+def flush_pending():
+    """
+    Saves the sample of the last traced request without waiting for the next
+    request, e.g. when a worker shuts down.
+    """
+    with _lock:
+        finish_pending()
+
+
+def begin_request():
+    """
+    Saves the previous sample if it's done and starts tracing this request if
+    it is sampled. Returns whether it is.
+    """
+    with _lock:
+        finish_pending()
+        if (
+            _state['tracing'] or tracemalloc.is_tracing()
+            or random.random() >= settings.MEMORY_TRACKING_SAMPLE_RATE
+        ):
+            return False
+        _state['tracing'] = True
+        gc.collect()
+        tracemalloc.start(settings.MEMORY_TRACKING_FRAMES)
+        return True
+
+
+def end_request(request, response):
+    with _lock:
+        held, peak = tracemalloc.get_traced_memory()
+        _state['pending'] = {
+            'created': timezone.now().isoformat(),
+            'pid': os.getpid(),
+            'method': request.method,
+            'route': get_route(request),
+            'status': response.status_code,
+            'peak_bytes': peak,
+            'held_bytes': held,
+            'response_bytes': 0 if response.streaming else len(response.content),
+        }
+
+
+class MemoryTrackingMiddleware(ObserverMiddleware):
+    """
+    Traces the allocations of a MEMORY_TRACKING_SAMPLE_RATE share of requests
+    with tracemalloc: the peak while the request ran, what was live when it
+    returned, and what it retained once it was gone, with the lines that
+    allocated it. Samples go to MEMORY_TRACKING_DIR/memory-<pid>.jsonl for
+    `manage.py memory_report`.
+
+    Tracing only runs for sampled requests, and a request arriving while
+    another is traced isn't sampled. Allocations made by requests served
+    concurrently, in other threads or on the event loop, are counted too.
+    """
+    def start(self, request):
+        return True if begin_request() else None
+
+    @contextmanager
+    def observe(self, traced):
+        try:
+            yield
+        except BaseException:
+            with _lock:
+                stop_tracing()
+            raise
+
+    def finish(self, request, response, traced):
+        end_request(request, response)
@@ -0,0 +1,192 @@
+import hmac
+import os
+import time
+
+import aiosmtplib
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.mail.message import sanitize_address
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis.cache import RedisCache
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+from utils.observers import ObserverMiddleware
+from utils.tracing import TracedCacheMixin, span
+
+REQUEST_LATENCY = Histogram(
+    'fixly_http_request_duration_seconds', 'Request latency by route',
+    ['method', 'route', 'status'],
+)
+REQUEST_EXCEPTIONS = Counter(
+    'fixly_http_exceptions_total', 'Unhandled view exceptions by route',
+    ['route', 'exception'],
+)
+DB_QUERIES = Histogram(
+    'fixly_db_queries_per_request', 'SQL queries issued per request',
+    ['route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250, 500),
+)
+DB_TIME = Histogram(
+    'fixly_db_time_per_request_seconds', 'Time spent in SQL per request',
+    ['route'],
+)
+CACHE_REQUESTS = Counter(
+    'fixly_cache_requests_total', 'Cache lookups by result',
+    ['backend', 'result'],
+)
+EMAIL_DURATION = Histogram(
+    'fixly_email_send_duration_seconds', 'Time spent sending email through SMTP',
+    ['outcome'], buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+
+def get_route(request):
+    """
+    Returns the URL pattern (not the concrete path) so label cardinality stays bounded.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return '/' + match.route if match.route else match.view_name or '<unnamed>'
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() hook that counts queries and the time spent in them.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware(ObserverMiddleware):
+    """
+    Records per-route latency, status, SQL query count and SQL time.
+    """
+    def start(self, request):
+        return QueryCounter()
+
+    def query_hook(self, counter):
+        return counter
+
+    def finish(self, request, response, counter):
+        route = get_route(request)
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - counter.start
+        )
+        DB_QUERIES.labels(route).observe(counter.count)
+        DB_TIME.labels(route).observe(counter.duration)
+
+    def process_exception(self, request, exception):
+        REQUEST_EXCEPTIONS.labels(get_route(request), type(exception).__name__).inc()
+
+
+class CacheMetricsMixin:
+    """
+    Counts hits and misses for get()/get_many() on a Django cache backend.
+    """
+    metrics_name = 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default=default, version=version)
+        CACHE_REQUESTS.labels(self.metrics_name, 'miss' if value is default else 'hit').inc()
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        CACHE_REQUESTS.labels(self.metrics_name, 'hit').inc(len(found))
+        CACHE_REQUESTS.labels(self.metrics_name, 'miss').inc(len(keys) - len(found))
+        return found
+
+
+class InstrumentedLocMemCache(TracedCacheMixin, CacheMetricsMixin, LocMemCache):
+    metrics_name = 'locmem'
+
+
+class InstrumentedRedisCache(TracedCacheMixin, CacheMetricsMixin, RedisCache):
+    metrics_name = 'redis'
+
+
+class InstrumentedEmailBackend(EmailBackend):
+    """
+    SMTP backend that records how long each batch of messages takes to send,
+    with a tracing span per batch.
+    """
+    def send_messages(self, email_messages):
+        start = time.perf_counter()
+        try:
+            with span('smtp.send', kind='client', **{'email.messages': len(email_messages)}):
+                sent = super().send_messages(email_messages)
+        except Exception:
+            EMAIL_DURATION.labels('error').observe(time.perf_counter() - start)
+            raise
+        EMAIL_DURATION.labels('sent' if sent else 'failed').observe(time.perf_counter() - start)
+        return sent
+
+    async def asend_messages(self, email_messages):
+        """
+        send_messages() over aiosmtplib, for async views: the event loop keeps
+        serving other requests while the SMTP server responds.
+        """
+        if not email_messages:
+            return 0
+        start = time.perf_counter()
+        client = aiosmtplib.SMTP(
+            hostname=self.host, port=self.port, username=self.username or None, password=self.password or None,
+            use_tls=self.use_ssl, start_tls=self.use_tls, timeout=self.timeout,
+            client_cert=self.ssl_certfile, client_key=self.ssl_keyfile,
+        )
+        sent = 0
+        try:
+            with span('smtp.send', kind='client', **{'email.messages': len(email_messages)}):
+                async with client:
+                    for message in email_messages:
+                        if not message.recipients():
+                            continue
+                        encoding = message.encoding or settings.DEFAULT_CHARSET
+                        await client.send_message(
+                            message.message(),
+                            sender=sanitize_address(message.from_email, encoding),
+                            recipients=[sanitize_address(address, encoding) for address in message.recipients()],
+                        )
+                        sent += 1
+        except Exception:
+            EMAIL_DURATION.labels('error').observe(time.perf_counter() - start)
+            if not self.fail_silently:
+                raise
+            return sent
+        EMAIL_DURATION.labels('sent' if sent else 'failed').observe(time.perf_counter() - start)
+        return sent
+
+
+def metrics_view(request):
+    """
+    Exposes the metrics in Prometheus text format to callers presenting
+    METRICS_TOKEN as a bearer token; without a token it is only open with
+    DEBUG on. Under gunicorn with PROMETHEUS_MULTIPROC_DIR set, samples from
+    every worker are merged.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,131 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware is sync-only, so under ASGI Django would run every
+    request below it through async_to_sync in a thread of its own. Finding a
+    static file never blocks, so the same lookup works as a coroutine.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON API responses to GET and HEAD requests with brotli or
+    gzip, whichever the client prefers, once the body reaches
+    COMPRESSION_MIN_SIZE bytes; below that the CPU isn't worth the bytes
+    saved. HTML (the admin, the browsable API) is left alone, as are
+    responses to other methods: they can carry CSRF or auth tokens next to
+    request data, which is what BREACH-style attacks need. Views setting
+    `compress_response` opt their POST responses in; see BatchView.
+    """
+    sync_capable = True
+    async_capable = True
+    content_types = ('application/json',)
+    brotli_quality = 5
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (
+            not self.compressible_method(request) or response.streaming or len(response.content) < self.min_size
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(self.content_types)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        # A strong ETag would claim the compressed bytes equal the original ones
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+    def compressible_method(self, request):
+        if request.method in ('GET', 'HEAD'):
+            return True
+        view_class = getattr(getattr(request.resolver_match, 'func', None), 'cls', None)
+        return getattr(view_class, 'compress_response', False)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks 'br' or 'gzip' from an Accept-Encoding header by quality value,
+    brotli winning ties, or None when neither is acceptable.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    wildcard = qualities.get('*', 0.0)
+    candidates = [('br', 1)] if brotli else []
+    candidates.append(('gzip', 0))
+    ranked = [
+        (qualities.get(coding, wildcard), preference, coding) for coding, preference in candidates
+    ]
+    quality, _, coding = max(ranked)
+    return coding if quality > 0 else None
@@ -0,0 +1,101 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Query hooks of the request being served. A ContextVar rather than wrappers
+# on the request's connections: async views run their queries in executor
+# threads, on connections the middleware can't reach, and batches copy the
+# context into their worker threads.
+ACTIVE_HOOKS = ContextVar('fixly_query_hooks', default=())
+
+
+def run_query_hooks(execute, sql, params, many, context):
+    """
+    The one execute wrapper every connection gets: runs the query through
+    the active hooks, the first one added outermost, as execute_wrappers are.
+    """
+    for hook in reversed(ACTIVE_HOOKS.get()):
+        execute = partial(hook, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_hooks(sender, connection, **kwargs):
+    if run_query_hooks not in connection.execute_wrappers:
+        connection.execute_wrappers.append(run_query_hooks)
+
+
+connection_created.connect(install_query_hooks)
+
+
+@contextmanager
+def observe_queries(hook):
+    """
+    Runs every query of the block, on this thread or any the context is
+    copied to, through `hook`, a connection.execute_wrapper() function.
+    """
+    # Connections opened before this module was imported missed connection_created
+    for connection in connections.all():
+        install_query_hooks(None, connection)
+    token = ACTIVE_HOOKS.set(ACTIVE_HOOKS.get() + (hook,))
+    try:
+        yield hook
+    finally:
+        ACTIVE_HOOKS.reset(token)
+
+
+class ObserverMiddleware:
+    """
+    Base for middleware that watch some requests as they run, sync or async:
+    start() returns what a request's observation collects (None leaves the
+    request alone), the view runs inside observe(), by default with
+    query_hook() on its queries, and finish() records the result. For async
+    requests afinish() runs instead, which subclasses override when
+    finishing does I/O.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        raise NotImplementedError
+
+    def query_hook(self, observation):
+        return None
+
+    def observe(self, observation):
+        hook = self.query_hook(observation)
+        return nullcontext() if hook is None else observe_queries(hook)
+
+    def finish(self, request, response, observation):
+        pass
+
+    async def afinish(self, request, response, observation):
+        self.finish(request, response, observation)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        observation = self.start(request)
+        if observation is None:
+            return self.get_response(request)
+        with self.observe(observation):
+            response = self.get_response(request)
+        self.finish(request, response, observation)
+        return response
+
+    async def __acall__(self, request):
+        observation = self.start(request)
+        if observation is None:
+            return await self.get_response(request)
+        with self.observe(observation):
+            response = await self.get_response(request)
+        await self.afinish(request, response, observation)
+        return response
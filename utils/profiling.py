@@ -0,0 +1,152 @@
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from utils.metrics import get_route
+from utils.observers import ObserverMiddleware, observe_queries
+
+PROFILING_SALT = 'fixly.profiling'
+
+# cProfile can't run two profiles at once: on Python 3.12 the second enable()
+# raises, before that it takes over the first. Held while one is running.
+PROFILER_LOCK = threading.Lock()
+
+
+def profiling_token():
+    """
+    Value for the PROFILING_HEADER that gets a request profiled, valid for
+    PROFILING_TOKEN_MAX_AGE seconds.
+    """
+    return signing.TimestampSigner(salt=PROFILING_SALT).sign('profile')
+
+
+def has_profiling_token(request):
+    token = request.headers.get(settings.PROFILING_HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=PROFILING_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def profile_id(request):
+    """
+    A new id for the profile files, prefixed with the caller's X-Request-ID
+    when that is safe to use in a file name, so the caller can't choose (or
+    overwrite) the files.
+    """
+    given = request.headers.get('X-Request-ID', '')
+    if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', given):
+        return f'{given}-{uuid.uuid4().hex[:12]}'
+    return uuid.uuid4().hex
+
+
+class QueryTimeline:
+    """
+    connection.execute_wrapper() hook that records when each query of a
+    request started, relative to the request, and how long it ran.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'start_ms': round((start - self.start) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'database': context['connection'].alias,
+                'sql': sql,
+            })
+
+
+class Profile:
+    """
+    What profiling one request collects: cProfile's stats and the query
+    timeline, saved under `id`.
+    """
+    def __init__(self, request):
+        self.id = profile_id(request)
+        self.profiler = cProfile.Profile()
+        self.timeline = QueryTimeline()
+
+
+def save_profile(request, response, profile):
+    """
+    Writes <id>.prof (pstats format, for snakeviz, flameprof or gprof2dot)
+    and <id>.json with the request and its query timeline to PROFILING_DIR.
+    """
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILING_DIR, profile.id)
+    profile.profiler.dump_stats(path + '.prof')
+    with open(path + '.json', 'w') as handle:
+        json.dump({
+            'id': profile.id,
+            'created': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'route': get_route(request),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - profile.timeline.start) * 1000, 3),
+            'queries': profile.timeline.queries,
+        }, handle, indent=2)
+
+
+class ProfilingMiddleware(ObserverMiddleware):
+    """
+    Runs a request under cProfile when it carries a valid signed
+    PROFILING_HEADER (see `manage.py profiling_token`) or is picked at
+    PROFILING_SAMPLE_RATE, and saves the profile and its query timeline to
+    PROFILING_DIR under a new id, returned in X-Profile-ID. One request is
+    profiled at a time; others arriving meanwhile are served unprofiled.
+
+    cProfile follows one thread, so for async views the profile shows the
+    awaiting side only (under ASGI, together with whatever else the event
+    loop ran meanwhile); the ORM work they hand to executor threads shows up
+    in the query timeline.
+    """
+    def should_profile(self, request):
+        return has_profiling_token(request) or random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def start(self, request):
+        # Under ASGI the event loop runs other requests while this one
+        # awaits, so a second profile could start while the first is enabled
+        if not self.should_profile(request) or not PROFILER_LOCK.acquire(blocking=False):
+            return None
+        return Profile(request)
+
+    @contextmanager
+    def observe(self, profile):
+        try:
+            with observe_queries(profile.timeline):
+                profile.profiler.enable()
+                try:
+                    yield
+                finally:
+                    profile.profiler.disable()
+        finally:
+            PROFILER_LOCK.release()
+
+    def finish(self, request, response, profile):
+        save_profile(request, response, profile)
+        response.headers['X-Profile-ID'] = profile.id
+
+    async def afinish(self, request, response, profile):
+        await sync_to_async(save_profile, thread_sensitive=False)(request, response, profile)
+        response.headers['X-Profile-ID'] = profile.id
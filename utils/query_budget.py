@@ -0,0 +1,99 @@
+import os
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryRecorder:
+    """
+    Records the SQL of every query run inside the block, with the project
+    frames of the stack that issued it.
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        # Frames above the with statement are the same for every query
+        self.depth = len(traceback.extract_stack()) - 1
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, project_frames(self.depth)))
+        return execute(sql, params, many, context)
+
+    def counts(self):
+        return Counter(sql for sql, _ in self.queries)
+
+    def stack_for(self, sql):
+        return next(frames for statement, frames in self.queries if statement == sql)
+
+
+def project_frames(depth=0, limit=6):
+    """
+    The innermost frames of the current stack below `depth` that belong to
+    this project, skipping installed packages and this module.
+    """
+    base = str(settings.BASE_DIR) + os.sep
+    frames = [
+        frame for frame in traceback.extract_stack()[depth:-2]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return frames[-limit:]
+
+
+def describe_growth(label, small, large, small_rows, large_rows):
+    """
+    Failure message for a request whose query count grew with the data: the
+    statements that ran more often on the larger dataset, each with the stack
+    of its first execution.
+    """
+    lines = [
+        f'{label}: {len(small.queries)} queries with {small_rows} rows, '
+        f'{len(large.queries)} with {large_rows} rows.',
+    ]
+    before, after = small.counts(), large.counts()
+    for sql, count in after.most_common():
+        if count <= before.get(sql, 0):
+            continue
+        lines.append(f'\n  {before.get(sql, 0)} -> {count} x {sql}')
+        for frame in large.stack_for(sql):
+            path = os.path.relpath(frame.filename, settings.BASE_DIR)
+            lines.append(f'      File "{path}", line {frame.lineno}, in {frame.name}')
+            if frame.line:
+                lines.append(f'        {frame.line}')
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that catches N+1 queries: a request has to run the same
+    number of queries however many rows it returns.
+    """
+    query_budget_sizes = (2, 6)
+
+    def assertQueriesDoNotGrow(self, label, request, grow):
+        """
+        :param label: Name shown in the failure message
+        :param request: Callable issuing the request; called once unrecorded first
+        :param grow: Callable adding n rows of data the request should return
+        """
+        request()
+        small_rows, large_rows = self.query_budget_sizes
+        grow(small_rows)
+        with QueryRecorder() as small:
+            request()
+        grow(large_rows - small_rows)
+        with QueryRecorder() as large:
+            request()
+        if len(large.queries) > len(small.queries):
+            self.fail(describe_growth(label, small, large, small_rows, large_rows))
@@ -0,0 +1,120 @@
+import os
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from utils import metrics, observers
+from utils.query_budget import project_frames
+
+# Modules whose frames sit between the caller and SlowQueryLog
+WRAPPER_FILES = (__file__, observers.__file__)
+
+
+def json_params(params):
+    """
+    Query parameters as something a JSONField can hold.
+    """
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {str(key): json_params([value])[0] for key, value in params.items()}
+    return [
+        value if value is None or isinstance(value, (bool, int, float, str)) else str(value)
+        for value in params
+    ]
+
+
+class SlowQueryLog:
+    """
+    connection.execute_wrapper() hook that keeps the queries of one request
+    that took at least SLOW_QUERY_THRESHOLD_MS, with their parameters and the
+    project frames that issued them.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            if elapsed >= self.threshold:
+                frames = [frame for frame in project_frames(limit=20) if frame.filename not in WRAPPER_FILES]
+                self.entries.append({
+                    'database': context['connection'].alias,
+                    'duration_ms': round(elapsed, 3),
+                    'sql': sql,
+                    'params': None if many else params,
+                    'stack': ''.join(
+                        f'File "{os.path.relpath(frame.filename, settings.BASE_DIR)}", line {frame.lineno}, '
+                        f'in {frame.name}\n  {frame.line}\n'
+                        for frame in frames[-6:]
+                    ),
+                })
+
+
+def explain(entry):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) of a logged query. ANALYZE runs the statement
+    again, so only plain SELECTs are explained.
+    """
+    connection = connections[entry['database']]
+    if connection.vendor != 'postgresql' or not entry['sql'].lstrip().upper().startswith('SELECT'):
+        return ''
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {entry['sql']}", entry['params'])
+            return '\n'.join(row[0] for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+
+
+def save_slow_queries(request, entries):
+    """
+    Stores the slow queries of a request, an EXPLAIN for a
+    SLOW_QUERY_EXPLAIN_RATE share of them, and drops the oldest rows beyond
+    SLOW_QUERY_LOG_SIZE.
+    """
+    from registration.models import SlowQuery
+
+    match = getattr(request, 'resolver_match', None)
+    view = match._func_path if match else ''
+    rows = [
+        SlowQuery(
+            method=request.method, route=metrics.get_route(request)[:255], view=view[:255],
+            plan=explain(entry) if random.random() < settings.SLOW_QUERY_EXPLAIN_RATE else '',
+            **dict(entry, params=json_params(entry['params'])),
+        )
+        for entry in entries
+    ]
+    saved = SlowQuery.objects.bulk_create(rows)
+    SlowQuery.objects.filter(pk__lte=saved[-1].pk - settings.SLOW_QUERY_LOG_SIZE).delete()
+
+
+class SlowQueryMiddleware(observers.ObserverMiddleware):
+    """
+    Logs the queries that took longer than SLOW_QUERY_THRESHOLD_MS to the
+    SlowQuery table, browsable in the admin. Set the threshold to 0 to turn it
+    off. Kept first in MIDDLEWARE, so the rows it writes afterwards don't
+    show up in other middleware's query counts or replica routing.
+    """
+    def start(self, request):
+        if settings.SLOW_QUERY_THRESHOLD_MS <= 0:
+            return None
+        return SlowQueryLog(settings.SLOW_QUERY_THRESHOLD_MS)
+
+    def query_hook(self, log):
+        return log
+
+    def finish(self, request, response, log):
+        if log.entries:
+            save_slow_queries(request, log.entries)
+
+    async def afinish(self, request, response, log):
+        if log.entries:
+            await sync_to_async(save_slow_queries)(request, log.entries)
@@ -0,0 +1,360 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import CharField, TextField
+
+SYNTHETIC_DOMAIN = 'synthetic.fixly'
+SLOT_TIMES = np.array([f'{hour}:00:00' for hour in range(10, 18)])
+# Relative demand by weekday (Monday first) and by hourly slot (10:00 to 17:00)
+WEEKDAY_DEMAND = np.array([0.9, 0.85, 0.85, 0.9, 1.0, 1.45, 1.3])
+SLOT_DEMAND = np.array([1.2, 1.3, 1.1, 0.8, 0.8, 0.9, 1.1, 1.0])
+BOOKING_ID_ALPHABET = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)
+FIRST_NAMES = np.array(['Aarav', 'Diya', 'Ishaan', 'Meera', 'Kabir', 'Ananya', 'Rohan', 'Saanvi', 'Vivaan', 'Aisha'])
+LAST_NAMES = np.array(['Sharma', 'Patel', 'Iyer', 'Khan', 'Reddy', 'Gupta', 'Nair', 'Singh', 'Das', 'Mehta'])
+LOCATIONS = np.array(['Pune', 'Mumbai', 'Delhi', 'Bengaluru', 'Chennai', 'Hyderabad'])
+COMMENTS = np.array(['', '', '', 'Great work', 'On time and tidy', 'Would book again', 'Average job', 'Arrived late'])
+
+
+def reserve_ids(model, count):
+    """
+    Moves the primary key sequence of `model` past `count` values and returns
+    them, so rows can be COPYed with their ids known in advance. The table is
+    locked against inserts while the block is taken.
+    """
+    table = model._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {connection.ops.quote_name(table)} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, model._meta.pk.column])
+        sequence = cursor.fetchone()[0]
+        cursor.execute('SELECT nextval(%s)', [sequence])
+        first = cursor.fetchone()[0]
+        cursor.execute('SELECT setval(%s, %s)', [sequence, first + count - 1])
+    return np.arange(first, first + count, dtype=np.int64)
+
+
+def copy_rows(model, frame):
+    """
+    Loads a DataFrame whose columns are database column names of `model`
+    through COPY ... FROM STDIN. Missing values become NULL, except in
+    non-nullable text columns where they load as empty strings.
+    """
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    columns = list(frame.columns)
+    not_null = [
+        column for column in columns
+        if isinstance(fields[column], (CharField, TextField)) and not fields[column].null
+    ]
+    quote = connection.ops.quote_name
+    options = 'FORMAT csv'
+    if not_null:
+        options += f", FORCE_NOT_NULL ({', '.join(map(quote, not_null))})"
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({', '.join(map(quote, columns))}) FROM STDIN WITH ({options})",
+            buffer,
+        )
+    return len(frame)
+
+
+def as_timestamps(values):
+    return np.datetime_as_string(values.astype('datetime64[s]'), timezone='UTC')
+
+
+def booking_ids(numbers):
+    """
+    Encodes distinct integers below 36**8 as the 8-character A-Z0-9 codes
+    Booking.save() generates.
+    """
+    digits = (numbers[:, None] // 36 ** np.arange(7, -1, -1, dtype=np.int64)) % 36
+    return BOOKING_ID_ALPHABET[digits].view('S8').ravel().astype(str)
+
+
+def capped_counts(rng, total, weights, cap):
+    """
+    Splits `total` across weights multinomially, then hands whatever exceeds
+    `cap` for one entry to the remaining entries until none is over.
+    """
+    counts = rng.multinomial(total, weights / weights.sum())
+    while (counts > cap).any():
+        over = counts > cap
+        excess = int((counts[over] - cap).sum())
+        counts[over] = cap
+        open_ = counts < cap
+        counts[open_] += rng.multinomial(excess, weights[open_] / weights[open_].sum())
+    return counts
+
+
+class SyntheticDataset:
+    """
+    Generates customers, providers, bookings and reviews with NumPy and loads
+    them with parallel COPY, bypassing model save() and signals.
+
+    Booking demand follows a Zipf curve across providers (capped at each
+    provider's slot capacity), peaks at weekends and late mornings and grows
+    over the period. Each provider's (date, time_slot) cells are drawn without
+    replacement and reviews keep one row per (reviewer, provider), so the
+    unique_together constraints hold by construction.
+    """
+    def __init__(self, customers, providers, bookings, days=730, future_days=60, review_rate=0.3,
+                 skew=1.0, fill=0.9, seed=42, workers=4, chunk_size=200, skip_fk_checks=False,
+                 stdout=None):
+        self.customers = customers
+        self.providers = providers
+        self.bookings = bookings
+        self.days = days
+        self.future_days = future_days
+        self.review_rate = review_rate
+        self.skew = skew
+        self.fill = fill
+        self.seed = seed
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.skip_fk_checks = skip_fk_checks
+        self.stdout = stdout
+        self.now = np.datetime64(datetime.now(dt_timezone.utc).replace(tzinfo=None), 's')
+        self.today = self.now.astype('datetime64[D]')
+        self.start = self.today - (days - future_days)
+        self.tag = f'{seed:x}{int(time.time()) % 36 ** 4:04x}'[-6:]
+
+    @property
+    def capacity(self):
+        return self.days * len(SLOT_TIMES)
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def run(self, services):
+        """
+        :param services: Service instances providers are spread across
+        :return: Dict of rows loaded per model name
+        """
+        if self.bookings > self.providers * int(self.capacity * self.fill):
+            raise ValueError(
+                f'{self.providers} providers over {self.days} days can hold at most '
+                f'{self.providers * int(self.capacity * self.fill)} bookings; raise --providers or --days.'
+            )
+        from booking.models import Booking
+        from review.models import Review
+
+        rng = np.random.default_rng(self.seed)
+        loaded = {}
+
+        started = time.perf_counter()
+        customer_ids, provider_ids = self.load_users(rng, services)
+        loaded['users'] = len(customer_ids) + len(provider_ids)
+        self.log(f'Loaded {loaded["users"]} users in {time.perf_counter() - started:.1f}s.')
+
+        started = time.perf_counter()
+        weights = 1 / np.arange(1, self.providers + 1) ** self.skew
+        counts = capped_counts(rng, self.bookings, weights, int(self.capacity * self.fill))
+        # Customers book at very different rates: a long tail of one-off users
+        activity = rng.lognormal(0, 1.2, len(customer_ids))
+        customer_cdf = np.cumsum(activity) / activity.sum()
+        quality = rng.beta(5, 1.6, self.providers)
+        cell_weights = self.cell_log_weights()
+        id_offset = int(rng.integers(0, 36 ** 8 - self.bookings))
+
+        starts = np.concatenate([[0], np.cumsum(counts)])
+        tasks = list(enumerate(self.chunks(counts)))
+
+        def load_chunk(task):
+            index, providers = task
+            chunk_rng = np.random.default_rng([self.seed, index])
+            bookings, reviews = self.booking_frames(
+                chunk_rng, provider_ids[providers], counts[providers], cell_weights, customer_ids,
+                customer_cdf, quality[providers], id_offset + starts[providers.start],
+            )
+            return copy_rows(Booking, bookings), copy_rows(Review, reviews)
+
+        results = self.parallel(load_chunk, tasks)
+        loaded['bookings'] = sum(bookings for bookings, _ in results)
+        loaded['reviews'] = sum(reviews for _, reviews in results)
+        elapsed = time.perf_counter() - started
+        self.log(
+            f"Loaded {loaded['bookings']} bookings and {loaded['reviews']} reviews in {elapsed:.1f}s "
+            f"({loaded['bookings'] / max(elapsed, 1e-9):,.0f} bookings/s)."
+        )
+        return loaded
+
+    def chunks(self, counts):
+        """
+        Groups consecutive providers into slices of at most chunk_size providers
+        and roughly equal booking counts, so the few busiest providers don't all
+        land on one worker.
+        """
+        target = max(1, self.bookings // (self.workers * 8))
+        low, rows = 0, 0
+        for index, count in enumerate(counts):
+            rows += count
+            if rows >= target or index + 1 - low >= self.chunk_size:
+                yield slice(low, index + 1)
+                low, rows = index + 1, 0
+        if low < len(counts):
+            yield slice(low, len(counts))
+
+    def parallel(self, func, tasks):
+        def run(task):
+            try:
+                if self.skip_fk_checks:
+                    # Rows reference ids reserved above, so the per-row FK triggers add
+                    # nothing. A replica session skips every trigger not enabled ALWAYS;
+                    # the change tracking ones are (utils.changes), so loaded bookings
+                    # and reviews still get their change_seq and updated_at.
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET session_replication_role = replica')
+                return func(task)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(pool.map(run, tasks))
+
+    def load_users(self, rng, services):
+        from registration.models import User
+
+        ids = reserve_ids(User, self.customers + self.providers)
+        customer_ids, provider_ids = ids[:self.customers], ids[self.customers:]
+        service_ids = np.array([service.pk for service in services])
+        service_names = np.array([service.category for service in services])
+        provider_services = rng.integers(0, len(services), self.providers)
+        password = make_password('Synthetic@1234')
+
+        # Sign-ups accelerate towards the present
+        joined = self.now - (rng.power(0.6, len(ids)) * (self.days - self.future_days) * 86400).astype('timedelta64[s]')
+        is_provider = np.arange(len(ids)) >= self.customers
+        prefix = np.where(is_provider, 'provider', 'customer')
+        numbers = np.where(is_provider, np.arange(len(ids)) - self.customers, np.arange(len(ids))).astype(str)
+        emails = np.char.add(np.char.add(np.char.add(prefix, f'-{self.tag}-'), numbers), f'@{SYNTHETIC_DOMAIN}')
+        category = np.full(len(ids), None, dtype=object)
+        category[is_provider] = service_ids[provider_services]
+        category_name = np.full(len(ids), '', dtype=object)
+        category_name[is_provider] = service_names[provider_services]
+
+        frame = pd.DataFrame({
+            'id': ids,
+            'password': password,
+            'is_superuser': False,
+            'username': emails,
+            'first_name': FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), len(ids))],
+            'last_name': LAST_NAMES[rng.integers(0, len(LAST_NAMES), len(ids))],
+            'email': emails,
+            'is_staff': False,
+            'is_active': True,
+            'date_joined': as_timestamps(joined),
+            'user_id': np.char.add(np.where(is_provider, f'S{self.tag}P', f'S{self.tag}C'), np.char.zfill(numbers, 10)),
+            'user_type': np.where(is_provider, 'SERVICE_PROVIDER', 'USER'),
+            'contact': np.char.add('9', rng.integers(0, 10 ** 9, len(ids)).astype(str)),
+            'gender': np.array(['Male', 'Female', 'Other'])[rng.choice(3, len(ids), p=[0.48, 0.48, 0.04])],
+            'location': LOCATIONS[rng.integers(0, len(LOCATIONS), len(ids))],
+            'category_id': pd.array(category, dtype='Int64'),
+            'category_name': category_name,
+        })
+        chunks = [frame.iloc[low:low + 100_000] for low in range(0, len(frame), 100_000)]
+        self.parallel(lambda chunk: copy_rows(User, chunk), chunks)
+        return customer_ids, provider_ids
+
+    def cell_log_weights(self):
+        """
+        Log demand for every (day, slot) cell of the period, flattened day-major.
+        """
+        weekdays = (self.start + np.arange(self.days)).astype('datetime64[D]').view('int64')
+        # 1970-01-01 was a Thursday
+        weekdays = (weekdays + 3) % 7
+        growth = np.linspace(0.6, 1.2, self.days)
+        day_weights = WEEKDAY_DEMAND[weekdays] * growth
+        return np.log(np.outer(day_weights, SLOT_DEMAND).ravel())
+
+    def booking_frames(self, rng, provider_ids, counts, cell_weights, customer_ids, customer_cdf, quality, id_offset):
+        # Gumbel top-k: the k largest of log(weight) + Gumbel noise are a
+        # weighted sample of k distinct cells for each provider row.
+        keys = cell_weights + rng.gumbel(size=(len(provider_ids), self.capacity))
+        order = np.argsort(-keys, axis=1)
+        cells = order[np.arange(self.capacity) < counts[:, None]]
+        owners = np.repeat(np.arange(len(provider_ids)), counts)
+        total = len(cells)
+
+        days = self.start + cells // len(SLOT_TIMES)
+        slots = cells % len(SLOT_TIMES)
+        starts_at = days.astype('datetime64[s]') + ((10 + slots) * 3600).astype('timedelta64[s]')
+        picks = np.searchsorted(customer_cdf, rng.random(total), side='right')
+        customers = customer_ids[np.minimum(picks, len(customer_ids) - 1)]
+        past = days < self.today
+        complete = past & (rng.random(total) < 0.92)
+        lead = (rng.exponential(4 * 86400, total)).astype('timedelta64[s]')
+        created = np.minimum(starts_at - lead, self.now)
+        codes = booking_ids(id_offset + np.arange(total, dtype=np.int64))
+        codes = self.drop_taken_booking_ids(codes)
+
+        bookings = pd.DataFrame({
+            'user_id': customers,
+            'service_provider_id': provider_ids[owners],
+            'date': np.datetime_as_string(days),
+            'time_slot': SLOT_TIMES[slots],
+            'status': np.where(complete, 'COMPLETE', 'PENDING'),
+            'created_at': as_timestamps(created),
+            'booking_id': codes,
+        })
+
+        reviewed = complete & (rng.random(total) < self.review_rate)
+        pairs = customers[reviewed] * (1 << 32) + provider_ids[owners[reviewed]]
+        _, first = np.unique(pairs, return_index=True)
+        picked = np.flatnonzero(reviewed)[first]
+        delay = rng.exponential(2 * 86400, len(picked)).astype('timedelta64[s]')
+        reviews = pd.DataFrame({
+            'reviewer_id': customers[picked],
+            'service_provider_id': provider_ids[owners[picked]],
+            # J-shaped ratings around each provider's quality
+            'rating': 1 + rng.binomial(4, quality[owners[picked]]),
+            'comment': COMMENTS[rng.integers(0, len(COMMENTS), len(picked))],
+            'created_at': as_timestamps(np.minimum(starts_at[picked] + delay, self.now)),
+        })
+        return bookings, reviews
+
+    def drop_taken_booking_ids(self, codes):
+        from booking.models import Booking
+
+        taken = set()
+        for low in range(0, len(codes), 50_000):
+            batch = codes[low:low + 50_000].tolist()
+            taken.update(Booking.objects.filter(booking_id__in=batch).values_list('booking_id', flat=True))
+        if not taken:
+            return codes
+        codes = codes.astype(object)
+        codes[np.isin(codes, list(taken))] = None
+        return codes
+
+
+def delete_synthetic_data():
+    """
+    Removes generated users together with their bookings, reviews and rollup
+    rows. The large child tables are cleared with one DELETE each rather than
+    through the ORM's cascade collector.
+    """
+    from booking.models import Booking
+    from registration.models import DailyBookingStat, DailyRatingStat, User
+    from review.models import Review
+
+    users = User.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}')
+    ids = list(users.values_list('pk', flat=True))
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model, columns in (
+            (Review, ('reviewer_id', 'service_provider_id')),
+            (Booking, ('user_id', 'service_provider_id')),
+            (DailyBookingStat, ('service_provider_id',)),
+            (DailyRatingStat, ('service_provider_id',)),
+        ):
+            for column in columns:
+                cursor.execute(f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} = ANY(%s)', [ids])
+        deleted, _ = users.delete()
+    return deleted
@@ -0,0 +1,259 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+from utils.observers import ObserverMiddleware
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Longest SQL statement kept on a span
+MAX_STATEMENT = 2000
+
+CURRENT_SPAN = ContextVar('fixly_current_span', default=None)
+
+_export_lock = threading.Lock()
+
+
+def new_id(bits):
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+def parse_traceparent(header):
+    """
+    (trace id, parent span id, sampled) from a W3C traceparent header, or None
+    when it is missing or malformed.
+    """
+    match = TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None or match[1] == '0' * 32 or match[2] == '0' * 16:
+        return None
+    return match[1], match[2], bool(int(match[3], 16) & 1)
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, kind='internal', **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_id(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.error = None
+        self.children = []
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_time_unix_nano': self.start_ns,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'status': 'error' if self.error else 'ok',
+            **({'error': self.error} if self.error else {}),
+        }
+
+
+@contextmanager
+def span(name, kind='internal', **attributes):
+    """
+    Records a child of the current span around the block; does nothing
+    outside a sampled request.
+    """
+    parent = CURRENT_SPAN.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, kind, **attributes)
+    parent.children.append(child)
+    token = CURRENT_SPAN.set(child)
+    try:
+        yield child
+    except Exception as exc:
+        child.error = f'{type(exc).__name__}: {exc}'
+        raise
+    finally:
+        CURRENT_SPAN.reset(token)
+        child.finish()
+
+
+def trace_queries(execute, sql, params, many, context):
+    if CURRENT_SPAN.get() is None:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with span(
+        f'db.{sql.lstrip().split(None, 1)[0].lower()}' if sql.strip() else 'db.query', kind='client',
+        **{'db.system': connection.vendor, 'db.alias': connection.alias, 'db.statement': sql[:MAX_STATEMENT]},
+    ):
+        return execute(sql, params, many, context)
+
+
+class TracedCacheMixin:
+    """
+    Cache backend mixin recording a span per cache call. The async methods
+    of Django's backends run these in a thread, so they are covered too.
+    """
+    def _traced(self, operation, method, *args, **kwargs):
+        with span(f'cache.{operation}', kind='client', **{'cache.backend': type(self).__name__}):
+            return method(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self._traced('get', super().get, *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self._traced('get_many', super().get_many, *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._traced('set', super().set, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._traced('set_many', super().set_many, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._traced('add', super().add, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._traced('delete', super().delete, *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._traced('delete_many', super().delete_many, *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._traced('incr', super().incr, *args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._traced('touch', super().touch, *args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._traced('has_key', super().has_key, *args, **kwargs)
+
+
+class TracedTemplate(Template):
+    def render(self, context=None, request=None):
+        with span('template.render', **{'template.name': self.origin.template_name}):
+            return super().render(context, request)
+
+
+class TracedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend recording a span per template rendered through
+    it: render_to_string(), TemplateResponse and render().
+    """
+    def from_string(self, template_code):
+        return TracedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TracedTemplate(super().get_template(template_name).template, self)
+
+
+def rotate(path, backups):
+    """
+    Moves `path` to `path`.1, shifting older copies up and dropping the one
+    past `backups`.
+    """
+    if backups < 1:
+        os.remove(path)
+        return
+    for index in range(backups - 1, 0, -1):
+        if os.path.exists(f'{path}.{index}'):
+            os.replace(f'{path}.{index}', f'{path}.{index + 1}')
+    os.replace(path, f'{path}.1')
+
+
+def export(root):
+    """
+    Appends every span of a finished trace to TRACING_FILE, one JSON object
+    per line, as a stand-in for an OpenTelemetry collector. The file is
+    rotated once it reaches TRACING_FILE_MAX_BYTES, keeping
+    TRACING_FILE_BACKUPS old ones.
+    """
+    lines = ''.join(json.dumps(item.as_dict(), default=str) + '\n' for item in root.walk())
+    path = settings.TRACING_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _export_lock:
+        if os.path.exists(path) and os.path.getsize(path) >= settings.TRACING_FILE_MAX_BYTES:
+            rotate(path, settings.TRACING_FILE_BACKUPS)
+        with open(path, 'a') as handle:
+            handle.write(lines)
+
+
+class TracingMiddleware(ObserverMiddleware):
+    """
+    Traces a TRACING_SAMPLE_RATE share of requests (0 turns tracing off):
+    a server span per request, named after its route and view, with child
+    spans for SQL queries, cache calls, template rendering and sent email.
+    A request carrying a W3C traceparent header joins the caller's trace;
+    its sampling decision is only followed with TRACING_TRUST_TRACEPARENT
+    (callers are internal services), so outside callers can't have every
+    request traced. Finished traces are exported to TRACING_FILE and the
+    trace id is returned in X-Trace-ID.
+    """
+    def start(self, request):
+        if settings.TRACING_SAMPLE_RATE <= 0:
+            return None
+        parent = parse_traceparent(request.headers.get('traceparent'))
+        trace_id, parent_id, sampled = parent or (new_id(128), None, None)
+        if sampled is None or not settings.TRACING_TRUST_TRACEPARENT:
+            sampled = random.random() < settings.TRACING_SAMPLE_RATE
+        if not sampled:
+            return None
+        return Span(f'{request.method} {request.path}', trace_id, parent_id, 'server', **{
+            'http.method': request.method, 'http.target': request.get_full_path()[:MAX_STATEMENT],
+        })
+
+    def query_hook(self, root):
+        return trace_queries
+
+    @contextmanager
+    def observe(self, root):
+        token = CURRENT_SPAN.set(root)
+        try:
+            with super().observe(root):
+                yield
+        finally:
+            CURRENT_SPAN.reset(token)
+
+    def close(self, request, response, root):
+        from utils.metrics import get_route
+
+        root.finish()
+        match = getattr(request, 'resolver_match', None)
+        route = get_route(request)
+        root.name = f'{request.method} {route}'
+        root.attributes.update({'http.route': route, 'http.status_code': response.status_code})
+        if match:
+            root.attributes['view'] = match._func_path
+        if response.status_code >= 500:
+            root.error = f'HTTP {response.status_code}'
+        response.headers['X-Trace-ID'] = root.trace_id
+
+    def finish(self, request, response, root):
+        self.close(request, response, root)
+        export(root)
+
+    async def afinish(self, request, response, root):
+        self.close(request, response, root)
+        await sync_to_async(export, thread_sensitive=False)(root)